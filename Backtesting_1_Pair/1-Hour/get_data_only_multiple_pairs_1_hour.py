@@ -1,10 +1,15 @@
 import MetaTrader5 as mt5
-import mplfinance as mpf
 from dotenv import load_dotenv
-import pandas as pd
 import os
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
+import sys
+
+# Make the shared forex_breakout package importable when running this script directly
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from forex_breakout.bar_cache import BarCache, CachedBarSource, frame_to_columns
+from forex_breakout.data_source import MT5BarSource
+from forex_breakout.rendering import encode_png, iter_window_charts, save_candlestick_chart
+from forex_breakout.window_store import interval_windows, write_window_store
 
 # Load environment variables for MT5 login credentials
 load_dotenv()
@@ -27,41 +32,20 @@ symbols_to_process = [
     "NZDCAD", "NZDCHF", "NZDJPY"
 ]
 
-def save_candlestick_chart(df, filename):
-    """
-    Save a candlestick chart showing only the last 12 candles.
-    """
-    df = df.iloc[-17:-5]  # Select the last 12 candles
-    df = df[['open', 'high', 'low', 'close']].apply(pd.to_numeric, errors='coerce').dropna()
-    fig, ax = plt.subplots()
-    mpf.plot(df, type='candle', style='charles', ax=ax)
-    ax.get_xaxis().set_visible(False)
-    ax.get_yaxis().set_visible(False)
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    plt.savefig(filename, dpi=100, bbox_inches='tight', pad_inches=0)
-    plt.close()
-
 # Define parameters
-timeframe = mt5.TIMEFRAME_H1  # 1-hour timeframe
+timeframe = "H1"  # 1-hour timeframe
+
+# model_0 was trained on mplfinance charts. The NumPy rasterizer is only close to them (foreground IoU about 0.9,
+# see forex_breakout.rendering.compare_with_mplfinance), so keep "mplfinance" until the model is retrained on
+# rasterized charts, then switch to "numpy" for the fast path.
+chart_renderer = "mplfinance"
 
 # Output directories
 output_dir = "output_specific_symbols_multiple_pairs_1_hour"
 os.makedirs(output_dir, exist_ok=True)
 
-def get_rates(symbol, timeframe, start, end):
-    """
-    Retrieve rates from MetaTrader 5 and return as a DataFrame.
-    """
-    rates = mt5.copy_rates_range(symbol, timeframe, start, end)
-    if rates is None or len(rates) == 0:
-        return None
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    df.set_index('time', inplace=True)
-    return df
+# Bulk bar loader backed by the local bar cache shared with the dataset generation scripts
+bar_source = CachedBarSource(MT5BarSource(), BarCache("bar_cache"))
 
 # Time range
 start_date = datetime.now() - timedelta(days=364)  # Last 1 year
@@ -71,31 +55,30 @@ end_date = datetime.now()
 for symbol in symbols_to_process:
     print(f"Processing: {symbol} - Current time: {datetime.now()}")
     symbol_dir = os.path.join(output_dir, symbol)
-    data_dir = os.path.join(symbol_dir, "data")
     charts_dir = os.path.join(symbol_dir, "charts")
-
-    # Create separate folders for charts, data, and future charts
-    os.makedirs(data_dir, exist_ok=True)
     os.makedirs(charts_dir, exist_ok=True)
 
     # Retrieve the full data for the symbol
-    df = get_rates(symbol, timeframe, start_date, end_date)
+    df = bar_source.load(symbol, timeframe, start_date, end_date)
     if df is not None:
-        # Iterate through intervals and save the charts
-        current_date = start_date
-        while current_date + timedelta(hours=17) <= end_date:
-            # Select the 17 candles for the current interval
-            interval_data = df.loc[current_date:current_date + timedelta(hours=17)]
-            if len(interval_data) >= 17:
-                # Save the full 17-candle chart
-                interval_data_path = os.path.join(data_dir, f"{symbol}_{current_date.strftime('%Y%m%d%H%M')}.csv")
-                interval_data.to_csv(interval_data_path, index=True)
+        columns = frame_to_columns(df)
+
+        # An interval every 17 hours, holding all of its candles (17, or 18 when it starts on the hour)
+        starts, lengths, interval_starts = interval_windows(columns['time'], start_date, end_date)
+        chart_ids = [f"{symbol}_{interval_start.strftime('%Y%m%d%H%M')}" for interval_start in interval_starts]
 
-                # Save the last 12-candle chart
-                chart_filename = os.path.join(charts_dir, f"{symbol}_{current_date.strftime('%Y%m%d%H%M')}.png")
-                save_candlestick_chart(interval_data, chart_filename)
+        # Save the chart of the 12 candles before each interval's last 5
+        if chart_renderer == "numpy":
+            charts = iter_window_charts(columns['open'], columns['high'], columns['low'], columns['close'],
+                                        starts + lengths - 17, counts=(12,))
+            for (_, chart), chart_id in zip(charts, chart_ids):
+                encode_png(chart, os.path.join(charts_dir, f"{chart_id}.png"))
+        else:
+            for start, length, chart_id in zip(starts, lengths, chart_ids):
+                save_candlestick_chart(df.iloc[start:start + length], os.path.join(charts_dir, f"{chart_id}.png"))
 
-            current_date += timedelta(hours=17)
+        # One OHLC array per symbol and a window index (start offset, time, chart id) instead of a CSV per interval
+        write_window_store(symbol_dir, columns, starts, lengths, chart_ids)
 
 # Shutdown MT5 connection
 mt5.shutdown()
\ No newline at end of file
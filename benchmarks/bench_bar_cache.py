@@ -0,0 +1,91 @@
+"""
+Compare dataset build times with a cold bar cache (everything fetched upstream) and a warm one.
+
+The upstream is a FileBarSource over synthetic CSV exports, optionally with an artificial
+per-request latency to mimic MetaTrader5 round-trips:
+
+    python benchmarks/bench_bar_cache.py --symbols 28 --bars 30000 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from forex_breakout.bar_cache import BarCache, CachedBarSource
+from forex_breakout.data_source import FileBarSource
+from forex_breakout.labeling import label_windows
+
+
+class SlowSource(FileBarSource):
+    """
+    FileBarSource that sleeps before every fetch, standing in for a remote terminal.
+    """
+
+    def __init__(self, root, latency):
+        super().__init__(root)
+        self.latency = latency
+
+    def fetch(self, symbol, timeframe, start, end):
+        time.sleep(self.latency)
+        return super().fetch(symbol, timeframe, start, end)
+
+
+def write_random_walks(source, symbols, num_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2019-01-01", periods=num_bars, freq="h", name="time")
+    for symbol in symbols:
+        close = 1.1 + np.cumsum(rng.normal(0, 0.001, num_bars))
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        wick = np.abs(rng.normal(0, 0.0005, (2, num_bars)))
+        df = pd.DataFrame({
+            'open': open_,
+            'high': np.maximum(open_, close) + wick[0],
+            'low': np.minimum(open_, close) - wick[1],
+            'close': close,
+            'tick_volume': rng.integers(100, 1000, num_bars),
+        }, index=times)
+        source.save(symbol, "H1", df)
+    return times[0].to_pydatetime(), times[-1].to_pydatetime()
+
+
+def build_dataset(source, symbols, start, end):
+    """
+    Load every symbol and label all of its windows, returning the number of labels produced.
+    """
+    total = 0
+    for symbol in symbols:
+        df = source.load(symbol, "H1", start, end)
+        total += len(label_windows(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy()))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--symbols", type=int, default=28)
+    parser.add_argument("--bars", type=int, default=30000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every upstream fetch")
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i:02d}" for i in range(args.symbols)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        upstream = SlowSource(os.path.join(tmp_dir, "upstream"), args.latency)
+        start, end = write_random_walks(upstream, symbols, args.bars)
+        source = CachedBarSource(upstream, BarCache(os.path.join(tmp_dir, "cache")))
+
+        results = {}
+        for run in ("cold", "warm"):
+            run_start = time.perf_counter()
+            windows = build_dataset(source, symbols, start, end)
+            results[run] = time.perf_counter() - run_start
+            print(f"{run:>4} cache: {results[run]:.3f}s for {windows} labelled windows")
+
+    print(f"Warm cache speed-up: {results['cold'] / results['warm']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
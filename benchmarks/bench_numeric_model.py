@@ -0,0 +1,88 @@
+"""
+Dataset build, training and inference throughput of the render-free numeric model versus the
+chart image path, on seeded random bars.
+
+    python benchmarks/bench_numeric_model.py --symbols 28 --bars 5000 --image-backbone MobileNetV3Small
+
+The image path is timed on a sample of windows (rendering + PNG encoding for the dataset,
+rendering + an untrained backbone for inference) and reported per window.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from forex_breakout.generation import SPLITS
+from forex_breakout.inference import ohlc_inputs
+from forex_breakout.labeling import DEFAULT_GEOMETRY, entry_offset
+from forex_breakout.numeric import dataset_from_bars, predict_ohlc, train_numeric_model
+from forex_breakout.rendering import encode_png, render_windows, window_slices
+from forex_breakout.streaming import random_series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=28)
+    parser.add_argument("--bars", type=int, default=5000, help="Bars per symbol")
+    parser.add_argument("--stride", type=int, default=1, help="Window stride (1 = every bar starts a window)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--kind", default="conv")
+    parser.add_argument("--image-sample", type=int, default=64, help="Windows timed through the image path")
+    parser.add_argument("--image-backbone", default="MobileNetV3Small")
+    args = parser.parse_args()
+
+    bars = {f"S{i:02d}": random_series(args.bars, seed=i) for i in range(args.symbols)}
+    results = {}
+
+    start = time.perf_counter()
+    dataset = dataset_from_bars(bars, stride=args.stride)
+    elapsed = time.perf_counter() - start
+    windows = sum(len(part['y']) for part in dataset.values())
+    results['numeric dataset build'] = windows / elapsed
+
+    columns = bars["S00"]
+    starts = np.arange(args.image_sample)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        charts = render_windows(columns['open'], columns['high'], columns['low'], columns['close'], starts)
+        for i, chart in enumerate(charts):
+            encode_png(chart, os.path.join(tmp_dir, f"{i}.png"))
+        results['image dataset build (render + PNG)'] = len(starts) / (time.perf_counter() - start)
+
+    train, valid, test = (dataset[split] for split in SPLITS)
+    start = time.perf_counter()
+    model, history = train_numeric_model(train['x'], train['y'], valid['x'], valid['y'], kind=args.kind,
+                                         epochs=args.epochs, patience=args.epochs)
+    elapsed = time.perf_counter() - start
+    results['numeric training (windows x epochs)'] = len(train['y']) * len(history.epoch) / elapsed
+    accuracy = float((model.predict(test['x'], batch_size=4096, verbose=0).argmax(axis=-1) == test['y']).mean())
+
+    count = entry_offset(DEFAULT_GEOMETRY) + 1
+    raw = np.stack([window_slices(columns[name], np.arange(len(columns['close']) - count), 0, count)
+                    for name in ('open', 'high', 'low', 'close')], axis=-1)
+    predict_ohlc(model, raw[:16])  # Warm-up
+    start = time.perf_counter()
+    predict_ohlc(model, raw)
+    results['numeric inference (raw OHLC)'] = len(raw) / (time.perf_counter() - start)
+
+    from forex_breakout.models import create_base_model, create_model
+
+    image_model = create_model(num_classes=3, base_model=create_base_model(args.image_backbone, weights=None))
+    image_model.predict_on_batch(ohlc_inputs(raw[:1]))  # Warm-up
+    start = time.perf_counter()
+    image_model.predict_on_batch(ohlc_inputs(raw[:args.image_sample]))
+    results[f'image inference (render + {args.image_backbone})'] = args.image_sample / (time.perf_counter() - start)
+
+    print(f"{windows} windows, {len(history.epoch)} epochs, numeric test accuracy {accuracy:.3f}")
+    for name, rate in results.items():
+        print(f"{name:<45} {rate:>14,.0f} windows/s")
+    print(f"dataset build speedup: {results['numeric dataset build'] / results['image dataset build (render + PNG)']:,.0f}x")
+    print(f"inference speedup:     {results['numeric inference (raw OHLC)'] / results[f'image inference (render + {args.image_backbone})']:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark every pipeline stage on seeded synthetic bars, at several data sizes, and write the
+timings to JSON so runs on different commits can be compared.
+
+    python benchmarks/bench_pipeline.py --sizes 100 1000 10000 --output bench_results.json
+    python benchmarks/bench_pipeline.py --compare bench_results.json --output bench_new.json
+
+Stages: breakout labeling, chart rendering, dataset writing (PNG files and an npy shard),
+image loading, batched inference with a small untrained stand-in model and the trade
+simulation. Sizes are numbers of windows; the image stages only run up to --image-limit.
+No MetaTrader5 account or Kaggle downloads are needed.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from forex_breakout.backtest import lot_size, simulate_trades
+from forex_breakout.labeling import DEFAULT_GEOMETRY, label_windows, window_length
+from forex_breakout.rendering import encode_png, render_windows
+from forex_breakout.shards import write_npy_shard
+from forex_breakout.synthetic import SyntheticConfig, synthetic_columns
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(results, stage, size, function, repeats=1):
+    """
+    Run `function` `repeats` times and record the best wall time for `size` items.
+    """
+    best, value = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        value = function()
+        best = min(best, time.perf_counter() - start)
+    results.append({'stage': stage, 'size': size, 'seconds': best, 'items_per_sec': size / best if best else None})
+    print(f"{stage:<16} {size:>9,} {best:>10.4f}s {size / best if best else 0:>14,.0f}/s")
+    return value
+
+
+def stand_in_model(backbone):
+    from forex_breakout.models import create_base_model, create_model
+
+    return create_model(num_classes=3, base_model=create_base_model(backbone, weights=None))
+
+
+def run(args):
+    config = SyntheticConfig(trend=args.trend, volatility=args.volatility, gap_probability=args.gap_probability)
+    length = window_length(DEFAULT_GEOMETRY)
+    model = None
+    results = []
+    print(f"{'stage':<16} {'size':>9} {'seconds':>11} {'items/s':>15}")
+    for size in args.sizes:
+        columns = synthetic_columns(args.symbol, size + length - 1, args.timeframe, seed=args.seed, config=config)
+        opens, highs, lows, closes = (columns[name] for name in ('open', 'high', 'low', 'close'))
+
+        timed(results, "label", size, lambda: label_windows(highs, lows, closes), args.repeats)
+
+        rng = np.random.default_rng(args.seed)
+        entries = rng.integers(0, size, size)
+        directions = rng.choice([1, -1], size)
+        lots = np.full(size, lot_size(args.symbol))
+        timed(results, "backtest", size, lambda: simulate_trades(highs, lows, closes, entries + 11, directions, lots),
+              args.repeats)
+
+        if size > args.image_limit:
+            continue
+        starts = np.arange(size)
+        charts = timed(results, "render", size, lambda: render_windows(opens, highs, lows, closes, starts))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"{i}.png") for i in range(size)]
+            timed(results, "write_png", size, lambda: [encode_png(chart, path) for chart, path in zip(charts, paths)])
+            labels = label_windows(highs, lows, closes)[:size]
+            timed(results, "write_npy_shard", size,
+                  lambda: write_npy_shard(os.path.join(tmp_dir, "shard.images.npy"), charts, labels))
+
+            from forex_breakout.feature_cache import load_images
+
+            next(iter(load_images(paths[:1])))  # Warm-up: TensorFlow start-up is not part of the stage
+            images = timed(results, "load_images", size,
+                           lambda: np.concatenate([batch.numpy() for batch in load_images(paths, batch_size=args.batch_size)]))
+
+        if model is None:
+            model = stand_in_model(args.backbone)
+            model.predict_on_batch(images[:1])  # Warm-up
+        timed(results, "inference", size, lambda: [model.predict_on_batch(images[lo:lo + args.batch_size])
+                                                   for lo in range(0, size, args.batch_size)])
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    reference = {(entry['stage'], entry['size']): entry['seconds'] for entry in baseline['results']}
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit')}): time ratio, < 1 is faster")
+    for entry in results:
+        key = (entry['stage'], entry['size'])
+        if key in reference and reference[key]:
+            print(f"{entry['stage']:<16} {entry['size']:>9,} {entry['seconds'] / reference[key]:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--image-limit", type=int, default=1000, help="Largest size run through the image stages")
+    parser.add_argument("--symbol", default="EURUSD", help="JPY symbols use 0.01 pips")
+    parser.add_argument("--timeframe", default="H1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trend", type=float, default=0.0, help="Drift in pips per hour")
+    parser.add_argument("--volatility", type=float, default=8.0, help="Standard deviation in pips per hour")
+    parser.add_argument("--gap-probability", type=float, default=0.002, help="Chance of a price gap per bar")
+    parser.add_argument("--backbone", default="MobileNetV3Small", help="Stand-in model for the inference stage")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3, help="Best of N for the cheap array stages")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'config': vars(args),
+        'results': results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} timings to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Throughput of the batched NumPy candlestick rasterizer versus mplfinance + savefig.
+
+    python benchmarks/bench_rendering.py --windows 1000 --candles 12
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from forex_breakout.rendering import CHART_SIZE, encode_png, random_windows, render_candles, save_full_chart
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--windows", type=int, default=1000)
+    parser.add_argument("--candles", type=int, default=12)
+    parser.add_argument("--mplfinance-sample", type=int, default=50, help="mplfinance is slow: time a subset")
+    parser.add_argument("--size", type=int, nargs=2, default=CHART_SIZE, metavar=("HEIGHT", "WIDTH"))
+    args = parser.parse_args()
+
+    opens, highs, lows, closes = random_windows(args.windows, args.candles, seed=0)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sample = min(args.windows, args.mplfinance_sample)
+        start = time.perf_counter()
+        for i in range(sample):
+            df = pd.DataFrame(
+                {'open': opens[i], 'high': highs[i], 'low': lows[i], 'close': closes[i]},
+                index=pd.date_range("2024-01-01", periods=args.candles, freq="h"),
+            )
+            save_full_chart(df, os.path.join(tmp_dir, f"mpf_{i}.png"))
+        results['mplfinance + savefig'] = sample / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        images = render_candles(opens, highs, lows, closes, size=tuple(args.size))
+        results['rasterizer (arrays)'] = args.windows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i, image in enumerate(images):
+            encode_png(image, os.path.join(tmp_dir, f"raster_{i}.png"))
+        results['rasterizer + PNG encode'] = args.windows / (
+            args.windows / results['rasterizer (arrays)'] + time.perf_counter() - start
+        )
+
+    for name, charts_per_sec in results.items():
+        speedup = charts_per_sec / results['mplfinance + savefig']
+        print(f"{name:<26} {charts_per_sec:10.1f} charts/s  ({speedup:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
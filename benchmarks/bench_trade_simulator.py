@@ -0,0 +1,97 @@
+"""
+Throughput of the vectorized trade simulator versus the notebook's calculate_profit_or_loss + pd.concat + iterrows path.
+
+    python benchmarks/bench_trade_simulator.py --signals 1000 --array-signals 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from forex_breakout.backtest import (
+    LONG,
+    SHORT,
+    STARTING_BALANCE,
+    calculate_profit_or_loss,
+    equity_curve,
+    random_window_files,
+    simulate_signals,
+    simulate_trades,
+)
+from forex_breakout.window_store import WindowStore, convert_csv_windows
+
+
+def notebook_path(signals):
+    """
+    The backtesting notebook's per-signal loop for one pair.
+    """
+    columns = ['pair', 'entry_time', 'exit_date', 'profit', 'pred_class', 'file_path', 'image_path']
+    new_df = pd.DataFrame(columns=columns)
+    for signal in signals.itertuples():
+        _, _, profit, exit_time, entry_time, _ = calculate_profit_or_loss(signal.file_path, signal.pred_class,
+                                                                          signal.pair)
+        row = {'pair': signal.pair, 'entry_time': entry_time, 'exit_date': exit_time, 'profit': profit,
+               'pred_class': signal.pred_class, 'file_path': signal.file_path, 'image_path': signal.image_path}
+        new_df = pd.concat([new_df, pd.DataFrame([row])], ignore_index=True)
+    new_df = new_df.sort_values(by='entry_time', ascending=True)
+    balance, balances = STARTING_BALANCE, []
+    for _, row in new_df.iterrows():
+        balance += row['profit']
+        balances.append(balance)
+    return balances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--signals", type=int, default=1000, help="Signals backtested from window CSVs and the window store")
+    parser.add_argument("--array-signals", type=int, default=1000000, help="Signals simulated on in-memory bars")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = os.path.join(tmp_dir, "EURUSD", "data")
+        os.makedirs(data_dir)
+        signals = random_window_files(data_dir, args.signals, seed=0, pairs=("EURUSD",))
+
+        start = time.perf_counter()
+        notebook_path(signals)
+        results['notebook loop (CSV per signal)'] = args.signals / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        simulate_signals(signals)
+        results['simulate_signals (CSVs)'] = args.signals / (time.perf_counter() - start)
+
+        # Same windows from the per-symbol OHLC array and window index
+        convert_csv_windows(tmp_dir)
+        store = WindowStore.open(tmp_dir)
+        start = time.perf_counter()
+        simulate_signals(signals.drop(columns='file_path'), store=store)
+        results['simulate_signals (window store)'] = args.signals / (time.perf_counter() - start)
+
+    # One long bar series with signals at random entry bars, as after a per-symbol bar lookup
+    rng = np.random.default_rng(0)
+    num_bars = max(args.array_signals // 4, 1000)
+    closes = 1.1 + np.cumsum(rng.normal(0, 0.0008, num_bars))
+    highs = closes + np.abs(rng.normal(0, 0.0005, num_bars))
+    lows = closes - np.abs(rng.normal(0, 0.0005, num_bars))
+    entries = rng.integers(0, num_bars - 5, args.array_signals)
+    directions = rng.choice([LONG, SHORT], args.array_signals)
+    entry_times = rng.permutation(args.array_signals)
+
+    start = time.perf_counter()
+    result = simulate_trades(highs, lows, closes, entries, directions, 100000)
+    equity_curve(entry_times, result['profit'])
+    results['simulate_trades (arrays)'] = args.array_signals / (time.perf_counter() - start)
+
+    for name, signals_per_sec in results.items():
+        speedup = signals_per_sec / results['notebook loop (CSV per signal)']
+        print(f"{name:<32} {signals_per_sec:12.1f} signals/s  ({speedup:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
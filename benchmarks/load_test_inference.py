@@ -0,0 +1,111 @@
+"""
+Load test of the inference server: replays historical bar closes and sends every pair's 12-candle
+window at each close, the way the live loop would.
+
+    python -m forex_breakout.serving --weights model_0.keras &
+    python benchmarks/load_test_inference.py --pairs 28 --bar-closes 50
+
+Without a running server, --local-model starts one in-process with an untrained backbone
+(e.g. ConvNeXtTiny) to exercise the batching path.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from forex_breakout.labeling import DEFAULT_GEOMETRY, entry_offset
+from forex_breakout.serving import DEFAULT_ADDRESS, InferenceClient, InferenceServer, parse_address
+
+
+def historical_windows(args):
+    """
+    OHLC array (pairs, bars, 4) to replay: cached bars if available, otherwise seeded random walks.
+    """
+    if args.cache_dir:
+        from forex_breakout.bar_cache import BarCache
+
+        cache = BarCache(args.cache_dir)
+        series = []
+        for meta in cache.entries():
+            if meta['timeframe'] != args.timeframe or len(series) == args.pairs:
+                continue
+            columns = cache.read_arrays(meta['symbol'], args.timeframe)
+            series.append(np.stack([columns[name][-(args.bar_closes + 12):] for name in ('open', 'high', 'low', 'close')],
+                                   axis=-1))
+        if series:
+            length = min(len(values) for values in series)
+            return np.stack([values[-length:] for values in series])
+        print(f"No {args.timeframe} bars in {args.cache_dir}, replaying random walks instead")
+
+    rng = np.random.default_rng(0)
+    bars = args.bar_closes + 12
+    close = 1.1 + np.cumsum(rng.normal(0, 0.001, (args.pairs, bars)), axis=1)
+    open_ = np.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    wick = np.abs(rng.normal(0, 0.0005, (2, args.pairs, bars)))
+    return np.stack([open_, np.maximum(open_, close) + wick[0], np.minimum(open_, close) - wick[1], close], axis=-1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default="{}:{}".format(*DEFAULT_ADDRESS))
+    parser.add_argument("--pairs", type=int, default=28)
+    parser.add_argument("--bar-closes", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.0, help="Seconds between replayed bar closes")
+    parser.add_argument("--cache-dir", help="Replay cached bars instead of random walks")
+    parser.add_argument("--timeframe", default="H1")
+    parser.add_argument("--local-model", help="Start an in-process server with this untrained backbone")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    address = parse_address(args.address)
+    server = None
+    if args.local_model:
+        from forex_breakout.models import create_base_model, create_model
+
+        model = create_model(num_classes=3, base_model=create_base_model(args.local_model, weights=None))
+        server = InferenceServer(model, address, args.max_batch, args.max_wait_ms)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        server.ready.wait()  # Warming up every padded batch size can take longer than the client's retries
+
+    ohlc = historical_windows(args)
+    num_pairs, num_bars = ohlc.shape[:2]
+    candles = entry_offset(DEFAULT_GEOMETRY) + 1
+    clients = [InferenceClient(address) for _ in range(num_pairs)]
+
+    def request(pair, close_index):
+        start = time.perf_counter()
+        clients[pair].predict_ohlc(ohlc[pair, close_index - candles + 1:close_index + 1][None])
+        return time.perf_counter() - start
+
+    request_latencies, close_latencies = [], []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_pairs) as pool:
+        for close_index in range(candles - 1, num_bars):
+            close_start = time.perf_counter()
+            request_latencies.extend(pool.map(request, range(num_pairs), [close_index] * num_pairs))
+            close_latencies.append(time.perf_counter() - close_start)
+            if args.interval:
+                time.sleep(args.interval)
+    elapsed = time.perf_counter() - started
+
+    request_ms, close_ms = np.asarray(request_latencies) * 1000, np.asarray(close_latencies) * 1000
+    print(f"{len(close_latencies)} bar closes x {num_pairs} pairs in {elapsed:.1f}s "
+          f"({len(request_latencies) / elapsed:.1f} predictions/s)")
+    print(f"request latency   p50 {np.percentile(request_ms, 50):8.1f} ms   p99 {np.percentile(request_ms, 99):8.1f} ms")
+    print(f"bar-close latency p50 {np.percentile(close_ms, 50):8.1f} ms   p99 {np.percentile(close_ms, 99):8.1f} ms")
+    print(f"server: {clients[0].stats()}")
+
+    for client in clients:
+        client.close()
+    if server is not None:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+Shared building blocks for the forex breakout dataset generation, training and backtesting scripts.
+"""
@@ -0,0 +1,335 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.labeling import DEFAULT_GEOMETRY, entry_offset, window_length
+
+# Backtest settings used by the backtesting notebook
+STARTING_BALANCE = 10000
+STOP_LOSS = -100
+PROBABILITY_THRESHOLD = 0.95
+
+# Trade directions
+LONG, SHORT = 1, -1
+DIRECTIONS = {"bullish_breakout": LONG, "bearish_breakout": SHORT}
+
+
+def lot_size(pair):
+    """
+    Position size per pair: JPY pairs are quoted with 2 decimals instead of 4-5.
+    """
+    return 1000 if "JPY" in pair else 100000
+
+
+def calculate_profit_or_loss(file_path, pred_class, pair):
+    """
+    Reference implementation from the backtesting notebook: profit of one signal from its 17-row window CSV.
+    """
+    # Load the data
+    df = pd.read_csv(file_path)
+    df['time'] = pd.to_datetime(df['time'])
+
+    # Entry candle and its values
+    entry_candle = df.iloc[11]
+    time_value_entry_candle = entry_candle['time']
+
+    # Exit candle and its values
+    exit_candle = df.iloc[-1]
+    exit_candle_time = exit_candle['time']
+
+    # Determine the multiplier based on whether the pair contains JPY
+    lot_size = 1000 if "JPY" in pair else 100000
+
+    # Initialize variables
+    profit = 0
+    triggered = False  # Flag to indicate if -100 has been reached
+
+    # Calculate profit or loss based on prediction class
+    if pred_class == "bullish_breakout":
+        for i in range(12, len(df)):
+            candle = df.iloc[i]
+            low_profit = (candle['low'] - entry_candle['close']) * lot_size
+
+            if low_profit <= -100:
+                profit = -100
+                triggered = True
+                break  # Exit the loop if -100 is reached
+        if not triggered:
+            profit = (exit_candle['close'] - entry_candle['close']) * lot_size  # Final profit calculation
+
+    elif pred_class == "bearish_breakout":
+        for i in range(12, len(df)):
+            candle = df.iloc[i]
+            low_profit = (entry_candle['close'] - candle['high']) * lot_size
+
+            if low_profit <= -100:
+                profit = -100
+                triggered = True
+                break  # Exit the loop if -100 is reached
+        if not triggered:
+            profit = (entry_candle['close'] - exit_candle['close']) * lot_size  # Final profit calculation
+
+    # Determine if the prediction was correct or incorrect
+    prediction_correct_or_incorrect = None
+    if pred_class == "bullish_breakout":
+        prediction_correct_or_incorrect = (
+            'prediction_correct' if exit_candle['close'] > entry_candle['close'] else 'prediction_incorrect'
+        )
+    elif pred_class == "bearish_breakout":
+        prediction_correct_or_incorrect = (
+            'prediction_correct' if exit_candle['close'] < entry_candle['close'] else 'prediction_incorrect'
+        )
+
+    # Return relevant data
+    return entry_candle, exit_candle, profit, exit_candle_time, time_value_entry_candle, prediction_correct_or_incorrect
+
+
+def simulate_trades(highs, lows, closes, entry_indices, directions, lot_sizes, stop_loss=STOP_LOSS, hold=5):
+    """
+    Simulate many trades at once with the notebook's rules.
+
+    A trade enters at the close of bar `entry`, is stopped out at `stop_loss` if any of the next
+    `hold` bars reaches it (low for longs, high for shorts), and otherwise exits at the close of
+    bar `entry + hold`. The arithmetic is the same as `calculate_profit_or_loss`, so results match
+    it exactly.
+
+    Args:
+        highs, lows, closes: 1D bar arrays (several symbols can be concatenated into one array).
+        entry_indices: Index of every trade's entry bar in those arrays.
+        directions: LONG (1) or SHORT (-1) per trade.
+        lot_sizes: Lot size per trade (scalar or array).
+        stop_loss (float): Loss in account currency that closes the trade.
+        hold (int or array): Bars held when the stop is not hit, for all trades or per trade.
+
+    Returns:
+        dict: Arrays 'entry_close', 'exit_close', 'profit', 'stopped', 'stop_bar' (bars after
+        entry at which the stop hit, -1 if not) and 'correct' (exit close moved in the trade direction).
+    """
+    highs, lows, closes = np.asarray(highs), np.asarray(lows), np.asarray(closes)
+    entry_indices = np.asarray(entry_indices, dtype=np.int64)
+    directions = np.asarray(directions)
+    lot_sizes = np.broadcast_to(np.asarray(lot_sizes, dtype=np.float64), entry_indices.shape)
+    holds = np.broadcast_to(np.asarray(hold, dtype=np.int64), entry_indices.shape)
+    if len(entry_indices) and (entry_indices.min() < 0 or (entry_indices + holds).max() >= len(closes)):
+        raise ValueError("Every trade needs `hold` bars after its entry")
+
+    entry_close = closes[entry_indices]
+    exit_close = closes[entry_indices + holds]
+    long = directions == LONG
+
+    # Worst excursion of every held bar, in account currency (bars past a trade's own hold are ignored)
+    steps = np.arange(1, (holds.max() if len(holds) else 0) + 1)
+    path = np.minimum(entry_indices[:, None] + steps, len(closes) - 1)
+    adverse = np.where(
+        long[:, None],
+        (lows[path] - entry_close[:, None]) * lot_sizes[:, None],
+        (entry_close[:, None] - highs[path]) * lot_sizes[:, None],
+    )
+    hit = (adverse <= stop_loss) & (steps <= holds[:, None])
+    stopped = hit.any(axis=1)
+    stop_bar = np.where(stopped, hit.argmax(axis=1) + 1, -1)
+
+    final = np.where(long, (exit_close - entry_close) * lot_sizes, (entry_close - exit_close) * lot_sizes)
+    profit = np.where(stopped, float(stop_loss), final)
+    correct = np.where(long, exit_close > entry_close, exit_close < entry_close)
+
+    return {
+        'entry_close': entry_close,
+        'exit_close': exit_close,
+        'profit': profit,
+        'stopped': stopped,
+        'stop_bar': stop_bar,
+        'correct': correct,
+    }
+
+
+def equity_curve(entry_times, profits, starting_balance=STARTING_BALANCE):
+    """
+    Account balance after every trade, taking trades in entry-time order.
+
+    Returns:
+        tuple: (order, balances) where `order` sorts the trades by entry time.
+    """
+    order = np.argsort(np.asarray(entry_times), kind='stable')
+    # Accumulate from the starting balance (not add it afterwards) so rounding matches a running total
+    balances = np.cumsum(np.concatenate([[starting_balance], np.asarray(profits, dtype=np.float64)[order]]))[1:]
+    return order, balances
+
+
+def read_window_csvs(file_paths):
+    """
+    Stack per-window CSVs (as written by the data scripts) into flat bar arrays.
+
+    Returns:
+        dict: 'time' (datetime64), 'high', 'low', 'close' flattened window after window, and
+        'entry_index' of every window's entry candle in those arrays.
+    """
+    frames = [pd.read_csv(file_path, usecols=['time', 'high', 'low', 'close']) for file_path in file_paths]
+    lengths = np.array([len(frame) for frame in frames], dtype=np.int64)
+    bars = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['time', 'high', 'low', 'close'])
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(lengths) else lengths
+    return {
+        'time': pd.to_datetime(bars['time']).to_numpy(),
+        'high': bars['high'].to_numpy(dtype=np.float64),
+        'low': bars['low'].to_numpy(dtype=np.float64),
+        'close': bars['close'].to_numpy(dtype=np.float64),
+        'entry_index': starts + entry_offset(DEFAULT_GEOMETRY),
+        'exit_index': starts + lengths - 1,
+    }
+
+
+def window_bars(signals, store=None):
+    """
+    Bars of the signals' windows: from a `WindowStore` by chart id when given, otherwise from the
+    per-window CSVs in the signals' 'file_path' column.
+    """
+    if store is not None:
+        return store.window_bars(signals)
+    return read_window_csvs(signals['file_path'])
+
+
+def locate_entries(signals, bars, bars_after):
+    """
+    Entry bar of every signal in the pairs' bar arrays, concatenated into one set of columns.
+
+    Args:
+        signals (pd.DataFrame): Columns 'pair' and 'entry_time'.
+        bars (dict): pair -> dict of 'time' (epoch seconds), 'high', 'low' and 'close' arrays
+            (e.g. `BarCache.read_arrays`).
+        bars_after (int): Bars that must follow the entry.
+
+    Returns:
+        tuple: (columns dict of concatenated 'time', 'high', 'low', 'close' arrays, entry index of
+        every signal in them, or -1 when the entry bar is missing or too close to the end)
+    """
+    entry_seconds = signals['entry_time'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    pairs = signals['pair'].to_numpy()
+
+    offsets, columns, position = {}, {'time': [], 'high': [], 'low': [], 'close': []}, 0
+    for pair in pd.unique(pairs):
+        offsets[pair] = position
+        for name in columns:
+            columns[name].append(np.asarray(bars[pair][name], dtype=np.int64 if name == 'time' else np.float64))
+        position += len(bars[pair]['close'])
+    columns = {name: np.concatenate(values) if values else np.empty(0) for name, values in columns.items()}
+
+    entry_indices = np.full(len(signals), -1, dtype=np.int64)
+    for pair, offset in offsets.items():
+        mask = pairs == pair
+        times = np.asarray(bars[pair]['time'])
+        index = np.searchsorted(times, entry_seconds[mask])
+        found = (index + bars_after < len(times)) & (times[np.minimum(index, len(times) - 1)] == entry_seconds[mask])
+        entry_indices[mask] = np.where(found, offset + index, -1)
+    return columns, entry_indices
+
+
+def simulate_signals(signals, stop_loss=STOP_LOSS, starting_balance=STARTING_BALANCE, store=None):
+    """
+    Backtest one pair's signals from their windows, vectorized.
+
+    Args:
+        signals (pd.DataFrame): Columns 'pair', 'pred_class', 'image_path' and, without a
+            `store`, 'file_path' of the window CSV.
+        store (WindowStore): Look the windows up by chart id instead of reading CSVs.
+
+    Returns:
+        tuple: (trades DataFrame sorted by entry time, with the notebook's columns plus 'balance',
+        number of correct predictions)
+    """
+    columns = ['pair', 'entry_time', 'exit_date', 'profit', 'pred_class', 'file_path', 'image_path']
+    if len(signals) == 0:
+        return pd.DataFrame(columns=columns + ['balance']), 0
+
+    # Windows cut by time can hold 17 or 18 rows: each trade exits at its own window's last row
+    bars = window_bars(signals, store)
+    result = simulate_trades(
+        bars['high'], bars['low'], bars['close'],
+        bars['entry_index'],
+        signals['pred_class'].map(DIRECTIONS).to_numpy(),
+        [lot_size(pair) for pair in signals['pair']],
+        stop_loss=stop_loss,
+        hold=bars['exit_index'] - bars['entry_index'],
+    )
+    trades = pd.DataFrame({
+        'pair': signals['pair'].to_numpy(),
+        'entry_time': bars['time'][bars['entry_index']],
+        'exit_date': bars['time'][bars['exit_index']],
+        'profit': result['profit'],
+        'pred_class': signals['pred_class'].to_numpy(),
+        'file_path': signals['file_path'].to_numpy() if 'file_path' in signals else None,
+        'image_path': signals['image_path'].to_numpy(),
+    })
+    order, balances = equity_curve(trades['entry_time'], trades['profit'], starting_balance)
+    trades = trades.iloc[order].reset_index(drop=True)
+    trades['balance'] = balances
+    return trades, int(result['correct'].sum())
+
+
+def random_window_files(directory, num_windows, seed=0, pairs=("EURUSD", "USDJPY")):
+    """
+    Write random 17-row window CSVs in the data-script format and return matching random signals.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(num_windows):
+        # Interval slices of the data script are 17 or 18 rows long
+        length = window_length(DEFAULT_GEOMETRY) + int(rng.integers(0, 2))
+        pair = pairs[i % len(pairs)]
+        scale = 0.01 if "JPY" in pair else 0.0001
+        base = 150.0 if "JPY" in pair else 1.1
+        close = np.round(base + np.cumsum(rng.normal(0, 8 * scale, length)), 5)
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        spread = np.round(np.abs(rng.normal(0, 5 * scale, (2, length))), 5)
+        df = pd.DataFrame({
+            'time': pd.date_range("2023-01-02", periods=length, freq="h") + pd.Timedelta(hours=17 * i),
+            'open': open_,
+            'high': np.maximum(open_, close) + spread[0],
+            'low': np.minimum(open_, close) - spread[1],
+            'close': close,
+            'tick_volume': rng.integers(100, 1000, length),
+        })
+        file_path = os.path.join(directory, f"{pair}_{i}.csv")
+        df.to_csv(file_path, index=False)
+        rows.append((pair, rng.choice(list(DIRECTIONS)), file_path, file_path.replace(".csv", ".png")))
+    return pd.DataFrame(rows, columns=['pair', 'pred_class', 'file_path', 'image_path'])
+
+
+def check_parity(num_windows=500, seed=0):
+    """
+    Compare `simulate_signals` against `calculate_profit_or_loss` and the notebook's iterrows
+    equity loop on random windows.
+
+    Returns:
+        int: Number of signals compared. Raises AssertionError on the first mismatch.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        signals = random_window_files(tmp_dir, num_windows, seed)
+        for pair, pair_signals in signals.groupby('pair'):
+            trades, correct = simulate_signals(pair_signals)
+
+            rows, expected_correct = [], 0
+            for signal in pair_signals.itertuples():
+                _, _, profit, exit_time, entry_time, outcome = calculate_profit_or_loss(
+                    signal.file_path, signal.pred_class, pair)
+                rows.append({'entry_time': entry_time, 'exit_date': exit_time, 'profit': profit,
+                             'file_path': signal.file_path})
+                expected_correct += outcome == 'prediction_correct'
+            expected = pd.DataFrame(rows).sort_values(by='entry_time', ascending=True)
+
+            balance, balances = STARTING_BALANCE, []
+            for _, row in expected.iterrows():
+                balance += row['profit']
+                balances.append(balance)
+
+            assert correct == expected_correct, (pair, correct, expected_correct)
+            assert list(trades['file_path']) == list(expected['file_path']), pair
+            assert np.array_equal(trades['profit'].to_numpy(), expected['profit'].to_numpy(dtype=np.float64)), pair
+            assert np.array_equal(trades['exit_date'].to_numpy(), expected['exit_date'].to_numpy()), pair
+            assert np.array_equal(trades['balance'].to_numpy(), np.array(balances, dtype=np.float64)), pair
+    return num_windows
+
+
+if __name__ == "__main__":
+    print(f"Parity check passed on {check_parity()} signals.")
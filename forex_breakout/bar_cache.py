@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.data_source import BarSource, BarSourceError
+
+META_FILE = "meta.json"
+
+
+def _atomic_save_npy(path, array):
+    """
+    Save an array next to `path` and rename it into place so readers never see a partial file.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _atomic_write_json(path, data):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def frame_to_columns(df):
+    """
+    Split a time-indexed bar DataFrame into plain column arrays ('time' as int64 epoch seconds).
+    """
+    columns = {'time': df.index.values.astype('datetime64[s]').astype(np.int64)}
+    for column in df.columns:
+        columns[column] = df[column].to_numpy()
+    return columns
+
+
+def columns_to_frame(columns):
+    """
+    Build the time-indexed DataFrame the scripts use from column arrays.
+    """
+    data = {name: values for name, values in columns.items() if name != 'time'}
+    df = pd.DataFrame(data, index=pd.to_datetime(np.asarray(columns['time']), unit='s'), copy=False)
+    df.index.name = 'time'
+    return df
+
+
+class BarCache:
+    """
+    Persistent on-disk bar store keyed by symbol and timeframe.
+
+    Each entry is a directory `<root>/<timeframe>/<symbol>/` holding one `.npy` file per column
+    (memory-mapped on read, so slices are zero-copy) and a `meta.json` with the covered date range
+    and the identity of the source the bars came from (MT5, a bars directory, a synthetic seed).
+    The range is what upstream was asked for; gaps inside it (missing bars) are not tracked.
+    """
+
+    def __init__(self, root="bar_cache"):
+        self.root = root
+
+    def entry_dir(self, symbol, timeframe):
+        return os.path.join(self.root, timeframe, symbol)
+
+    def meta(self, symbol, timeframe):
+        meta_path = os.path.join(self.entry_dir(symbol, timeframe), META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def coverage(self, symbol, timeframe):
+        """
+        Date range the cached bars are known to cover, or None if nothing is cached.
+        """
+        meta = self.meta(symbol, timeframe)
+        if meta is None:
+            return None
+        return datetime.fromisoformat(meta['start']), datetime.fromisoformat(meta['end'])
+
+    def read_arrays(self, symbol, timeframe, start=None, end=None):
+        """
+        Memory-mapped column arrays for a symbol, optionally sliced to [start, end] without copying.
+        """
+        meta = self.meta(symbol, timeframe)
+        if meta is None:
+            return None
+        entry_dir = self.entry_dir(symbol, timeframe)
+        columns = {
+            name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r')
+            for name in meta['columns']
+        }
+        # A run interrupted between column writes leaves mismatched lengths: treat as not cached
+        if any(len(values) != meta['bars'] for values in columns.values()):
+            return None
+
+        times = columns['time']
+        lo = 0 if start is None else np.searchsorted(times, int(pd.Timestamp(start).timestamp()), side='left')
+        hi = len(times) if end is None else np.searchsorted(times, int(pd.Timestamp(end).timestamp()), side='right')
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    def read(self, symbol, timeframe, start=None, end=None):
+        columns = self.read_arrays(symbol, timeframe, start, end)
+        if columns is None:
+            return None
+        return columns_to_frame(columns)
+
+    def write(self, symbol, timeframe, df, start, end, source=None):
+        """
+        Replace the cached bars of a symbol and record the covered date range and their source.
+        """
+        entry_dir = self.entry_dir(symbol, timeframe)
+        os.makedirs(entry_dir, exist_ok=True)
+        columns = frame_to_columns(df)
+        for name, values in columns.items():
+            _atomic_save_npy(os.path.join(entry_dir, f"{name}.npy"), np.ascontiguousarray(values))
+        # Metadata goes last: it is what marks the entry as complete
+        _atomic_write_json(os.path.join(entry_dir, META_FILE), {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'start': pd.Timestamp(start).isoformat(),
+            'end': pd.Timestamp(end).isoformat(),
+            'bars': len(df),
+            'columns': list(columns),
+            'source': source,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+        })
+
+    def extend_coverage(self, symbol, timeframe, start, end):
+        """
+        Record a wider covered date range for unchanged bars (upstream had nothing new in it).
+        """
+        meta = self.meta(symbol, timeframe)
+        meta.update({
+            'start': pd.Timestamp(start).isoformat(),
+            'end': pd.Timestamp(end).isoformat(),
+            'updated': datetime.now().isoformat(timespec='seconds'),
+        })
+        _atomic_write_json(os.path.join(self.entry_dir(symbol, timeframe), META_FILE), meta)
+
+    def entries(self):
+        """
+        Metadata of every cached (symbol, timeframe) entry.
+        """
+        if not os.path.exists(self.root):
+            return []
+        entries = []
+        for timeframe in sorted(os.listdir(self.root)):
+            timeframe_dir = os.path.join(self.root, timeframe)
+            if not os.path.isdir(timeframe_dir):
+                continue
+            for symbol in sorted(os.listdir(timeframe_dir)):
+                meta = self.meta(symbol, timeframe)
+                if meta is not None:
+                    meta['size_bytes'] = sum(
+                        os.path.getsize(os.path.join(timeframe_dir, symbol, file))
+                        for file in os.listdir(os.path.join(timeframe_dir, symbol))
+                    )
+                    entries.append(meta)
+        return entries
+
+    def evict(self, symbol=None, timeframe=None):
+        """
+        Delete cached entries matching the given symbol and/or timeframe (all entries if both are None).
+
+        Returns:
+            int: Number of entries removed.
+        """
+        removed = 0
+        for meta in self.entries():
+            if symbol not in (None, meta['symbol']) or timeframe not in (None, meta['timeframe']):
+                continue
+            shutil.rmtree(self.entry_dir(meta['symbol'], meta['timeframe']))
+            removed += 1
+        return removed
+
+
+class CachedBarSource(BarSource):
+    """
+    Serves bars from a BarCache and only asks the upstream source for what is missing.
+
+    Bars before the cached coverage, and bars from the last cached bar onwards (which may have
+    been incomplete when it was stored), are fetched and merged; everything else comes from disk.
+    The coverage is widened to the requested range even when upstream has no bars there (weekends,
+    already up to date), so the same range is not fetched again. A fetch that fails (BarSourceError)
+    is reported and leaves the coverage on its side unchanged, so it is retried on the next run.
+    Gaps inside the covered range are not detected or refilled; evict the entry to rebuild it.
+
+    Bars cached from a different source (e.g. synthetic bars in a cache later used with MT5) are
+    a miss: they are fetched again from `upstream` and replaced.
+    """
+
+    def __init__(self, upstream, cache):
+        self.upstream = upstream
+        self.cache = cache
+
+    def identity(self):
+        return self.upstream.identity()
+
+    def _fetch_upstream(self, symbol, timeframe, start, end):
+        """
+        (answered, bars) of one upstream request; a failure is printed instead of raised.
+        """
+        try:
+            return True, self.upstream.fetch(symbol, timeframe, start, end)
+        except BarSourceError as error:
+            print(f"Fetching {symbol} {timeframe} from {start} to {end} failed, retried on the next run: {error}")
+            return False, None
+
+    def fetch(self, symbol, timeframe, start, end):
+        source = self.upstream.identity()
+        meta = self.cache.meta(symbol, timeframe)
+        same_source = meta is not None and meta.get('source') == source
+        cached = self.cache.read(symbol, timeframe) if same_source else None
+
+        if cached is None:
+            _, df = self._fetch_upstream(symbol, timeframe, start, end)
+            if df is None or len(df) == 0:
+                return None
+            self.cache.write(symbol, timeframe, df, start, end, source)
+            return df
+
+        cached_start, cached_end = self.cache.coverage(symbol, timeframe)
+        if start >= cached_start and end <= cached_end:
+            return cached
+        head = tail = None
+        covered_start, covered_end = cached_start, cached_end
+        if start < cached_start:
+            answered, head = self._fetch_upstream(symbol, timeframe, start, cached_start)
+            covered_start = start if answered else cached_start
+        if end > cached_end:
+            tail_start = cached.index[-1].to_pydatetime() if len(cached) else cached_end
+            answered, tail = self._fetch_upstream(symbol, timeframe, tail_start, end)
+            covered_end = end if answered else cached_end
+
+        if all(frame is None or len(frame) == 0 for frame in (head, tail)):
+            if (covered_start, covered_end) != (cached_start, cached_end):
+                self.cache.extend_coverage(symbol, timeframe, covered_start, covered_end)
+            return cached
+        df = pd.concat([frame for frame in (head, cached, tail) if frame is not None and len(frame) > 0])
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        self.cache.write(symbol, timeframe, df, covered_start, covered_end, source)
+        return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or evict entries of the local OHLC bar cache.")
+    parser.add_argument("--root", default="bar_cache", help="Cache directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List cached symbols, coverage and size")
+    evict_parser = subparsers.add_parser("evict", help="Delete cached entries")
+    evict_parser.add_argument("--symbol", help="Only evict this symbol")
+    evict_parser.add_argument("--timeframe", help="Only evict this timeframe")
+    args = parser.parse_args()
+
+    cache = BarCache(args.root)
+    if args.command == "list":
+        entries = cache.entries()
+        for meta in entries:
+            print(
+                f"{meta['timeframe']:>4} {meta['symbol']:<8} {meta['start']} -> {meta['end']} | "
+                f"{meta['bars']} bars | {meta['size_bytes'] / 1e6:.1f} MB | updated {meta['updated']} | "
+                f"{meta.get('source') or 'unknown source'}"
+            )
+        print(f"{len(entries)} entries in {args.root}")
+    elif args.command == "evict":
+        print(f"Removed {cache.evict(args.symbol, args.timeframe)} entries from {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.labeling import DEFAULT_GEOMETRY, window_length
+
+# Bar length in seconds for the timeframes used by the scripts (MT5 naming)
+TIMEFRAME_SECONDS = {
+    "M1": 60,
+    "M5": 5 * 60,
+    "M15": 15 * 60,
+    "M30": 30 * 60,
+    "H1": 60 * 60,
+    "H4": 4 * 60 * 60,
+    "D1": 24 * 60 * 60,
+}
+
+# Columns returned by mt5.copy_rates_range (besides 'time')
+RATE_COLUMNS = ['open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume']
+
+# How each rate column is aggregated when bars are resampled to a higher timeframe (others keep the last value)
+RESAMPLE_REDUCERS = {
+    'open': 'first',
+    'high': np.maximum,
+    'low': np.minimum,
+    'close': 'last',
+    'tick_volume': np.add,
+    'spread': np.minimum,
+    'real_volume': np.add,
+}
+
+
+def rates_to_frame(rates):
+    """
+    Turn the structured array returned by MT5 into the time-indexed DataFrame the scripts use.
+    """
+    df = pd.DataFrame(rates)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    df.set_index('time', inplace=True)
+    return df
+
+
+def window_starts(num_bars, geometry=DEFAULT_GEOMETRY, stride=None):
+    """
+    Bar indexes at which a full window starts.
+
+    Windows are enumerated by bar index over the in-memory series, so weekend and holiday
+    gaps never produce short windows. By default windows do not overlap (stride = window length).
+    """
+    length = window_length(geometry)
+    stride = stride or length
+    return np.arange(0, max(num_bars - length + 1, 0), stride)
+
+
+def resample_columns(columns, timeframe):
+    """
+    Aggregate time-sorted bar column arrays into bars of a higher timeframe in one vectorized pass.
+
+    Bars are grouped by the start of their `timeframe` period (epoch-aligned, which matches MT5's
+    M15/H1/H4/D1 boundaries) and every group is reduced with `np.ufunc.reduceat`. Periods without
+    any base bar (weekends, holidays) produce no bar, like MT5.
+
+    Args:
+        columns (dict): 'time' (int64 epoch seconds) and the rate columns of one symbol.
+        timeframe (str): Target timeframe, e.g. "H1".
+
+    Returns:
+        dict: Column arrays of the resampled bars, 'time' being each period's start.
+    """
+    seconds = TIMEFRAME_SECONDS[timeframe]
+    times = np.asarray(columns['time'], dtype=np.int64)
+    periods = times - times % seconds
+    if len(periods) == 0:
+        return {name: np.asarray(values)[:0] for name, values in columns.items()}
+    starts = np.flatnonzero(np.concatenate([[True], periods[1:] != periods[:-1]]))
+    ends = np.concatenate([starts[1:], [len(periods)]]) - 1
+
+    resampled = {'time': periods[starts]}
+    for name, values in columns.items():
+        if name == 'time':
+            continue
+        values = np.asarray(values)
+        reducer = RESAMPLE_REDUCERS.get(name, 'last')
+        if reducer == 'first':
+            resampled[name] = values[starts]
+        elif reducer == 'last':
+            resampled[name] = values[ends]
+        else:
+            resampled[name] = reducer.reduceat(values, starts)
+    return resampled
+
+
+def resample_frame(df, timeframe):
+    """
+    `resample_columns` for a time-indexed bar DataFrame.
+    """
+    columns = {'time': df.index.values.astype('datetime64[s]').astype(np.int64)}
+    columns.update({name: df[name].to_numpy() for name in df.columns})
+    resampled = resample_columns(columns, timeframe)
+    data = {name: values for name, values in resampled.items() if name != 'time'}
+    resampled_df = pd.DataFrame(data, index=pd.to_datetime(resampled['time'], unit='s'))
+    resampled_df.index.name = 'time'
+    return resampled_df
+
+
+class BarSourceError(RuntimeError):
+    """
+    The upstream source failed to answer a request (as opposed to having no bars in the range).
+    """
+
+
+class BarSource:
+    """
+    Loads a symbol's whole bar history for a date range in bulk.
+
+    Subclasses implement `fetch`; `load` returns a DataFrame indexed by time with the
+    MT5 rate columns, or None when no bars exist in the range. A source that cannot answer
+    raises BarSourceError instead, so a failure is never mistaken for an empty range.
+    """
+
+    def fetch(self, symbol, timeframe, start, end):
+        raise NotImplementedError
+
+    def identity(self):
+        """
+        Where the bars come from; stored with cached bars so bars of different sources never mix.
+        """
+        return type(self).__name__
+
+    def load(self, symbol, timeframe, start, end):
+        df = self.fetch(symbol, timeframe, start, end)
+        if df is None or len(df) == 0:
+            return None
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        return df.loc[start:end]
+
+
+class MT5BarSource(BarSource):
+    """
+    Bulk loader backed by `mt5.copy_rates_range`, requesting at most `chunk_bars` bars per call.
+
+    MT5 must already be initialized (login) by the caller. A chunk request that fails (None from
+    `copy_rates_range`) raises BarSourceError with `mt5.last_error()`; an empty chunk is just empty.
+    """
+
+    def __init__(self, chunk_bars=50000, debug_log_file=None):
+        import MetaTrader5 as mt5
+
+        self.mt5 = mt5
+        self.chunk_bars = chunk_bars
+        self.debug_log_file = debug_log_file
+
+    def fetch(self, symbol, timeframe, start, end):
+        mt5_timeframe = getattr(self.mt5, f"TIMEFRAME_{timeframe}")
+        chunk = timedelta(seconds=TIMEFRAME_SECONDS[timeframe] * self.chunk_bars)
+
+        frames = []
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + chunk, end)
+            rates = self.mt5.copy_rates_range(symbol, mt5_timeframe, chunk_start, chunk_end)
+            if rates is None:
+                raise BarSourceError(f"copy_rates_range failed for {symbol} {timeframe} from {chunk_start} "
+                                     f"to {chunk_end}, error code: {self.mt5.last_error()}")
+            if len(rates) > 0:
+                frames.append(rates_to_frame(rates))
+            chunk_start = chunk_end
+
+        if not frames:
+            if self.debug_log_file:
+                with open(self.debug_log_file, "a") as log:
+                    log.write(f"No data for {symbol} from {start} to {end}.\n")
+            return None
+        return pd.concat(frames)
+
+
+class FileBarSource(BarSource):
+    """
+    Local file-backed source reading `<root>/<symbol>_<timeframe>.csv` (or `.parquet`).
+
+    Lets the pipeline run without MetaTrader5 installed, e.g. on exported or synthetic bars.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, symbol, timeframe, extension=".csv"):
+        return os.path.join(self.root, f"{symbol}_{timeframe}{extension}")
+
+    def fetch(self, symbol, timeframe, start, end):
+        parquet_path = self.path(symbol, timeframe, ".parquet")
+        csv_path = self.path(symbol, timeframe)
+        if os.path.exists(parquet_path):
+            df = pd.read_parquet(parquet_path)
+        elif os.path.exists(csv_path):
+            df = pd.read_csv(csv_path, parse_dates=['time'])
+        else:
+            return None
+        if 'time' in df.columns:
+            df.set_index('time', inplace=True)
+        return df
+
+    def identity(self):
+        return f"{type(self).__name__}({os.path.abspath(self.root)})"
+
+    def save(self, symbol, timeframe, df):
+        """
+        Write bars (time-indexed DataFrame) so they can later be served by this source.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        df.to_csv(self.path(symbol, timeframe), index=True)
+
+
+class ResampledBarSource(BarSource):
+    """
+    Derives higher-timeframe bars by resampling an upstream source's base bars (e.g. M5 -> H1).
+
+    Requests for the base timeframe itself are passed through. Wrapping a `CachedBarSource`
+    means every timeframe costs one base fetch (then only cache reads) plus a cheap resample.
+    """
+
+    def __init__(self, upstream, base_timeframe="M5"):
+        self.upstream = upstream
+        self.base_timeframe = base_timeframe
+
+    def fetch(self, symbol, timeframe, start, end):
+        if timeframe == self.base_timeframe:
+            return self.upstream.load(symbol, timeframe, start, end)
+        base_seconds, seconds = TIMEFRAME_SECONDS[self.base_timeframe], TIMEFRAME_SECONDS[timeframe]
+        if seconds < base_seconds or seconds % base_seconds:
+            raise ValueError(f"Cannot resample {self.base_timeframe} bars to {timeframe}")
+        # Start the base range on a period boundary so the first resampled bar is complete
+        period_start = pd.Timestamp(start).floor(f"{seconds}s").to_pydatetime()
+        base = self.upstream.load(symbol, self.base_timeframe, period_start, end)
+        if base is None:
+            return None
+        return resample_frame(base, timeframe)
+
+    def identity(self):
+        return f"{self.upstream.identity()} resampled from {self.base_timeframe}"
@@ -0,0 +1,245 @@
+import argparse
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.bar_cache import BarCache, CachedBarSource
+from forex_breakout.data_source import (
+    TIMEFRAME_SECONDS,
+    BarSource,
+    FileBarSource,
+    MT5BarSource,
+    ResampledBarSource,
+    resample_columns,
+)
+from forex_breakout.generation import SPLIT_SEED, OutputLayout, generate_dataset
+from forex_breakout.labeling import DEFAULT_GEOMETRY, WindowGeometry
+from forex_breakout.metrics import PROFILERS, RunMetrics, profiled
+from forex_breakout.synthetic import SyntheticBarSource
+
+SYMBOLS = [
+    "EURUSD", "GBPUSD", "USDCHF", "USDJPY", "USDCAD",
+    "AUDUSD", "AUDNZD", "AUDCAD", "AUDCHF", "AUDJPY",
+    "NZDUSD", "CHFJPY", "EURGBP", "EURAUD", "EURCHF",
+    "EURJPY", "EURNZD", "EURCAD", "GBPCHF", "GBPJPY",
+    "CADCHF", "CADJPY", "GBPAUD", "GBPCAD", "GBPNZD",
+    "NZDCAD", "NZDCHF", "NZDJPY"
+]
+
+# Everything that defines one timeframe's dataset; the generation scripts only differ in these values
+GenerationConfig = namedtuple(
+    "GenerationConfig",
+    ["timeframe", "start", "end", "output_dir", "geometry", "bullish_limit", "bearish_limit"],
+    defaults=[DEFAULT_GEOMETRY, 1000, 1000],
+)
+
+
+def output_layout(output_dir):
+    """
+    The scripts' folder names under a timeframe's output directory.
+    """
+    return OutputLayout(
+        output_dir,
+        os.path.join(output_dir, "output_hourly_price_action_patterns_training_and_validation"),
+        os.path.join(output_dir, "output_hourly_price_action_patterns_testing"),
+        os.path.join(output_dir, "output_future"),
+    )
+
+
+class TimeframeBarSource(BarSource):
+    """
+    Bar source for any timeframe from one upstream base timeframe.
+
+    Base bars are fetched from `upstream` through the bar cache; every other timeframe is
+    resampled from the cached base bars and cached in turn, so a symbol is only fetched once
+    no matter how many timeframes are built. Without a base timeframe every timeframe is
+    fetched from upstream (the scripts' original behaviour).
+    """
+
+    def __init__(self, upstream, cache, base_timeframe=None):
+        self.base_timeframe = base_timeframe
+        self.base = CachedBarSource(upstream, cache)
+        self.derived = CachedBarSource(ResampledBarSource(self.base, base_timeframe), cache) if base_timeframe else None
+
+    def fetch(self, symbol, timeframe, start, end):
+        if self.derived is None or timeframe == self.base_timeframe:
+            return self.base.fetch(symbol, timeframe, start, end)
+        return self.derived.fetch(symbol, timeframe, start, end)
+
+
+def mt5_upstream(debug_log_file=None):
+    """
+    Log in to MetaTrader 5 with the MT5_LOGIN/MT5_PASSWORD/MT5_SERVER environment variables (.env)
+    and return a bulk bar source backed by it.
+    """
+    import MetaTrader5 as mt5
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    login = int(os.getenv('MT5_LOGIN'))
+    password = os.getenv('MT5_PASSWORD')
+    server = os.getenv('MT5_SERVER')
+    if not mt5.initialize(login=login, password=password, server=server):
+        raise RuntimeError(f"Failed to initialize MT5, error code: {mt5.last_error()}")
+    return MT5BarSource(debug_log_file=debug_log_file)
+
+
+def run_generation(config, bar_source, cache_dir, symbols=SYMBOLS, seed=SPLIT_SEED, workers=None, output_format="folders",
+                   shard_size=1024, metrics=None, resume=False):
+    """
+    Build one timeframe's dataset into `config.output_dir` (chart folders or shards plus manifest.csv).
+
+    With `resume`, an earlier build in the same directory is extended from its checkpoint instead
+    of starting over.
+    """
+    layout = output_layout(config.output_dir)
+    os.makedirs(layout.train_val_dir, exist_ok=True)
+    os.makedirs(layout.test_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+
+    print(f"Processing {len(symbols)} {config.timeframe} symbols with {workers} workers - Current time: {datetime.now()}")
+    manifest = generate_dataset(
+        bar_source, cache_dir, symbols, config.timeframe, config.start, config.end, layout,
+        bullish_limit=config.bullish_limit, bearish_limit=config.bearish_limit, seed=seed, workers=workers,
+        geometry=config.geometry, manifest_path=os.path.join(config.output_dir, "manifest.csv"),
+        output_format=output_format, shard_dir=os.path.join(config.output_dir, "shards"), shard_size=shard_size,
+        metrics=metrics, resume=resume,
+    )
+    print(manifest.groupby(['split', 'label']).size())
+    return manifest
+
+
+def add_generation_arguments(parser):
+    """
+    Command-line options shared by the engine and the per-timeframe generation scripts.
+    """
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes for labeling and rendering")
+    parser.add_argument("--seed", type=int, default=SPLIT_SEED, help="Seed of the deterministic train/validation/test split")
+    parser.add_argument("--output-format", choices=["folders", "npy", "tfrecord"], default="folders",
+                        help="PNG folders (original layout) or fixed-size binary shards for streaming")
+    parser.add_argument("--shard-size", type=int, default=1024, help="Samples per shard file")
+    parser.add_argument("--base-timeframe", choices=list(TIMEFRAME_SECONDS),
+                        help="Fetch only this timeframe (e.g. M5) and resample higher timeframes from the cached bars")
+    parser.add_argument("--bars-dir", help="Read bars from <bars-dir>/<symbol>_<timeframe>.csv instead of MetaTrader 5")
+    parser.add_argument("--synthetic", action="store_true", help="Use seeded synthetic bars instead of MetaTrader 5")
+    parser.add_argument("--cache-dir",
+                        help="Shared across runs and scripts (default bar_cache for MT5 bars; bar_cache_synthetic "
+                             "and bar_cache_files with --synthetic and --bars-dir, so they never mix with MT5 bars)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Extend the existing build in the output directory with bars after its checkpoint")
+    parser.add_argument("--metrics", help="Append per-stage metrics as JSON lines to this file")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="Profile the run (main process; workers show up as time waiting for results)")
+    parser.add_argument("--profile-output", help="cProfile stats file or pyinstrument HTML report")
+
+
+def generate_timeframes(configs, args, symbols=SYMBOLS, debug_log_file=None):
+    """
+    Build the datasets of several timeframes from one bar source.
+
+    Each timeframe's stage metrics go to `args.metrics` (JSON lines tagged with the timeframe)
+    and an end-of-run summary is printed.
+
+    Returns:
+        dict: timeframe -> manifest.
+    """
+    if args.synthetic:
+        upstream = SyntheticBarSource(args.seed)
+        args.cache_dir = args.cache_dir or "bar_cache_synthetic"
+    elif args.bars_dir:
+        upstream = FileBarSource(args.bars_dir)
+        args.cache_dir = args.cache_dir or "bar_cache_files"
+    else:
+        upstream = mt5_upstream(debug_log_file)
+        args.cache_dir = args.cache_dir or "bar_cache"
+    bar_source = TimeframeBarSource(upstream, BarCache(args.cache_dir), args.base_timeframe)
+    manifests = {}
+    try:
+        with profiled(args.profile, args.profile_output):
+            for config in configs:
+                metrics = RunMetrics(args.metrics, timeframe=config.timeframe)
+                manifests[config.timeframe] = run_generation(config, bar_source, args.cache_dir, symbols, args.seed,
+                                                             args.workers, args.output_format, args.shard_size, metrics,
+                                                             args.resume)
+                metrics.close()
+        return manifests
+    finally:
+        if isinstance(upstream, MT5BarSource):
+            upstream.mt5.shutdown()
+
+
+def check_parity(num_symbols=5, days=30, seed=0):
+    """
+    Compare `resample_columns` with pandas' resample on random M1 bars with weekend and random gaps.
+
+    Returns:
+        int: Number of resampled bars compared. Raises AssertionError on the first mismatch.
+    """
+    rng = np.random.default_rng(seed)
+    compared = 0
+    for _ in range(num_symbols):
+        times = np.arange(0, days * 86400, 60, dtype=np.int64) + 1_704_067_200  # From 2024-01-01 (a Monday)
+        weekday = (times // 86400 + 3) % 7  # 0 = Monday
+        times = times[(weekday < 5) & (rng.random(len(times)) > 0.05)]
+        close = 1.1 + np.cumsum(rng.normal(0, 1e-4, len(times)))
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        columns = {
+            'time': times,
+            'open': open_,
+            'high': np.maximum(open_, close) + np.abs(rng.normal(0, 5e-5, len(times))),
+            'low': np.minimum(open_, close) - np.abs(rng.normal(0, 5e-5, len(times))),
+            'close': close,
+            'tick_volume': rng.integers(1, 100, len(times)),
+            'spread': rng.integers(0, 20, len(times)),
+            'real_volume': np.zeros(len(times), dtype=np.int64),
+        }
+        df = pd.DataFrame({name: values for name, values in columns.items() if name != 'time'},
+                          index=pd.to_datetime(times, unit='s'))
+        for timeframe in ("M5", "M15", "H1", "H4", "D1"):
+            expected = df.resample(f"{TIMEFRAME_SECONDS[timeframe]}s").agg({
+                'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+                'tick_volume': 'sum', 'spread': 'min', 'real_volume': 'sum',
+            }).dropna(subset=['open'])
+            resampled = resample_columns(columns, timeframe)
+            assert np.array_equal(resampled['time'], expected.index.values.astype('datetime64[s]').astype(np.int64)), timeframe
+            for name in expected.columns:
+                assert np.array_equal(resampled[name], expected[name].to_numpy(dtype=resampled[name].dtype)), (timeframe, name)
+            compared += len(expected)
+    return compared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate breakout chart datasets for one or more timeframes.")
+    parser.add_argument("--timeframes", nargs="+", default=["H1"], choices=list(TIMEFRAME_SECONDS))
+    parser.add_argument("--start", type=pd.Timestamp, default=pd.Timestamp(datetime.now() - timedelta(days=365 * 5)))
+    parser.add_argument("--end", type=pd.Timestamp, default=pd.Timestamp(2023, 12, 31))
+    parser.add_argument("--geometry", type=int, nargs=3, default=list(DEFAULT_GEOMETRY),
+                        metavar=("SUPPORT", "SETUP", "FUTURE"), help="Candles in the support, setup and future blocks")
+    parser.add_argument("--output-dir", default="output_{timeframe}", help="Output directory per timeframe")
+    parser.add_argument("--symbols", nargs="+", default=SYMBOLS)
+    parser.add_argument("--bullish-limit", type=int, default=1000)
+    parser.add_argument("--bearish-limit", type=int, default=1000)
+    parser.add_argument("--check", action="store_true", help="Only run the resampling parity check against pandas")
+    add_generation_arguments(parser)
+    args = parser.parse_args()
+
+    if args.check:
+        print(f"Parity check passed on {check_parity()} resampled bars.")
+        return
+
+    configs = [
+        GenerationConfig(timeframe, args.start.to_pydatetime(), args.end.to_pydatetime(),
+                         args.output_dir.format(timeframe=timeframe), WindowGeometry(*args.geometry),
+                         args.bullish_limit, args.bearish_limit)
+        for timeframe in args.timeframes
+    ]
+    os.makedirs(configs[0].output_dir, exist_ok=True)
+    generate_timeframes(configs, args, args.symbols, os.path.join(configs[0].output_dir, "debug_log.txt"))
+
+
+# Worker processes re-import this module, so the run itself must only start from the main process
+if __name__ == "__main__":
+    main()
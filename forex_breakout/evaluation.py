@@ -0,0 +1,280 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.labeling import LABELS
+from forex_breakout.models import BACKBONE, INPUT_SHAPE
+
+# Predicted classes the notebook's spot-check grid draws its sample images from
+SPOT_CHECK_CLASSES = ("bullish_breakout", "bearish_breakout")
+
+
+class StreamingEvaluation:
+    """
+    Test-set metrics updated one batch at a time, so evaluating never holds more than a batch of images.
+
+    Keeps the confusion matrix, the cross-entropy sum, calibration bins of the top probability,
+    one compact row per sample (predicted class, its probability, true class) for
+    `test_results_df`, and a uniform reservoir of at most `reservoir_size` images whose
+    prediction is in `reservoir_classes` (all classes by default) for a visual spot check.
+    """
+
+    def __init__(self, class_names=LABELS, num_bins=10, reservoir_size=10, reservoir_classes=None, seed=42):
+        self.class_names = list(class_names)
+        self.num_bins = num_bins
+        self.matrix = np.zeros((len(self.class_names), len(self.class_names)), dtype=np.int64)
+        self.loss_sum = 0.0
+        self.bin_counts = np.zeros(num_bins, dtype=np.int64)
+        self.bin_confidence = np.zeros(num_bins)
+        self.bin_correct = np.zeros(num_bins, dtype=np.int64)
+        self.rows = []
+        self.reservoir_size = reservoir_size
+        self.reservoir_classes = [self.class_names.index(name) for name in (reservoir_classes or self.class_names)
+                                  if name in self.class_names]
+        self.reservoir = []
+        self.reservoir_seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def count(self):
+        return int(self.matrix.sum())
+
+    def update(self, probabilities, labels, images=None):
+        """
+        Add one batch of predicted probabilities and true labels (class indices or one-hot).
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        labels = np.asarray(labels)
+        if labels.ndim > 1:
+            labels = labels.argmax(axis=-1)
+        num_classes = len(self.class_names)
+        first = self.count
+        predictions = probabilities.argmax(axis=-1)
+        confidence = probabilities.max(axis=-1)
+        correct = predictions == labels
+
+        self.matrix += np.bincount(labels * num_classes + predictions,
+                                   minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+        self.loss_sum += float(-np.log(np.clip(probabilities[np.arange(len(labels)), labels], 1e-7, 1.0)).sum())
+        bins = np.minimum((confidence * self.num_bins).astype(np.int64), self.num_bins - 1)
+        self.bin_counts += np.bincount(bins, minlength=self.num_bins)
+        self.bin_confidence += np.bincount(bins, weights=confidence, minlength=self.num_bins)
+        self.bin_correct += np.bincount(bins, weights=correct, minlength=self.num_bins).astype(np.int64)
+        self.rows.append((predictions.astype(np.int8), confidence.astype(np.float32), labels.astype(np.int8)))
+
+        if images is not None and self.reservoir_size:
+            for i in np.flatnonzero(np.isin(predictions, self.reservoir_classes)):
+                self._offer(first + int(i), images[i], predictions[i], confidence[i], labels[i])
+
+    def _offer(self, index, image, prediction, probability, label):
+        # Algorithm R: every eligible sample ends up in the reservoir with the same probability
+        self.reservoir_seen += 1
+        if len(self.reservoir) < self.reservoir_size:
+            slot = len(self.reservoir)
+            self.reservoir.append(None)
+        else:
+            slot = int(self.rng.integers(self.reservoir_seen))
+            if slot >= self.reservoir_size:
+                return
+        self.reservoir[slot] = {
+            'index': index,
+            'image': np.clip(np.asarray(image), 0, 255).astype(np.uint8),
+            'pred_class_name': self.class_names[int(prediction)],
+            'pred_prob': float(probability),
+            'truth_class_name': self.class_names[int(label)],
+        }
+
+    def accuracy(self):
+        return float(np.trace(self.matrix) / self.count) if self.count else 0.0
+
+    def loss(self):
+        """
+        Mean categorical cross-entropy, as reported by `model.evaluate`.
+        """
+        return self.loss_sum / self.count if self.count else 0.0
+
+    def per_class_accuracy(self):
+        totals = self.matrix.sum(axis=1)
+        return {
+            name: float(self.matrix[i, i] / totals[i]) if totals[i] else 0.0 for i, name in enumerate(self.class_names)
+        }
+
+    def calibration(self):
+        """
+        Reliability table of the top probability: samples, mean confidence and accuracy per bin.
+        """
+        edges = np.linspace(0, 1, self.num_bins + 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({
+                'bin_lower': edges[:-1],
+                'bin_upper': edges[1:],
+                'count': self.bin_counts,
+                'mean_confidence': self.bin_confidence / self.bin_counts,
+                'accuracy': self.bin_correct / self.bin_counts,
+            })
+
+    def expected_calibration_error(self):
+        table = self.calibration()
+        filled = table['count'] > 0
+        gaps = (table['accuracy'] - table['mean_confidence']).abs()[filled]
+        return float((gaps * table['count'][filled]).sum() / self.count) if self.count else 0.0
+
+    def results_frame(self, file_paths=None):
+        """
+        The notebook's `test_results_df`: one row per sample in dataset order, plus 'correct'.
+        """
+        if self.rows:
+            predictions, probabilities, labels = (np.concatenate(parts) for parts in zip(*self.rows))
+        else:
+            predictions = labels = np.empty(0, dtype=np.int8)
+            probabilities = np.empty(0, dtype=np.float32)
+        names = np.array(self.class_names, dtype=object)
+        frame = pd.DataFrame({
+            'file_path': list(file_paths)[:len(predictions)] if file_paths is not None else None,
+            'test_pred_label': predictions,
+            'test_pred_prob': probabilities,
+            'test_pred_class_name': names[predictions],
+            'test_truth_label': labels,
+            'test_truth_class_name': names[labels],
+        })
+        frame['correct'] = frame['test_pred_label'] == frame['test_truth_label']
+        return frame
+
+    def sample_images(self):
+        """
+        Reservoir samples in dataset order (dicts with 'index', 'image', predicted and true class names).
+        """
+        return sorted(self.reservoir, key=lambda sample: sample['index'])
+
+    def report(self):
+        return {
+            'samples': self.count,
+            'loss': self.loss(),
+            'accuracy': self.accuracy(),
+            'per_class_accuracy': self.per_class_accuracy(),
+            'confusion_matrix': self.matrix.tolist(),
+            'expected_calibration_error': self.expected_calibration_error(),
+            'calibration': self.calibration().to_dict(orient='records'),
+        }
+
+
+def evaluate_stream(model, dataset, class_names=LABELS, num_bins=10, reservoir_size=10,
+                    reservoir_classes=SPOT_CHECK_CLASSES, seed=42, metrics=None):
+    """
+    Evaluate `model` on a batched (images, labels) dataset in a single prediction pass.
+
+    Replaces the notebook's `evaluate` + `predict` + `np.concatenate` of the whole test set:
+    each batch is predicted once, folded into a StreamingEvaluation and dropped. Do not
+    `.cache()` the dataset, or TensorFlow keeps every image in memory anyway.
+
+    Returns:
+        StreamingEvaluation: Incremental metrics, test result rows and the image reservoir.
+    """
+    evaluation = StreamingEvaluation(class_names, num_bins, reservoir_size, reservoir_classes, seed)
+    for images, labels in dataset:
+        images = np.asarray(images)
+        if metrics is not None:
+            with metrics.stage('inference', items=len(images)):
+                probabilities = np.asarray(model.predict_on_batch(images))
+        else:
+            probabilities = np.asarray(model.predict_on_batch(images))
+        evaluation.update(probabilities, labels, images)
+    return evaluation
+
+
+def print_evaluation(evaluation):
+    print(f"{evaluation.count} samples, loss {evaluation.loss():.4f}, accuracy {evaluation.accuracy():.4f}, "
+          f"ECE {evaluation.expected_calibration_error():.4f}")
+    for name, accuracy in evaluation.per_class_accuracy().items():
+        print(f"  {name:<18} {accuracy:.4f}")
+    print(f"Confusion matrix (rows true, columns predicted {evaluation.class_names}):")
+    print(evaluation.matrix)
+
+
+def check_parity(num_samples=1000, batch_size=32, seed=0):
+    """
+    Compare batch-by-batch StreamingEvaluation results with the same metrics computed over the
+    whole concatenated test set at once.
+
+    Returns:
+        int: Number of samples compared. Raises AssertionError on a mismatch.
+    """
+    rng = np.random.default_rng(seed)
+    probabilities = rng.dirichlet(np.ones(len(LABELS)) * 0.5, num_samples)
+    labels = rng.integers(0, len(LABELS), num_samples)
+    images = rng.integers(0, 256, (num_samples, 4, 4, 3)).astype(np.float32)
+    evaluation = StreamingEvaluation(reservoir_size=7, reservoir_classes=SPOT_CHECK_CLASSES, seed=seed)
+    for lo in range(0, num_samples, batch_size):
+        evaluation.update(probabilities[lo:lo + batch_size], np.eye(len(LABELS))[labels[lo:lo + batch_size]],
+                          images[lo:lo + batch_size])
+
+    predictions = probabilities.argmax(axis=-1)
+    confidence = probabilities.max(axis=-1)
+    expected = np.zeros((len(LABELS), len(LABELS)), dtype=np.int64)
+    np.add.at(expected, (labels, predictions), 1)
+    assert np.array_equal(evaluation.matrix, expected)
+    assert np.isclose(evaluation.accuracy(), (predictions == labels).mean())
+    assert np.isclose(evaluation.loss(), -np.log(np.clip(probabilities[np.arange(num_samples), labels], 1e-7, 1)).mean())
+
+    results = evaluation.results_frame([f"{i}.png" for i in range(num_samples)])
+    assert np.array_equal(results['test_pred_label'], predictions)
+    assert np.array_equal(results['test_truth_label'], labels)
+    assert np.allclose(results['test_pred_prob'], confidence)
+    per_class = results.groupby('test_truth_class_name')['correct'].mean()
+    for name, accuracy in evaluation.per_class_accuracy().items():
+        assert np.isclose(per_class.get(name, 0.0), accuracy), name
+
+    calibration = evaluation.calibration()
+    bins = np.minimum((confidence * evaluation.num_bins).astype(int), evaluation.num_bins - 1)
+    for i, row in calibration.iterrows():
+        members = bins == i
+        assert row['count'] == members.sum()
+        if members.any():
+            assert np.isclose(row['mean_confidence'], confidence[members].mean())
+            assert np.isclose(row['accuracy'], (predictions == labels)[members].mean())
+
+    assert len(evaluation.reservoir) == 7
+    for sample in evaluation.sample_images():
+        assert sample['pred_class_name'] in SPOT_CHECK_CLASSES
+        assert np.array_equal(sample['image'], images[sample['index']].astype(np.uint8))
+    return num_samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate trained weights on a test image folder in one streaming pass.")
+    parser.add_argument("--weights", help="Trained model_0 weights")
+    parser.add_argument("--backbone", default=BACKBONE)
+    parser.add_argument("--test-dir", help="Test images (<test-dir>/<class>/*.png)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--bins", type=int, default=10, help="Calibration bins")
+    parser.add_argument("--report", help="Write the metrics as JSON to this file")
+    parser.add_argument("--results", help="Write test_results_df as CSV to this file")
+    parser.add_argument("--check", action="store_true", help="Only run the streaming parity check")
+    args = parser.parse_args()
+
+    if args.check:
+        print(f"Parity check passed on {check_parity()} samples.")
+        return
+    if not args.weights or not args.test_dir:
+        parser.error("--weights and --test-dir are required")
+
+    from forex_breakout.feature_cache import list_image_directory, load_images
+    from forex_breakout.models import load_trained_model
+
+    model = load_trained_model(args.weights, num_classes=len(LABELS), name=args.backbone, input_shape=INPUT_SHAPE)
+    paths, labels, class_names = list_image_directory(args.test_dir)
+    batches = zip(load_images(paths, batch_size=args.batch_size),
+                  (labels[lo:lo + args.batch_size] for lo in range(0, len(labels), args.batch_size)))
+    evaluation = evaluate_stream(model, batches, class_names, num_bins=args.bins, reservoir_size=0)
+    print_evaluation(evaluation)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(evaluation.report(), f, indent=2)
+    if args.results:
+        evaluation.results_frame(paths).to_csv(args.results, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.feature_cache import list_image_directory, load_images
+from forex_breakout.labeling import LABELS
+from forex_breakout.models import BACKBONE, IMG_SIZE, INPUT_SHAPE
+
+QUANTIZATION_MODES = ("int8", "dynamic")
+
+
+def representative_images(paths, count=200, seed=42, image_size=IMG_SIZE):
+    """
+    A fixed random sample of training images for post-training quantization calibration.
+    """
+    rng = np.random.default_rng(seed)
+    sample = [paths[i] for i in rng.choice(len(paths), min(count, len(paths)), replace=False)]
+    return np.concatenate([images.numpy() for images in load_images(sample, image_size, batch_size=32)])
+
+
+def export_tflite(model, path, calibration_images=None, mode="int8"):
+    """
+    Convert a Keras model to a quantized TFLite flatbuffer.
+
+    "int8" quantizes weights and activations using `calibration_images` to pick the activation
+    ranges (inputs and outputs stay float32, so callers feed the same arrays as to Keras);
+    "dynamic" only stores weights as int8.
+
+    Returns:
+        int: Size of the written file in bytes.
+    """
+    import tensorflow as tf
+
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode {mode!r}, expected one of {QUANTIZATION_MODES}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "int8":
+        if calibration_images is None:
+            raise ValueError("int8 quantization needs calibration images")
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[None].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    flatbuffer = converter.convert()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(flatbuffer)
+    return len(flatbuffer)
+
+
+class TFLiteClassifier:
+    """
+    Runs an exported TFLite model with the `predict_on_batch` interface of a Keras model, so it can
+    be passed to `predict_charts`, `predict_pairs` and the inference server.
+    """
+
+    def __init__(self, path, num_threads=None):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+
+        self.path = path
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self._input = self.interpreter.get_input_details()[0]['index']
+        self._output = self.interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+
+    def predict_on_batch(self, images):
+        images = np.asarray(images, dtype=np.float32)
+        if self._batch_size != len(images):
+            self.interpreter.resize_tensor_input(self._input, images.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(images)
+        self.interpreter.set_tensor(self._input, images)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output).copy()
+
+    def predict(self, images, batch_size=32, verbose=0):
+        images = np.asarray(images)
+        return np.concatenate([self.predict_on_batch(images[lo:lo + batch_size])
+                               for lo in range(0, len(images), batch_size)])
+
+
+def teacher_probabilities(teacher, paths, batch_size=32, image_size=IMG_SIZE):
+    """
+    Teacher class probabilities for every training image, computed once before distillation.
+    """
+    return teacher.predict(load_images(paths, image_size, batch_size=batch_size), verbose=0)
+
+
+def distill_student(teacher, train_paths, valid_paths, valid_labels, student_backbone="EfficientNetV2B0",
+                    epochs=20, batch_size=32, learning_rate=0.001, patience=3, image_size=IMG_SIZE, seed=42,
+                    weights="imagenet"):
+    """
+    Train a smaller student model on the teacher's soft probabilities over the training images.
+
+    The student uses the same head as `create_model` on an ImageNet-pretrained backbone that is
+    fine-tuned end to end (`weights=None` starts from scratch); validation accuracy is measured
+    against the true labels.
+
+    Returns:
+        tuple: (student model, History)
+    """
+    import tensorflow as tf
+    import tf_keras
+
+    from forex_breakout.models import create_base_model, create_model
+
+    tf_keras.utils.set_random_seed(seed)
+    soft_labels = teacher_probabilities(teacher, train_paths, batch_size, image_size)
+
+    def load(path, target):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        return tf.image.resize(image, image_size), target
+
+    train_ds = (
+        tf.data.Dataset.from_tensor_slices((list(train_paths), soft_labels))
+        .shuffle(len(train_paths), seed=seed)
+        .map(load, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+    valid_ds = (
+        tf.data.Dataset.from_tensor_slices((list(valid_paths), tf_keras.utils.to_categorical(valid_labels, len(LABELS))))
+        .map(load, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+    base_model = create_base_model(name=student_backbone, input_shape=image_size + (3,), weights=weights)
+    student = create_model(num_classes=len(LABELS), input_shape=image_size + (3,), trainable=True,
+                           base_model=base_model, model_name=f"student_{student_backbone}")
+    student.compile(optimizer=tf_keras.optimizers.Adam(learning_rate=learning_rate),
+                    loss=tf_keras.losses.CategoricalCrossentropy(from_logits=False),
+                    metrics=["accuracy"])
+    history = student.fit(
+        train_ds,
+        epochs=epochs,
+        validation_data=valid_ds,
+        callbacks=[tf_keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=patience,
+                                                    restore_best_weights=True)],
+    )
+    return student, history
+
+
+def confusion_matrix(labels, predictions, num_classes=len(LABELS)):
+    """
+    Rows are true classes, columns predicted classes.
+    """
+    return np.bincount(np.asarray(labels) * num_classes + np.asarray(predictions),
+                       minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+def classification_report(probabilities, labels):
+    return matrix_report(confusion_matrix(labels, np.asarray(probabilities).argmax(axis=-1)))
+
+
+def matrix_report(matrix):
+    """
+    Accuracy, per-class accuracy and confusion matrix from a confusion matrix alone.
+    """
+    return {
+        'accuracy': float(np.trace(matrix) / matrix.sum()) if matrix.sum() else 0.0,
+        'per_class_accuracy': {
+            name: float(matrix[i, i] / matrix[i].sum()) if matrix[i].sum() else 0.0 for i, name in enumerate(LABELS)
+        },
+        'confusion_matrix': matrix.tolist(),
+    }
+
+
+def backtest_pnl(model, backtest_root, batch_size=32):
+    """
+    Total P&L per pair of the notebook backtest (0.95 threshold, -100 stop) with this model's predictions.
+
+    Window bars come from the backtest root's window store, or its per-window CSVs for older exports.
+    """
+    from forex_breakout.backtest import DIRECTIONS, PROBABILITY_THRESHOLD, simulate_signals
+    from forex_breakout.inference import predict_pairs
+    from forex_breakout.window_store import WindowStore
+
+    predictions = predict_pairs(model, backtest_root, list(LABELS), batch_size=batch_size)
+    signals = predictions[predictions['pred_class'].isin(list(DIRECTIONS))
+                          & (predictions['pred_prob'] >= PROBABILITY_THRESHOLD)]
+    store = WindowStore.open(backtest_root)
+    if store is None:
+        signals = signals.assign(file_path=[
+            os.path.join(backtest_root, pair, "data", os.path.basename(image_path).replace(".png", ".csv"))
+            for pair, image_path in zip(signals['pair'], signals['image_path'])
+        ])
+    pnl = {}
+    for pair, pair_signals in signals.groupby('pair'):
+        trades, _ = simulate_signals(pair_signals, store=store)
+        pnl[pair] = float(trades['profit'].sum())
+    return pnl
+
+
+def benchmark_latency(model, batch_sizes=(1, 8, 32), runs=10, image_size=IMG_SIZE):
+    """
+    Median latency per call and throughput for several batch sizes.
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        images = np.random.default_rng(0).uniform(0, 255, (batch_size, *image_size, 3)).astype(np.float32)
+        model.predict_on_batch(images)  # Warm-up
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model.predict_on_batch(images)
+            timings.append(time.perf_counter() - start)
+        median = float(np.median(timings))
+        results[batch_size] = {'latency_ms': median * 1000, 'images_per_sec': batch_size / median}
+    return results
+
+
+def compare_models(models, test_dir, backtest_root=None, batch_size=32, latency_runs=10):
+    """
+    Accuracy, confusion matrices, backtest P&L and latency of every model, with differences to the first one.
+
+    Args:
+        models (dict): name -> Keras model or TFLiteClassifier; the first entry is the reference.
+
+    Returns:
+        dict: Report per model name.
+    """
+    paths, labels, _ = list_image_directory(test_dir)
+    labels = np.asarray(labels)
+
+    # One streamed pass over the test set: every model sees each batch, only running counts are kept
+    matrices = {name: np.zeros((len(LABELS), len(LABELS)), dtype=np.int64) for name in models}
+    agreement = dict.fromkeys(models, 0)
+    seen = 0
+    for images in load_images(paths, batch_size=batch_size):
+        images = images.numpy()
+        batch_labels = labels[seen:seen + len(images)]
+        seen += len(images)
+        reference_predictions = None
+        for name, model in models.items():
+            predictions = np.asarray(model.predict_on_batch(images)).argmax(axis=-1)
+            matrices[name] += confusion_matrix(batch_labels, predictions)
+            if reference_predictions is None:
+                reference_predictions = predictions
+            agreement[name] += int((predictions == reference_predictions).sum())
+
+    report, reference = {}, None
+    for name, model in models.items():
+        entry = matrix_report(matrices[name])
+        entry['latency'] = benchmark_latency(model, runs=latency_runs)
+        if backtest_root:
+            entry['backtest_pnl'] = backtest_pnl(model, backtest_root, batch_size)
+            entry['backtest_total_pnl'] = float(sum(entry['backtest_pnl'].values()))
+
+        if reference is None:
+            reference = (name, entry)
+        else:
+            reference_name, reference_entry = reference
+            entry['vs'] = reference_name
+            entry['accuracy_diff'] = entry['accuracy'] - reference_entry['accuracy']
+            entry['prediction_agreement'] = agreement[name] / seen if seen else 0.0
+            entry['confusion_matrix_diff'] = (
+                np.asarray(entry['confusion_matrix']) - np.asarray(reference_entry['confusion_matrix'])).tolist()
+            if backtest_root:
+                entry['backtest_pnl_diff'] = entry['backtest_total_pnl'] - reference_entry['backtest_total_pnl']
+        report[name] = entry
+    return report
+
+
+def print_report(report):
+    rows = []
+    for name, entry in report.items():
+        rows.append({
+            'model': name,
+            'accuracy': entry['accuracy'],
+            'accuracy_diff': entry.get('accuracy_diff', 0.0),
+            'agreement': entry.get('prediction_agreement', 1.0),
+            'backtest_pnl': entry.get('backtest_total_pnl'),
+            'pnl_diff': entry.get('backtest_pnl_diff', 0.0 if 'backtest_total_pnl' in entry else None),
+            'batch1_ms': entry['latency'][1]['latency_ms'],
+            'batch32_img_s': entry['latency'][32]['images_per_sec'],
+        })
+    print(pd.DataFrame(rows).to_string(index=False))
+    for name, entry in report.items():
+        if 'confusion_matrix_diff' in entry:
+            print(f"Confusion matrix difference {name} - {entry['vs']} (rows true {list(LABELS)}):")
+            print(np.asarray(entry['confusion_matrix_diff']))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export CPU inference artifacts (int8 TFLite, optional distilled student) and compare them."
+    )
+    parser.add_argument("--weights", required=True, help="Trained model_0 weights")
+    parser.add_argument("--backbone", default=BACKBONE)
+    parser.add_argument("--train-dir", required=True, help="Training images (calibration and distillation)")
+    parser.add_argument("--valid-dir", help="Validation images (needed with --distill)")
+    parser.add_argument("--test-dir", required=True, help="Test images for the accuracy comparison")
+    parser.add_argument("--backtest-root", help="Backtest pairs folder (<pair>/charts plus window store or data CSVs) for P&L diffs")
+    parser.add_argument("--output-dir", default="export")
+    parser.add_argument("--calibration-images", type=int, default=200)
+    parser.add_argument("--distill", action="store_true", help="Also train and export a distilled student")
+    parser.add_argument("--student", default="EfficientNetV2B0")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--num-threads", type=int, default=None, help="TFLite interpreter threads")
+    args = parser.parse_args()
+
+    from forex_breakout.models import load_trained_model
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    teacher = load_trained_model(args.weights, num_classes=len(LABELS), name=args.backbone, input_shape=INPUT_SHAPE)
+    train_paths, _, _ = list_image_directory(args.train_dir)
+    calibration = representative_images(train_paths, args.calibration_images)
+
+    models = {'model_0': teacher}
+    teacher_path = os.path.join(args.output_dir, "model_0_int8.tflite")
+    print(f"model_0 int8: {export_tflite(teacher, teacher_path, calibration) / 1e6:.1f} MB")
+    models['model_0_int8'] = TFLiteClassifier(teacher_path, args.num_threads)
+
+    if args.distill:
+        if not args.valid_dir:
+            parser.error("--distill needs --valid-dir")
+        valid_paths, valid_labels, _ = list_image_directory(args.valid_dir)
+        student, _ = distill_student(teacher, train_paths, valid_paths, valid_labels, args.student, args.epochs)
+        student.save_weights(os.path.join(args.output_dir, f"student_{args.student}.keras"), save_format="h5")
+        student_path = os.path.join(args.output_dir, f"student_{args.student}_int8.tflite")
+        print(f"student int8: {export_tflite(student, student_path, calibration) / 1e6:.1f} MB")
+        models[f"student_{args.student}"] = student
+        models[f"student_{args.student}_int8"] = TFLiteClassifier(student_path, args.num_threads)
+
+    report = compare_models(models, args.test_dir, args.backtest_root)
+    with open(os.path.join(args.output_dir, "export_report.json"), "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
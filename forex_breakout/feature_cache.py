@@ -0,0 +1,307 @@
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from forex_breakout.bar_cache import _atomic_save_npy, _atomic_write_json
+from forex_breakout.models import (
+    IMG_SIZE,
+    INPUT_SHAPE,
+    POOLING,
+    RESIZE_METHOD,
+    backbone_fingerprint,
+    create_base_model,
+    create_head,
+    create_model,
+    transfer_head,
+)
+
+CONFIG_FILE = "config.json"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+
+
+def image_key(path):
+    """
+    Content hash of an image file, so renamed or copied charts still hit the cache.
+    """
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def list_image_directory(directory):
+    """
+    Image paths and integer labels of a class-per-folder directory, in image_dataset_from_directory order.
+
+    Returns:
+        tuple: (paths, labels, class_names)
+    """
+    class_names = sorted(
+        name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name))
+    )
+    paths, labels = [], []
+    for label, class_name in enumerate(class_names):
+        for root, _, files in sorted(os.walk(os.path.join(directory, class_name))):
+            for file in sorted(files):
+                if file.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, file))
+                    labels.append(label)
+    return paths, np.asarray(labels, dtype=np.int64), class_names
+
+
+class FeatureCache:
+    """
+    Pooled backbone embeddings stored on disk, keyed by image content and backbone fingerprint.
+
+    Each fingerprint gets its own directory `<root>/<fingerprint>/`, so changing the backbone
+    weights, input size or preprocessing starts from an empty cache instead of serving stale
+    embeddings. Embeddings are appended as segments (`segment-<pid>-<uuid>.embeddings.npy` plus the
+    matching `.keys.npy`), so processes appending to the same entry never overwrite each other's
+    segments, and memory-mapped on read.
+    """
+
+    def __init__(self, root, fingerprint, config=None):
+        self.root = root
+        self.fingerprint = fingerprint
+        self.entry_dir = os.path.join(root, fingerprint)
+        os.makedirs(self.entry_dir, exist_ok=True)
+        if config is not None and not os.path.exists(os.path.join(self.entry_dir, CONFIG_FILE)):
+            _atomic_write_json(os.path.join(self.entry_dir, CONFIG_FILE), config)
+        self._segments = None
+        self._index = None
+
+    def _load(self):
+        if self._index is not None:
+            return
+        self._segments, self._index = [], {}
+        # The keys file is written last, so a segment without one is incomplete and ignored
+        for keys_path in sorted(glob.glob(os.path.join(self.entry_dir, "segment-*.keys.npy"))):
+            embeddings = np.load(keys_path.replace(".keys.npy", ".embeddings.npy"), mmap_mode='r')
+            keys = np.load(keys_path)
+            if len(keys) != len(embeddings):
+                continue
+            segment = len(self._segments)
+            self._segments.append(embeddings)
+            for row, key in enumerate(keys.tolist()):
+                self._index[key] = (segment, row)
+
+    def __len__(self):
+        self._load()
+        return len(self._index)
+
+    def missing(self, keys):
+        """
+        Keys that have no cached embedding yet (duplicates removed, order kept).
+        """
+        self._load()
+        return list(dict.fromkeys(key for key in keys if key not in self._index))
+
+    def get(self, keys):
+        """
+        Embeddings of the given keys as one (len(keys), dim) float32 array; every key must be cached.
+        """
+        self._load()
+        locations = [self._index[key] for key in keys]
+        if not locations:
+            return np.empty((0, 0), dtype=np.float32)
+        dim = self._segments[locations[0][0]].shape[1]
+        embeddings = np.empty((len(locations), dim), dtype=np.float32)
+        for i, (segment, row) in enumerate(locations):
+            embeddings[i] = self._segments[segment][row]
+        return embeddings
+
+    def add(self, keys, embeddings):
+        """
+        Store a new segment of embeddings.
+        """
+        self._load()
+        prefix = os.path.join(self.entry_dir, f"segment-{os.getpid()}-{uuid.uuid4().hex}")
+        _atomic_save_npy(f"{prefix}.embeddings.npy", np.ascontiguousarray(embeddings, dtype=np.float32))
+        _atomic_save_npy(f"{prefix}.keys.npy", np.asarray(keys, dtype="U32"))
+        self._segments, self._index = None, None
+
+    def prune_stale(self):
+        """
+        Delete the cached embeddings of every other fingerprint under the same root.
+
+        Returns:
+            int: Number of stale fingerprints removed.
+        """
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name != self.fingerprint and os.path.isdir(path):
+                shutil.rmtree(path)
+                removed += 1
+        return removed
+
+
+def open_feature_cache(root, base_model, input_shape=INPUT_SHAPE, include_preprocessing=True, pooling=POOLING,
+                       resize_method=RESIZE_METHOD, weights=None):
+    """
+    Open the cache directory that matches this backbone and preprocessing configuration.
+
+    `weights` says where the backbone weights came from ("imagenet" or a weights file), see
+    `weights_fingerprint`.
+    """
+    fingerprint = backbone_fingerprint(base_model, input_shape, include_preprocessing, pooling, resize_method,
+                                       weights)
+    config = {
+        'backbone': base_model.name,
+        'input_shape': list(input_shape),
+        'include_preprocessing': include_preprocessing,
+        'pooling': pooling,
+        'resize_method': resize_method,
+    }
+    return FeatureCache(root, fingerprint, config)
+
+
+def load_images(paths, image_size=IMG_SIZE, resize_method=RESIZE_METHOD, batch_size=32):
+    """
+    Batched float32 images decoded and resized the same way as image_dataset_from_directory.
+    """
+    import tensorflow as tf
+
+    def load(path):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        return tf.image.resize(image, image_size, method=resize_method)
+
+    return (
+        tf.data.Dataset.from_tensor_slices(list(paths))
+        .map(load, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+
+def extract_features(base_model, paths, cache, image_size=IMG_SIZE, resize_method=RESIZE_METHOD, batch_size=32):
+    """
+    Pooled embeddings of every image, running the frozen backbone only on images not cached yet.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(paths), embedding_dim), in the order of `paths`.
+    """
+    keys = [image_key(path) for path in paths]
+    missing = cache.missing(keys)
+    print(f"Feature cache: {len(keys) - len(missing)} hits, {len(missing)} to extract")
+
+    if missing:
+        path_of_key = dict(zip(keys, paths))
+        images = load_images([path_of_key[key] for key in missing], image_size, resize_method, batch_size)
+        embeddings = base_model.predict(images, verbose=0)
+        cache.add(missing, embeddings)
+
+    return cache.get(keys)
+
+
+def directory_features(base_model, directory, cache, image_size=IMG_SIZE, resize_method=RESIZE_METHOD,
+                       batch_size=32):
+    """
+    Embeddings and integer labels of a class-per-folder image directory.
+
+    Returns:
+        tuple: (features, labels, class_names, paths)
+    """
+    paths, labels, class_names = list_image_directory(directory)
+    features = extract_features(base_model, paths, cache, image_size, resize_method, batch_size)
+    return features, labels, class_names, paths
+
+
+def train_head(train_features, train_labels, valid_features, valid_labels, num_classes, learning_rate=0.001,
+               epochs=1000, patience=5, batch_size=32, seed=42):
+    """
+    Train the classifier head on cached embeddings with the notebook's optimizer, loss and early stopping.
+
+    Returns:
+        tuple: (head model, History)
+    """
+    import tf_keras
+
+    tf_keras.utils.set_random_seed(seed)
+    head = create_head(train_features.shape[1], num_classes)
+    head.compile(optimizer=tf_keras.optimizers.Adam(learning_rate=learning_rate),
+                 loss=tf_keras.losses.CategoricalCrossentropy(from_logits=False),
+                 metrics=["accuracy"])
+    early_stopping = tf_keras.callbacks.EarlyStopping(
+        monitor='val_accuracy',
+        patience=patience,
+        restore_best_weights=True,
+    )
+    history = head.fit(
+        x=train_features,
+        y=tf_keras.utils.to_categorical(train_labels, num_classes),
+        batch_size=batch_size,
+        epochs=epochs,
+        shuffle=True,
+        validation_data=(valid_features, tf_keras.utils.to_categorical(valid_labels, num_classes)),
+        callbacks=[early_stopping],
+        verbose=0,
+    )
+    return head, history
+
+
+def evaluate_head(head, features, labels):
+    """
+    Loss and accuracy of a head model on cached embeddings, as model.evaluate returns them.
+    """
+    import tf_keras
+
+    num_classes = head.output_shape[-1]
+    return head.evaluate(features, tf_keras.utils.to_categorical(labels, num_classes), verbose=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Extract frozen-backbone embeddings once and train/evaluate the classifier head on them."
+    )
+    parser.add_argument("--train-dir", required=True, help="Training images (one folder per class)")
+    parser.add_argument("--valid-dir", required=True, help="Validation images (one folder per class)")
+    parser.add_argument("--test-dir", help="Optional test images to evaluate the best head on")
+    parser.add_argument("--cache-dir", default="feature_cache", help="Embedding cache directory")
+    parser.add_argument("--learning-rates", type=float, nargs="+", default=[0.001],
+                        help="Learning rates to sweep for the head")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=1000)
+    parser.add_argument("--patience", type=int, default=5)
+    parser.add_argument("--prune-stale", action="store_true",
+                        help="Delete cached embeddings of other backbones/preprocessing settings")
+    parser.add_argument("--save-weights", help="Save the full model weights with the best head to this path")
+    args = parser.parse_args()
+
+    base_model = create_base_model()
+    base_model.trainable = False
+    cache = open_feature_cache(args.cache_dir, base_model, weights="imagenet")
+    if args.prune_stale:
+        print(f"Removed {cache.prune_stale()} stale feature caches")
+
+    train_features, train_labels, class_names, _ = directory_features(base_model, args.train_dir, cache)
+    valid_features, valid_labels, _, _ = directory_features(base_model, args.valid_dir, cache)
+
+    best_head, best_accuracy = None, -1.0
+    for learning_rate in args.learning_rates:
+        head, history = train_head(
+            train_features, train_labels, valid_features, valid_labels, len(class_names),
+            learning_rate=learning_rate, epochs=args.epochs, patience=args.patience, batch_size=args.batch_size,
+        )
+        accuracy = max(history.history['val_accuracy'])
+        print(f"learning_rate={learning_rate:g}: best val_accuracy {accuracy:.4f} "
+              f"after {len(history.history['val_accuracy'])} epochs")
+        if accuracy > best_accuracy:
+            best_head, best_accuracy = head, accuracy
+
+    if args.test_dir:
+        test_features, test_labels, _, _ = directory_features(base_model, args.test_dir, cache)
+        loss, accuracy = evaluate_head(best_head, test_features, test_labels)
+        print(f"Test loss {loss:.4f}, accuracy {accuracy:.4f}")
+
+    if args.save_weights:
+        model = transfer_head(best_head, create_model(num_classes=len(class_names), base_model=base_model))
+        model.save_weights(args.save_weights, save_format="h5")
+        print(f"Weights saved to {args.save_weights}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,516 @@
+import hashlib
+import math
+import os
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.bar_cache import BarCache
+from forex_breakout.data_source import window_starts
+from forex_breakout.labeling import (
+    BEARISH, BULLISH, DEFAULT_GEOMETRY, LABELS, NO_BREAKOUT, entry_offset, label_windows, window_length,
+)
+from forex_breakout.manifest import (
+    MANIFEST_COLUMNS,
+    SHARD_COLUMNS,
+    checkpoint_path,
+    read_checkpoint,
+    read_manifest,
+    write_checkpoint,
+    write_manifest,
+)
+from forex_breakout.metrics import RunMetrics
+from forex_breakout.rendering import encode_png, iter_window_charts, render_windows
+from forex_breakout.shards import SHARD_FORMATS, SHARD_IMAGE_SIZE, shard_path, write_index, write_npy_shard, write_tfrecord_shard
+
+SPLITS = ("train", "validation", "test")
+TRAIN, VALIDATION, TEST = range(len(SPLITS))
+
+# Same split probabilities as the original nested random.random() < 0.5 checks
+SPLIT_THRESHOLDS = (0.5, 0.75)
+# Default split seed of every dataset built from bars (image charts, shards and numeric windows),
+# so the same windows land in the same split whichever model they are built for
+SPLIT_SEED = 42
+
+# Output folders used by the generation scripts
+OutputLayout = namedtuple("OutputLayout", ["output_dir", "train_val_dir", "test_dir", "future_dir"])
+
+# One unit of parallel work: a contiguous range of windows of one symbol, optionally only those
+# starting after a high-water mark (epoch seconds) of an earlier build
+Task = namedtuple(
+    "Task",
+    ["cache_root", "symbol", "timeframe", "start", "end", "shard", "num_shards", "seed", "geometry", "after"],
+    defaults=[None],
+)
+
+# Rendering work for one chunk of selected samples of a symbol
+RenderJob = namedtuple("RenderJob", ["cache_root", "symbol", "timeframe", "start", "end", "geometry", "samples"])
+
+# Rendering work for one fixed-size shard of a split (samples may come from several symbols)
+ShardJob = namedtuple("ShardJob", ["cache_root", "timeframe", "start", "end", "geometry", "samples", "path", "shard_format", "image_size"])
+
+# What a rendering worker reports back: samples written and the time spent rendering and writing them
+JobStats = namedtuple("JobStats", ["written", "render_seconds", "write_seconds"])
+
+
+def split_dir(layout, split, future=False):
+    """
+    Directory holding one split (train/validation/test), or its mirror under the future folder.
+    """
+    parent = layout.test_dir if split == "test" else layout.train_val_dir
+    path = os.path.join(parent, split)
+    return path.replace(layout.output_dir, layout.future_dir, 1) if future else path
+
+
+def _mix64(x):
+    """
+    splitmix64 finalizer on uint64 arrays (wrapping arithmetic): a cheap, well-mixed vectorized hash.
+    """
+    with np.errstate(over='ignore'):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def window_keys(seed, symbol, timestamps, salt="split"):
+    """
+    Deterministic uniform [0, 1) keys derived from the seed, the symbol and each window timestamp.
+
+    Keys do not depend on processing order or worker count, so splits and sampling are reproducible.
+    """
+    digest = hashlib.blake2b(f"{seed}:{symbol}:{salt}".encode(), digest_size=8).digest()
+    base = np.uint64(int.from_bytes(digest, "little"))
+    hashed = _mix64(_mix64(np.asarray(timestamps, dtype=np.int64).astype(np.uint64) ^ base))
+    return (hashed >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def assign_splits(seed, symbol, timestamps):
+    """
+    Split codes (TRAIN/VALIDATION/TEST) for window timestamps: 50% / 25% / 25%.
+    """
+    return np.searchsorted(SPLIT_THRESHOLDS, window_keys(seed, symbol, timestamps), side='right').astype(np.int8)
+
+
+def chart_filename(symbol, timestamp, future=False):
+    """
+    File name used for a window's chart, e.g. 'EURUSD_202301020300.png'.
+    """
+    stamp = np.datetime64(int(timestamp), 's').astype(object).strftime('%Y%m%d%H%M')
+    return f"{'future_' if future else ''}{symbol}_{stamp}.png"
+
+
+def _shard_starts(num_bars, task):
+    starts = window_starts(num_bars, task.geometry)
+    bounds = np.linspace(0, len(starts), task.num_shards + 1).astype(np.int64)
+    return starts[bounds[task.shard]:bounds[task.shard + 1]]
+
+
+def collect_candidates(task):
+    """
+    Label and assign splits to every window of one shard of a symbol (runs in a worker process).
+
+    Windows starting at or before `task.after` were handled by an earlier build and are skipped;
+    only the bars the remaining windows cover are labelled.
+
+    Returns:
+        dict: Parallel arrays 'start', 'time', 'split', 'label' and 'rank' for the shard's windows,
+        plus the task's 'symbol' and the worker 'seconds' spent on it.
+    """
+    started = time.perf_counter()
+    columns = BarCache(task.cache_root).read_arrays(task.symbol, task.timeframe, task.start, task.end)
+    if columns is None:
+        starts = np.empty(0, dtype=np.int64)
+        times = labels = np.empty(0, dtype=np.int64)
+    else:
+        starts = _shard_starts(len(columns['close']), task)
+        if task.after is not None:
+            starts = starts[np.asarray(columns['time'][starts]) > task.after]
+        times = np.asarray(columns['time'][starts])
+        first = starts[0] if len(starts) else 0
+        stop = starts[-1] + window_length(task.geometry) if len(starts) else 0
+        labels = label_windows(columns['high'][first:stop], columns['low'][first:stop], columns['close'][first:stop],
+                               task.geometry)
+        labels = labels[starts - first]
+    return {
+        'symbol': task.symbol,
+        'start': starts,
+        'time': times,
+        'split': assign_splits(task.seed, task.symbol, times),
+        'label': labels,
+        'rank': window_keys(task.seed, task.symbol, times, salt="rank"),
+        'seconds': time.perf_counter() - started,
+    }
+
+
+class SampleReservoir:
+    """
+    Keeps the `capacity` lowest-ranked samples offered so far: a deterministic reservoir sample.
+
+    Samples are offered in batches of parallel arrays; only the retained rows are held in memory,
+    together with the count of everything seen.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.seen = 0
+        self.samples = None
+
+    def offer(self, samples):
+        """
+        Offer a batch (dict of equal-length arrays, including 'rank').
+        """
+        self.seen += len(samples['rank'])
+        if self.samples is not None:
+            samples = {name: np.concatenate([self.samples[name], values]) for name, values in samples.items()}
+        if len(samples['rank']) > self.capacity:
+            order = np.argsort(samples['rank'], kind='stable')[:self.capacity]
+            samples = {name: values[order] for name, values in samples.items()}
+        self.samples = samples
+
+    def take(self, count):
+        """
+        The `count` lowest-ranked retained samples.
+        """
+        if self.samples is None:
+            return {}
+        order = np.argsort(self.samples['rank'], kind='stable')[:count]
+        return {name: values[order] for name, values in self.samples.items()}
+
+
+def select_samples(candidate_batches, bullish_limit, bearish_limit, existing=None):
+    """
+    Decide which windows to keep before anything is rendered.
+
+    Per split, at most `bullish_limit` bullish and `bearish_limit` bearish windows are kept, and
+    no_breakout is balanced to the larger of the two kept breakout counts (what
+    `adjust_no_breakout_folder` used to enforce by deleting files). Counts live in memory and the
+    choice only depends on the deterministic rank keys, not on the order batches arrive in.
+
+    When extending an earlier build, `existing` holds its sample counts per (split, label name):
+    those samples stay, and new windows only fill what is left of the limits and the balance.
+
+    Args:
+        candidate_batches: Iterable of dicts returned by `collect_candidates`.
+
+    Returns:
+        tuple: (selected samples as a DataFrame, dict of windows seen per (split, label)).
+    """
+    capacities = {BULLISH: bullish_limit, BEARISH: bearish_limit, NO_BREAKOUT: max(bullish_limit, bearish_limit)}
+    reservoirs = {
+        (split, label): SampleReservoir(capacity)
+        for split in range(len(SPLITS))
+        for label, capacity in capacities.items()
+    }
+
+    for batch in candidate_batches:
+        symbols = np.full(len(batch['start']), batch['symbol'], dtype=object)
+        for (split, label), reservoir in reservoirs.items():
+            members = (batch['split'] == split) & (batch['label'] == label)
+            if members.any():
+                reservoir.offer({
+                    'symbol': symbols[members],
+                    'start': batch['start'][members],
+                    'time': batch['time'][members],
+                    'rank': batch['rank'][members],
+                })
+
+    existing = existing or {}
+    frames = []
+    for split in range(len(SPLITS)):
+        have = {label: existing.get((SPLITS[split], LABELS[label]), 0) for label in capacities}
+        kept = {
+            label: len(reservoirs[(split, label)].take(max(capacities[label] - have[label], 0)).get('rank', []))
+            for label in (BULLISH, BEARISH)
+        }
+        targets = {
+            BULLISH: kept[BULLISH],
+            BEARISH: kept[BEARISH],
+            NO_BREAKOUT: max(have[BULLISH] + kept[BULLISH], have[BEARISH] + kept[BEARISH]) - have[NO_BREAKOUT],
+        }
+        for label, target in targets.items():
+            samples = reservoirs[(split, label)].take(max(target, 0))
+            if samples:
+                frame = pd.DataFrame(samples)
+                frame['split'] = SPLITS[split]
+                frame['label'] = LABELS[label]
+                frames.append(frame)
+
+    seen = {(SPLITS[split], LABELS[label]): reservoir.seen for (split, label), reservoir in reservoirs.items()}
+    if not frames:
+        return pd.DataFrame(columns=['symbol', 'start', 'time', 'rank', 'split', 'label']), seen
+    selected = pd.concat(frames, ignore_index=True).sort_values(['symbol', 'start'], kind='stable', ignore_index=True)
+    return selected, seen
+
+
+def add_chart_paths(selected, layout):
+    """
+    Add the chart and future chart paths of every selected sample (and a readable 'time' column).
+    """
+    selected = selected.copy()
+    timestamps = selected['time'].to_numpy(dtype=np.int64)
+    selected['chart_path'] = [
+        os.path.join(split_dir(layout, split), label, chart_filename(symbol, timestamp))
+        for symbol, timestamp, split, label in zip(selected['symbol'], timestamps, selected['split'], selected['label'])
+    ]
+    selected['future_chart_path'] = [
+        os.path.join(split_dir(layout, split, future=True), label, chart_filename(symbol, timestamp, future=True))
+        for symbol, timestamp, split, label in zip(selected['symbol'], timestamps, selected['split'], selected['label'])
+    ]
+    selected['time'] = pd.to_datetime(timestamps, unit='s')
+    return selected
+
+
+def render_samples(job):
+    """
+    Render and write the charts of one chunk of selected samples (runs in a worker process).
+
+    Returns:
+        JobStats: Samples written and the time spent rendering and writing.
+    """
+    samples = job.samples
+    if len(samples) == 0:
+        return JobStats(0, 0.0, 0.0)
+    started = time.perf_counter()
+    columns = BarCache(job.cache_root).read_arrays(job.symbol, job.timeframe, job.start, job.end)
+    ohlc = [np.asarray(columns[name]) for name in ('open', 'high', 'low', 'close')]
+    counts = (entry_offset(job.geometry) + 1, window_length(job.geometry))
+
+    charts = iter_window_charts(*ohlc, samples['start'].to_numpy(), counts=counts)
+    write_seconds = 0.0
+    for (_, chart, full_chart), chart_path, future_chart_path in zip(charts, samples['chart_path'], samples['future_chart_path']):
+        write_start = time.perf_counter()
+        for path, image in ((chart_path, chart), (future_chart_path, full_chart)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            encode_png(image, path)
+        write_seconds += time.perf_counter() - write_start
+    # Charts are rendered lazily in chunks between the writes: the rest of the time is rendering
+    return JobStats(len(samples), time.perf_counter() - started - write_seconds, write_seconds)
+
+
+def assign_shards(manifest, shard_size, first_shards=None):
+    """
+    Give every sample a (shard, offset) position, filling fixed-size shards per split in rank order.
+
+    Rank order is a deterministic shuffle, so each shard mixes symbols, dates and classes.
+    Numbering starts at `first_shards[split]` (0 by default), so samples added to an earlier
+    build go into new shards and the existing ones are never rewritten.
+    """
+    manifest = manifest.sort_values(['split', 'rank'], kind='stable', ignore_index=True)
+    position = manifest.groupby('split').cumcount().to_numpy()
+    first = manifest['split'].map(first_shards or {}).fillna(0).to_numpy(dtype=np.int64)
+    manifest['shard'] = first + position // shard_size
+    manifest['offset'] = position % shard_size
+    return manifest
+
+
+def write_shard(job):
+    """
+    Render the model-input charts of one shard and write it (runs in a worker process).
+
+    Returns:
+        JobStats: Samples written and the time spent rendering and writing.
+    """
+    started = time.perf_counter()
+    samples = job.samples.sort_values('offset')
+    images = np.empty((len(samples), *job.image_size, 3), dtype=np.uint8)
+    chart_candles = entry_offset(job.geometry) + 1
+    cache = BarCache(job.cache_root)
+    for symbol, group in samples.groupby('symbol', sort=True):
+        columns = cache.read_arrays(symbol, job.timeframe, job.start, job.end)
+        ohlc = [np.asarray(columns[name]) for name in ('open', 'high', 'low', 'close')]
+        rows = np.flatnonzero((samples['symbol'] == symbol).to_numpy())
+        images[rows] = render_windows(*ohlc, group['start'].to_numpy(), count=chart_candles, size=job.image_size)
+
+    labels = np.array([LABELS.index(label) for label in samples['label']], dtype=np.int8)
+    rendered = time.perf_counter()
+    if job.shard_format == "tfrecord":
+        write_tfrecord_shard(job.path, images, labels)
+    else:
+        write_npy_shard(job.path, images, labels)
+    return JobStats(len(samples), rendered - started, time.perf_counter() - rendered)
+
+
+def _observe_candidates(candidate_batches, metrics, progress):
+    """
+    Record every labelled batch (worker time, windows, label distribution) as it streams past.
+
+    `progress` collects the time spent waiting for the workers ('waited') and the latest window
+    start per symbol ('high_water').
+    """
+    batches = iter(candidate_batches)
+    while True:
+        wait_start = time.perf_counter()
+        batch = next(batches, None)
+        progress['waited'] += time.perf_counter() - wait_start
+        if batch is None:
+            return
+        if len(batch['time']):
+            latest = int(np.max(batch['time']))
+            progress['high_water'][batch['symbol']] = max(progress['high_water'].get(batch['symbol'], latest), latest)
+        metrics.record('label', batch['seconds'], len(batch['start']), batch['symbol'])
+        metrics.count_labels(batch['symbol'], dict(zip(LABELS, np.bincount(batch['label'], minlength=len(LABELS)).tolist())))
+        yield batch
+
+
+def _record_jobs(job_stats, symbols, metrics):
+    """
+    Record the render and write time of every finished job and return the number of samples written.
+    """
+    written = 0
+    for stats, symbol in zip(job_stats, symbols):
+        metrics.record('render', stats.render_seconds, stats.written, symbol)
+        metrics.record('write', stats.write_seconds, stats.written, symbol)
+        written += stats.written
+    return written
+
+
+def _map(function, items, workers):
+    if workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(function, items)
+
+
+def _check_checkpoint(checkpoint, settings):
+    changed = [name for name, value in settings.items() if checkpoint.get(name) != value]
+    if changed:
+        raise ValueError(f"Cannot resume: {', '.join(changed)} changed since the last build "
+                         f"({ {name: checkpoint.get(name) for name in changed} }); use a new output directory")
+
+
+def generate_dataset(bar_source, cache_root, symbols, timeframe, start, end, layout,
+                     bullish_limit=1000, bearish_limit=1000, seed=SPLIT_SEED, workers=None,
+                     shards_per_symbol=None, geometry=DEFAULT_GEOMETRY, manifest_path=None,
+                     render_chunk=512, output_format="folders", shard_dir=None, shard_size=1024,
+                     shard_image_size=SHARD_IMAGE_SIZE, metrics=None, resume=False):
+    """
+    Build the train/validation/test chart folders for all symbols, spread over a process pool.
+
+    Bars are fetched once per symbol through `bar_source` (which must write into the BarCache at
+    `cache_root`). Workers then label and split shards of windows straight from the cache, the
+    samples to keep are chosen in memory, and only those are rendered and written. Split
+    assignment is derived from `seed`, symbol and window timestamp, so the output is identical
+    for any worker count.
+
+    With `output_format="folders"` (the original layout) every sample becomes a chart PNG and a
+    future chart PNG in the split/label folders. With "npy" or "tfrecord", model-input charts are
+    rendered at `shard_image_size` into fixed-size shards under `shard_dir` plus a per-split
+    memory-mappable index, for streaming with `forex_breakout.shards.make_dataset`.
+
+    Next to the manifest, a checkpoint records the build settings and every symbol's high-water
+    mark (latest window start processed). With `resume=True` a rerun continues from it: the
+    original start date is kept so window positions do not move, only windows after each
+    symbol's mark are labelled, new samples fill what is left of the limits and balance without
+    touching existing ones, and samples whose files already exist (from an interrupted run) are
+    not rendered again. Images, shards, the manifest and the checkpoint are all written to a
+    temporary name and renamed into place, and the checkpoint goes last.
+
+    Stage timings (fetch, label, balance, render, write), label distributions and discarded
+    window counts are recorded in `metrics` (a RunMetrics) when given.
+
+    Returns:
+        pd.DataFrame: The manifest (symbol, time, start, split, label, rank and chart paths),
+        also written to `manifest_path` when given.
+    """
+    if output_format != "folders" and output_format not in SHARD_FORMATS:
+        raise ValueError(f"Unknown output_format '{output_format}', expected 'folders' or one of {SHARD_FORMATS}")
+    if resume and not manifest_path:
+        raise ValueError("resume needs a manifest_path")
+    workers = workers or os.cpu_count()
+    shards_per_symbol = shards_per_symbol or max(1, math.ceil(2 * workers / len(symbols)))
+    metrics = metrics if metrics is not None else RunMetrics()
+
+    settings = {'timeframe': timeframe, 'seed': seed, 'geometry': list(geometry), 'output_format': output_format}
+    if output_format != "folders":
+        settings.update(shard_size=shard_size, shard_image_size=list(shard_image_size))
+    checkpoint = read_checkpoint(checkpoint_path(manifest_path)) if resume else None
+    if checkpoint is not None:
+        _check_checkpoint(checkpoint, settings)
+        start = pd.Timestamp(checkpoint['start']).to_pydatetime()
+        existing = read_manifest(manifest_path)
+        high_water = dict(checkpoint['high_water_marks'])
+        print(f"Resuming build from {checkpoint['updated']} with {len(existing)} samples")
+    else:
+        existing = pd.DataFrame(columns=MANIFEST_COLUMNS)
+        high_water = {}
+
+    # Fetching stays in this process: only the MT5 terminal connection here is logged in
+    for symbol in symbols:
+        with metrics.stage('fetch', symbol) as info:
+            bars = bar_source.load(symbol, timeframe, start, end)
+            info['items'] = 0 if bars is None else len(bars)
+        if bars is None:
+            metrics.count('symbols_without_bars')
+
+    tasks = [
+        Task(cache_root, symbol, timeframe, start, end, shard, shards_per_symbol, seed, geometry, high_water.get(symbol))
+        for symbol in symbols
+        for shard in range(shards_per_symbol)
+    ]
+    progress = {'waited': 0.0, 'high_water': {}}
+    balance_start = time.perf_counter()
+    selected, seen = select_samples(_observe_candidates(_map(collect_candidates, tasks, workers), metrics, progress),
+                                    bullish_limit, bearish_limit,
+                                    existing=existing.groupby(['split', 'label']).size().to_dict())
+    # Balancing runs interleaved with labeling: its own time is what was not spent waiting for workers
+    metrics.record('balance', time.perf_counter() - balance_start - progress['waited'], len(selected))
+    for (split, label), count in seen.items():
+        kept = int(((selected['split'] == split) & (selected['label'] == label)).sum()) if len(selected) else 0
+        metrics.count('discarded_windows', count - kept, key=label)
+    manifest = add_chart_paths(selected, layout)
+
+    if output_format == "folders":
+        # Samples of an interrupted run whose charts were completely written are not rendered again
+        todo = manifest[~np.array([os.path.exists(chart) and os.path.exists(future)
+                                   for chart, future in zip(manifest['chart_path'], manifest['future_chart_path'])],
+                                  dtype=bool)]
+        jobs = [
+            RenderJob(cache_root, symbol, timeframe, start, end, geometry, samples.iloc[lo:lo + render_chunk])
+            for symbol, samples in todo.groupby('symbol', sort=True)
+            for lo in range(0, len(samples), render_chunk)
+        ]
+        written = _record_jobs(_map(render_samples, jobs, workers), [job.symbol for job in jobs], metrics)
+    else:
+        # Fixed-size binary shards of model-input charts instead of one PNG per sample
+        os.makedirs(shard_dir, exist_ok=True)
+        first_shards = (existing.groupby('split')['shard'].max() + 1).to_dict() if len(existing) else {}
+        manifest = assign_shards(manifest, shard_size, first_shards)
+        manifest['chart_path'] = [
+            shard_path(shard_dir, split, shard, output_format)
+            for split, shard in zip(manifest['split'], manifest['shard'])
+        ]
+        manifest['future_chart_path'] = ""
+        jobs = [
+            ShardJob(cache_root, timeframe, start, end, geometry, samples, samples['chart_path'].iloc[0], output_format, shard_image_size)
+            for _, samples in manifest.groupby(['split', 'shard'], sort=True)
+            if not os.path.exists(samples['chart_path'].iloc[0])
+        ]
+        written = _record_jobs(_map(write_shard, jobs, workers), [None] * len(jobs), metrics)
+    print(f"Rendered {written} of {sum(seen.values())} labelled windows")
+
+    columns = MANIFEST_COLUMNS + [column for column in SHARD_COLUMNS if column in manifest]
+    if len(existing):
+        manifest = pd.concat([existing[columns], manifest[columns]], ignore_index=True)
+    manifest = manifest[columns]
+    if output_format != "folders":
+        for split in SPLITS:
+            write_index(shard_dir, split, manifest, output_format, shard_image_size)
+    if manifest_path:
+        write_manifest(manifest, manifest_path)
+        previous = checkpoint or {}
+        marks = {**previous.get('high_water_marks', {}), **progress['high_water']}
+        windows = Counter(previous.get('windows_seen', {}))
+        windows.update({f"{split}/{label}": count for (split, label), count in seen.items()})
+        write_checkpoint(checkpoint_path(manifest_path), {
+            **settings,
+            'start': pd.Timestamp(start).isoformat(),
+            'end': pd.Timestamp(end).isoformat(),
+            'high_water_marks': {symbol: int(mark) for symbol, mark in sorted(marks.items())},
+            'windows_seen': dict(sorted(windows.items())),
+        })
+    return manifest
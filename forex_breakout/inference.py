@@ -0,0 +1,156 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.feature_cache import image_key
+from forex_breakout.models import IMG_SIZE
+from forex_breakout.rendering import render_candles
+
+# Columns of the prediction DataFrame
+PREDICTION_COLUMNS = ['image_path', 'pred_class', 'pred_prob', 'probabilities']
+
+
+def load_chart(image_path, target_size=IMG_SIZE):
+    """
+    Load one chart exactly like `pred_on_custom_image` does (load_img + img_to_array).
+    """
+    import tf_keras
+
+    image = tf_keras.utils.load_img(path=image_path, color_mode="rgb", target_size=target_size)
+    return tf_keras.utils.img_to_array(image)
+
+
+def chart_input(chart, target_size=IMG_SIZE):
+    """
+    Model input for a rendered chart array, identical to saving it as PNG and loading it with `load_chart`.
+    """
+    from PIL import Image
+
+    image = Image.fromarray(np.asarray(chart, dtype=np.uint8))
+    if image.size != (target_size[1], target_size[0]):
+        image = image.resize((target_size[1], target_size[0]), Image.NEAREST)  # load_img's default interpolation
+    return np.asarray(image, dtype=np.float32)
+
+
+def ohlc_inputs(windows, target_size=IMG_SIZE):
+    """
+    Model inputs for raw OHLC windows of shape (num_windows, num_candles, 4), rendered like the chart PNGs.
+    """
+    windows = np.asarray(windows, dtype=np.float64).reshape(-1, np.shape(windows)[-2], 4)
+    charts = render_candles(windows[..., 0], windows[..., 1], windows[..., 2], windows[..., 3])
+    return np.stack([chart_input(chart, target_size) for chart in charts])
+
+
+def _iter_batches(image_paths, batch_size, target_size, pool):
+    """
+    Yield decoded image batches, decoding the next batch on the thread pool while the current one is used.
+    """
+    chunks = [image_paths[lo:lo + batch_size] for lo in range(0, len(image_paths), batch_size)]
+    pending = None
+    for i in range(len(chunks)):
+        if pending is None:
+            pending = [pool.submit(load_chart, path, target_size) for path in chunks[i]]
+        current = pending
+        pending = [pool.submit(load_chart, path, target_size) for path in chunks[i + 1]] if i + 1 < len(chunks) else None
+        yield np.stack([future.result() for future in current])
+
+
+def predict_charts(model, image_paths, class_names, batch_size=64, target_size=IMG_SIZE, workers=8, store=None):
+    """
+    Predict many chart images with batched inference.
+
+    Charts are decoded in parallel on a thread pool and fed to the model `batch_size` at a time,
+    instead of one `model.predict` call per image. With a PredictionStore, charts whose content
+    hash is already stored for this model are not run through the model again.
+
+    Args:
+        model: Trained Keras model.
+        image_paths (list): Chart PNG paths.
+        class_names (list): Class names in model output order.
+        batch_size (int): Images per inference call.
+        target_size (tuple): Model input size.
+        workers (int): Decoding threads.
+        store (PredictionStore, optional): Read stored predictions first and append new ones.
+
+    Returns:
+        pd.DataFrame: One row per image with image_path, pred_class, pred_prob (probability of the
+        predicted class) and probabilities (the full class-probability vector).
+    """
+    image_paths = list(image_paths)
+    if not image_paths:
+        return pd.DataFrame(columns=PREDICTION_COLUMNS)
+
+    if store is None:
+        return probabilities_frame(image_paths, _predict(model, image_paths, batch_size, target_size, workers),
+                                   class_names)
+
+    chart_hashes = [image_key(path) for path in image_paths]
+    found = store.lookup(chart_hashes)
+    missing = [i for i, probabilities in enumerate(found) if probabilities is None]
+    if missing:
+        # Identical charts in the same call are only predicted once
+        first_of_hash = {}
+        for i in missing:
+            first_of_hash.setdefault(chart_hashes[i], i)
+        new_hashes = list(first_of_hash)
+        predicted = _predict(model, [image_paths[i] for i in first_of_hash.values()], batch_size, target_size,
+                             workers)
+        store.append(new_hashes, predicted)
+        predicted_of_hash = dict(zip(new_hashes, predicted))
+        for i in missing:
+            found[i] = predicted_of_hash[chart_hashes[i]]
+    return probabilities_frame(image_paths, np.stack(found), class_names)
+
+
+def _predict(model, image_paths, batch_size, target_size, workers):
+    """
+    Probability array of shape (len(image_paths), num_classes).
+    """
+    batches = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for images in _iter_batches(image_paths, batch_size, target_size, pool):
+            batches.append(np.asarray(model.predict_on_batch(images)))
+    return np.concatenate(batches)
+
+
+def probabilities_frame(image_paths, probabilities, class_names):
+    """
+    Build the prediction DataFrame from an (N, num_classes) probability array.
+    """
+    pred_index = probabilities.argmax(axis=-1)
+    return pd.DataFrame({
+        'image_path': list(image_paths),
+        'pred_class': np.asarray(class_names)[pred_index],
+        'pred_prob': probabilities[np.arange(len(probabilities)), pred_index],
+        'probabilities': list(probabilities),
+    })
+
+
+def list_pair_charts(root_folder, pairs=None):
+    """
+    Chart images of every pair folder (`<root_folder>/<pair>/charts/*.png`) as a (pair, image_path) DataFrame.
+    """
+    if pairs is None:
+        pairs = [pair for pair in os.listdir(root_folder) if os.path.isdir(os.path.join(root_folder, pair))]
+    rows = []
+    for pair in pairs:
+        pair_charts_folder = os.path.join(root_folder, pair, "charts")
+        for image_name in os.listdir(pair_charts_folder):
+            rows.append((pair, os.path.join(pair_charts_folder, image_name)))
+    return pd.DataFrame(rows, columns=['pair', 'image_path'])
+
+
+def predict_pairs(model, root_folder, class_names, pairs=None, batch_size=64, target_size=IMG_SIZE, workers=8,
+                  store=None):
+    """
+    Batched predictions for the charts of one, several or all pairs under `root_folder`.
+
+    Returns:
+        pd.DataFrame: `predict_charts` columns plus a 'pair' column.
+    """
+    charts = list_pair_charts(root_folder, pairs)
+    predictions = predict_charts(model, charts['image_path'], class_names, batch_size, target_size, workers, store)
+    predictions.insert(0, 'pair', charts['pair'].to_numpy())
+    return predictions
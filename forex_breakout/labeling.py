@@ -0,0 +1,150 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Class names in the same (alphabetical) order used by image_dataset_from_directory
+LABELS = ("bearish_breakout", "bullish_breakout", "no_breakout")
+BEARISH, BULLISH, NO_BREAKOUT = range(len(LABELS))
+
+# Window geometry: support/resistance block, setup candles and future candles
+WindowGeometry = namedtuple("WindowGeometry", ["support", "setup", "future"])
+DEFAULT_GEOMETRY = WindowGeometry(support=8, setup=4, future=5)
+
+
+def window_length(geometry=DEFAULT_GEOMETRY):
+    """
+    Total number of candles in one window (17 for the default 8+4+5 geometry).
+    """
+    return geometry.support + geometry.setup + geometry.future
+
+
+def entry_offset(geometry=DEFAULT_GEOMETRY):
+    """
+    Offset of the last candle shown on the chart (the entry candle) from the window start.
+    """
+    return geometry.support + geometry.setup - 1
+
+
+def breakout_identify(df):
+    """
+    Analyze 12 candles to identify if there is a bullish or bearish breakout.
+    """
+    if len(df) < 17:
+        return "not_enough_data"
+
+    # Extract the relevant data
+    last_12 = df.iloc[-17:-5]
+    next_5 = df.iloc[-5:]
+    prior_8_candles = last_12.iloc[:-4]
+
+    # Resistance and support levels based on the first 8 candles
+    resistance = prior_8_candles['high'].max()
+    support = prior_8_candles['low'].min()
+
+    # Last 4 candles data
+    last_4_highs = last_12['high'].iloc[-4:]
+    last_high_of_last_4 = last_4_highs.iloc[-1]  # High of the last candle in the last 4 candles
+
+    # Last 4 candles data
+    last_4_lows = last_12['low'].iloc[-4:]
+    last_low_of_last_4 = last_4_lows.iloc[-1]  # High of the last candle in the last 4 candles
+
+    last_4_closes = last_12['close'].iloc[-4:]
+    last_close_of_last_4 = last_4_closes.iloc[-1]  # Close of the last candle in the last 4 candles
+
+    # Latest candle from the next 5 candles
+    latest_close_of_next_5 = next_5['close'].iloc[-1]  # Close of the latest (5th) candle
+
+    # Check for bullish breakout: latest close of the latest next 5 > high of the last of last 4
+    if latest_close_of_next_5 > last_high_of_last_4 and last_close_of_last_4 > resistance:
+        return "bullish_breakout"
+
+    # Check for bearish breakout: latest close of the latest next 5 < low of the last of last 4
+    if latest_close_of_next_5 < last_low_of_last_4 and last_close_of_last_4 < support:
+        return "bearish_breakout"
+
+    # No breakout detected
+    return "no_breakout"
+
+
+def label_windows(high, low, close, geometry=DEFAULT_GEOMETRY):
+    """
+    Label every window start of a symbol's full OHLC series in one NumPy pass.
+
+    The window starting at bar `i` covers bars `i` to `i + window_length - 1` and gets
+    the same label `breakout_identify` would give to that 17-row slice.
+
+    Args:
+        high, low, close: 1-D arrays with the whole series of one symbol.
+        geometry (WindowGeometry): Support/setup/future candle counts (8/4/5 by default).
+
+    Returns:
+        np.ndarray: int8 label codes (indexes into LABELS), one per window start.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    n_windows = len(close) - window_length(geometry) + 1
+    if n_windows <= 0:
+        return np.empty(0, dtype=np.int8)
+
+    # Rolling resistance and support over the support block of every window
+    resistance = sliding_window_view(high, geometry.support)[:n_windows].max(axis=1)
+    support = sliding_window_view(low, geometry.support)[:n_windows].min(axis=1)
+
+    # Strided views for the entry candle (last of the setup) and the exit candle
+    entry = entry_offset(geometry)
+    exit_ = window_length(geometry) - 1
+    entry_high = high[entry:entry + n_windows]
+    entry_low = low[entry:entry + n_windows]
+    entry_close = close[entry:entry + n_windows]
+    exit_close = close[exit_:exit_ + n_windows]
+
+    bullish = (exit_close > entry_high) & (entry_close > resistance)
+    bearish = (exit_close < entry_low) & (entry_close < support)
+
+    labels = np.full(n_windows, NO_BREAKOUT, dtype=np.int8)
+    labels[bearish] = BEARISH
+    labels[bullish] = BULLISH  # Bullish wins when both hold, matching the check order above
+    return labels
+
+
+def label_names(codes):
+    """
+    Convert label codes returned by `label_windows` back into class name strings.
+    """
+    return np.asarray(LABELS, dtype=object)[np.asarray(codes)]
+
+
+def check_parity(num_series=50, length=400, seed=0):
+    """
+    Compare `label_windows` against `breakout_identify` on randomized OHLC series.
+
+    Returns:
+        int: Number of windows compared. Raises AssertionError on the first mismatch.
+    """
+    rng = np.random.default_rng(seed)
+    compared = 0
+    for _ in range(num_series):
+        # Random walk with some flat stretches so ties around the levels are exercised
+        steps = rng.normal(0, 1, length) * rng.choice([0.0, 1.0], length, p=[0.1, 0.9])
+        close = np.round(100 + np.cumsum(steps), 2)
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        spread = np.round(np.abs(rng.normal(0, 0.5, (2, length))), 2)
+        high = np.maximum(open_, close) + spread[0]
+        low = np.minimum(open_, close) - spread[1]
+        df = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close})
+
+        codes = label_windows(high, low, close)
+        for start in rng.choice(len(codes), min(len(codes), 100), replace=False):
+            expected = breakout_identify(df.iloc[start:start + 17])
+            assert LABELS[codes[start]] == expected, (start, LABELS[codes[start]], expected)
+            compared += 1
+    return compared
+
+
+if __name__ == "__main__":
+    print(f"Parity check passed on {check_parity()} windows.")
@@ -0,0 +1,69 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+# One row per generated sample
+MANIFEST_COLUMNS = ['symbol', 'time', 'start', 'split', 'label', 'rank', 'chart_path', 'future_chart_path']
+
+# Position of the sample inside its shard file (sharded output only)
+SHARD_COLUMNS = ['shard', 'offset']
+
+# Build state kept next to the manifest: settings, per-symbol high-water marks and windows seen
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def write_manifest(manifest, path):
+    """
+    Write the sample manifest as Parquet (if the path ends in .parquet) or CSV, renamed into place
+    so readers never see a partial manifest.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    manifest = manifest[MANIFEST_COLUMNS + [column for column in SHARD_COLUMNS if column in manifest]]
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if path.endswith(".parquet"):
+        manifest.to_parquet(tmp_path, index=False)
+    else:
+        manifest.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(path):
+    """
+    Read a manifest written by `write_manifest` (empty DataFrame if it does not exist).
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=MANIFEST_COLUMNS)
+    if path.endswith(".parquet"):
+        manifest = pd.read_parquet(path)
+    else:
+        manifest = pd.read_csv(path)
+    manifest['time'] = pd.to_datetime(manifest['time'])
+    return manifest
+
+
+def checkpoint_path(manifest_path):
+    return os.path.join(os.path.dirname(manifest_path) or ".", CHECKPOINT_FILE)
+
+
+def read_checkpoint(path):
+    """
+    Build checkpoint written by `write_checkpoint`, or None if there is none yet.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_checkpoint(path, checkpoint):
+    """
+    Atomically replace the build checkpoint. It is written after the manifest, so a checkpoint
+    never points past samples that are not in the manifest.
+    """
+    checkpoint = {**checkpoint, 'updated': datetime.now().isoformat(timespec='seconds')}
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
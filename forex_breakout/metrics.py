@@ -0,0 +1,185 @@
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows, where the MT5 terminal runs
+    resource = None
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+def peak_memory_mb(children=False):
+    """
+    Peak resident memory of this process (or of its largest finished worker) in MB, None if unknown.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+    if children:
+        return None
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / 2 ** 20
+    except (ImportError, AttributeError):
+        return None
+
+
+class RunMetrics:
+    """
+    Timers and counters of one generation or backtest run.
+
+    Every recorded stage (fetch, label, balance, render, write, inference, simulate, ...) is
+    appended as one JSON line to `path` as it happens, tagged with `context` (e.g. the
+    timeframe); totals per stage and per symbol are kept in memory for `summary`.
+    Without a path nothing is written and the metrics are only collected.
+    """
+
+    def __init__(self, path=None, **context):
+        self.path = path
+        self.context = context
+        self.started = time.perf_counter()
+        self.stages = defaultdict(lambda: {'seconds': 0.0, 'items': 0, 'calls': 0})
+        self.symbols = defaultdict(lambda: defaultdict(lambda: {'seconds': 0.0, 'items': 0}))
+        self.counters = Counter()
+        self.labels = defaultdict(Counter)
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a")
+
+    def emit(self, event, **fields):
+        if self._file is None:
+            return
+        self._file.write(json.dumps({'time': time.time(), 'event': event, **self.context, **fields}, default=str) + "\n")
+        self._file.flush()
+
+    def record(self, stage, seconds, items=0, symbol=None, **fields):
+        """
+        Add `seconds` of work on `items` (windows, bars, charts, trades) to a stage.
+        """
+        totals = self.stages[stage]
+        totals['seconds'] += seconds
+        totals['items'] += items
+        totals['calls'] += 1
+        if symbol is not None:
+            per_symbol = self.symbols[symbol][stage]
+            per_symbol['seconds'] += seconds
+            per_symbol['items'] += items
+        self.emit('stage', stage=stage, symbol=symbol, seconds=seconds, items=items,
+                  items_per_sec=items / seconds if seconds else None, peak_memory_mb=peak_memory_mb(), **fields)
+
+    @contextmanager
+    def stage(self, stage, symbol=None, items=0, **fields):
+        """
+        Time a block as one stage call; the block may set `info['items']` once it knows the count.
+        """
+        info = {'items': items}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.record(stage, time.perf_counter() - start, info['items'], symbol, **fields)
+
+    def count(self, name, value=1, key=None):
+        """
+        Add to a counter, optionally broken down by `key` (a symbol, label, ...).
+        """
+        self.counters[name if key is None else f"{name}:{key}"] += value
+
+    def count_labels(self, symbol, labels):
+        """
+        Add label names (or a name -> count mapping) to a symbol's label distribution.
+        """
+        self.labels[symbol].update(labels)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        rate = lambda totals: totals['items'] / totals['seconds'] if totals['seconds'] else None
+        return {
+            'elapsed_sec': elapsed,
+            'peak_memory_mb': peak_memory_mb(),
+            'peak_worker_memory_mb': peak_memory_mb(children=True),
+            'stages': {stage: {**totals, 'items_per_sec': rate(totals)} for stage, totals in self.stages.items()},
+            'symbols': {
+                symbol: {stage: {**totals, 'items_per_sec': rate(totals)} for stage, totals in stages.items()}
+                for symbol, stages in self.symbols.items()
+            },
+            'labels': {symbol: dict(counts) for symbol, counts in self.labels.items()},
+            'counters': dict(self.counters),
+        }
+
+    def close(self, verbose=True):
+        """
+        Emit the end-of-run summary line, print it and close the JSON lines file.
+        """
+        summary = self.summary()
+        self.emit('summary', **summary)
+        if verbose:
+            print_summary(summary)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return summary
+
+
+def print_summary(summary):
+    print(f"Run finished in {summary['elapsed_sec']:.1f}s, peak memory {summary['peak_memory_mb'] or 0:.0f} MB "
+          f"(largest worker {summary['peak_worker_memory_mb'] or 0:.0f} MB)")
+    print(f"{'stage':<12} {'calls':>7} {'seconds':>10} {'items':>12} {'items/s':>12}")
+    for stage, totals in summary['stages'].items():
+        print(f"{stage:<12} {totals['calls']:>7} {totals['seconds']:>10.2f} {totals['items']:>12,} "
+              f"{totals['items_per_sec'] or 0:>12,.1f}")
+    totals = Counter()
+    for counts in summary['labels'].values():
+        totals.update(counts)
+    if totals:
+        print("labels: " + ", ".join(f"{label} {count:,}" for label, count in sorted(totals.items())))
+    for name, value in summary['counters'].items():
+        print(f"{name}: {value:,}")
+
+
+@contextmanager
+def profiled(profiler=None, output=None):
+    """
+    Run a block under cProfile or the pyinstrument sampling profiler (no-op when `profiler` is None).
+
+    cProfile stats are dumped to `output` (default run.prof) and the top functions printed;
+    pyinstrument writes an HTML report to `output` (default run_profile.html).
+    """
+    if profiler is None:
+        yield
+        return
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profiler!r}, expected one of {PROFILERS}")
+
+    if profiler == "cprofile":
+        import cProfile
+        import pstats
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(output or "run.prof")
+            pstats.Stats(profile).sort_stats("cumulative").print_stats(30)
+    else:
+        from pyinstrument import Profiler
+
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(output or "run_profile.html", "w") as f:
+                f.write(profile.output_html())
+            print(profile.output_text(unicode=False, color=False))
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+# Model input settings used by the training notebooks
+IMG_SIZE = (224, 224)
+INPUT_SHAPE = IMG_SIZE + (3,)
+BACKBONE = "ConvNeXtXLarge"
+POOLING = "max"
+
+# image_dataset_from_directory resizes with bilinear interpolation
+RESIZE_METHOD = "bilinear"
+
+
+def create_base_model(name=BACKBONE, input_shape=INPUT_SHAPE, include_preprocessing=True, pooling=POOLING,
+                      weights="imagenet"):
+    """
+    Create the pretrained feature extractor used by the notebooks (ConvNeXtXLarge, max pooled).
+    """
+    import tf_keras
+
+    return getattr(tf_keras.applications, name)(
+        include_top=False,
+        weights=weights,
+        input_shape=input_shape,
+        include_preprocessing=include_preprocessing,
+        pooling=pooling,
+    )
+
+
+def create_model(num_classes=1000, input_shape=INPUT_SHAPE, trainable=False, activation="softmax",
+                 base_model=None, model_name="model"):
+    """
+    Create a feature extractor model with a custom classifier layer (same graph as the notebooks).
+
+    Args:
+        num_classes (int, optional): Number of output classes for the classifier layer.
+        input_shape (tuple, optional): Input shape for the model's images (height, width, channels).
+        trainable (bool, optional): Whether to make the base model trainable.
+        activation (str, optional): Activation function for the output layer.
+        base_model (tf_keras.Model): Pretrained backbone, e.g. from `create_base_model`.
+        model_name (str, optional): Name for the created model.
+
+    Returns:
+        tf_keras.Model: Input -> base_model -> Dense `output_layer`.
+    """
+    import tf_keras
+
+    if base_model is None:
+        raise ValueError("create_model needs a base_model")
+
+    # Freeze the base model (if necessary)
+    base_model.trainable = trainable
+
+    inputs = tf_keras.Input(shape=input_shape, name="input_layer")
+    x = base_model(inputs, training=trainable)
+    outputs = tf_keras.layers.Dense(units=num_classes, activation=activation, name="output_layer")(x)
+    return tf_keras.Model(inputs=inputs, outputs=outputs, name=model_name)
+
+
+def load_trained_model(weights_path, num_classes=3, name=BACKBONE, input_shape=INPUT_SHAPE):
+    """
+    Rebuild the notebooks' model and load trained weights (the backbone's ImageNet weights are not downloaded).
+    """
+    base_model = create_base_model(name=name, input_shape=input_shape, weights=None)
+    model = create_model(num_classes=num_classes, input_shape=input_shape, base_model=base_model)
+    model.load_weights(weights_path)
+    return model
+
+
+def create_head(embedding_dim, num_classes, activation="softmax", model_name="head"):
+    """
+    The classifier layer of `create_model` on its own, taking pooled backbone embeddings as input.
+
+    Its `output_layer` weights can be copied into the full model with `transfer_head`.
+    """
+    import tf_keras
+
+    inputs = tf_keras.Input(shape=(embedding_dim,), name="embedding")
+    outputs = tf_keras.layers.Dense(units=num_classes, activation=activation, name="output_layer")(inputs)
+    return tf_keras.Model(inputs=inputs, outputs=outputs, name=model_name)
+
+
+def transfer_head(head, model):
+    """
+    Copy the trained `output_layer` of a head model into a full `create_model` model.
+    """
+    model.get_layer("output_layer").set_weights(head.get_layer("output_layer").get_weights())
+    return model
+
+
+def weights_fingerprint(model, weights=None):
+    """
+    Hash of a model's architecture name and its weights.
+
+    Args:
+        weights: Where the weights came from: "imagenet" (the published Keras application weights,
+            identified by the tf_keras version), the path of the weights file or SavedModel
+            directory they were loaded from (identified by path, size and modification time of its
+            files), or None to hash every weight tensor, which copies the whole model (about 1.3 GB
+            for ConvNeXtXLarge).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model.name.encode())
+    if weights == "imagenet":
+        import tf_keras
+
+        digest.update(f"imagenet:{tf_keras.__version__}".encode())
+    elif weights is not None:
+        paths = [weights] if os.path.isfile(weights) else sorted(
+            os.path.join(root, file) for root, _, files in os.walk(weights) for file in files
+        )
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    else:
+        for weight in model.weights:
+            value = weight.numpy()
+            digest.update(f"{weight.name}:{value.dtype}:{value.shape}".encode())
+            digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+def backbone_fingerprint(base_model, input_shape=INPUT_SHAPE, include_preprocessing=True, pooling=POOLING,
+                         resize_method=RESIZE_METHOD, weights=None):
+    """
+    Fingerprint of everything that determines a backbone embedding: weights, input size and preprocessing.
+    """
+    config = {
+        'weights': weights_fingerprint(base_model, weights),
+        'input_shape': list(input_shape),
+        'include_preprocessing': include_preprocessing,
+        'pooling': pooling,
+        'resize_method': resize_method,
+    }
+    return hashlib.blake2b(json.dumps(config, sort_keys=True).encode(), digest_size=16).hexdigest()
@@ -0,0 +1,283 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.data_source import window_starts
+from forex_breakout.generation import SPLIT_SEED, SPLITS, assign_splits
+from forex_breakout.labeling import DEFAULT_GEOMETRY, LABELS, entry_offset, label_windows
+from forex_breakout.rendering import window_slices
+
+OHLC_COLUMNS = ('open', 'high', 'low', 'close')
+NUMERIC_KINDS = ("conv", "mlp")
+
+
+def normalize_windows(windows):
+    """
+    Scale OHLC windows of shape (num_windows, num_candles, 4) to [0, 1] per window.
+
+    Each window is mapped from its lowest low to its highest high, the same vertical scaling the
+    chart renderer applies, so the model sees the shape of the chart without any price level or
+    pip-size information (JPY and non-JPY pairs look alike). Flat windows map to 0.5.
+    """
+    windows = np.asarray(windows, dtype=np.float64)
+    low = windows[..., 2].min(axis=1, keepdims=True)[..., None]
+    high = windows[..., 1].max(axis=1, keepdims=True)[..., None]
+    span = high - low
+    scaled = np.divide(windows - low, span, out=np.full(windows.shape, 0.5), where=span > 0)
+    return scaled.astype(np.float32)
+
+
+def window_tensors(columns, starts, geometry=DEFAULT_GEOMETRY):
+    """
+    Normalized model inputs (num_windows, candles shown on the chart, 4) for window starts of one symbol.
+    """
+    count = entry_offset(geometry) + 1
+    windows = np.stack([window_slices(columns[name], starts, 0, count) for name in OHLC_COLUMNS], axis=-1)
+    return normalize_windows(windows)
+
+
+def dataset_from_bars(bars, seed=SPLIT_SEED, geometry=DEFAULT_GEOMETRY, stride=None):
+    """
+    Numeric dataset of every labelled window of every symbol, split like `generate_dataset`.
+
+    Args:
+        bars (dict): symbol -> column arrays as returned by `BarCache.read_arrays`.
+
+    Returns:
+        dict: split name -> dict of 'x' (inputs), 'y' (label codes), 'symbol' and 'time' arrays.
+    """
+    parts = {split: [] for split in SPLITS}
+    for symbol, columns in bars.items():
+        labels = label_windows(columns['high'], columns['low'], columns['close'], geometry)
+        starts = window_starts(len(columns['close']), geometry, stride)
+        times = np.asarray(columns['time'][starts])
+        splits = assign_splits(seed, symbol, times)
+        x = window_tensors(columns, starts, geometry)
+        for code, split in enumerate(SPLITS):
+            members = splits == code
+            parts[split].append((x[members], labels[starts][members], np.full(members.sum(), symbol, dtype=object),
+                                 times[members]))
+    return {split: _concatenate(items) for split, items in parts.items()}
+
+
+def dataset_from_manifest(manifest, bars, geometry=DEFAULT_GEOMETRY):
+    """
+    Numeric inputs for exactly the samples of an image dataset manifest, so both models are
+    trained and tested on the same windows.
+
+    Windows are located by their start time in the symbol's bars.
+    """
+    parts = {split: [] for split in SPLITS}
+    for (symbol, split), samples in manifest.groupby(['symbol', 'split'], sort=True):
+        columns = bars[symbol]
+        times = pd.to_datetime(samples['time']).to_numpy().astype('datetime64[s]').astype(np.int64)
+        starts = np.searchsorted(columns['time'], times)
+        labels = np.asarray([LABELS.index(label) for label in samples['label']], dtype=np.int8)
+        parts[split].append((window_tensors(columns, starts, geometry), labels,
+                             np.full(len(samples), symbol, dtype=object), times))
+    return {split: _concatenate(items) for split, items in parts.items()}
+
+
+def _concatenate(items):
+    if not items:
+        return {'x': np.empty((0, entry_offset(DEFAULT_GEOMETRY) + 1, 4), dtype=np.float32),
+                'y': np.empty(0, dtype=np.int8), 'symbol': np.empty(0, dtype=object), 'time': np.empty(0, dtype=np.int64)}
+    x, y, symbols, times = zip(*items)
+    return {'x': np.concatenate(x), 'y': np.concatenate(y), 'symbol': np.concatenate(symbols),
+            'time': np.concatenate(times)}
+
+
+def create_numeric_model(num_candles=entry_offset(DEFAULT_GEOMETRY) + 1, num_classes=len(LABELS), kind="conv",
+                         model_name="numeric_model"):
+    """
+    Compact classifier on normalized OHLC windows: a small 1D CNN over the candle axis or an MLP.
+
+    The output layer is named like `create_model`'s, with softmax probabilities over the same classes.
+    """
+    import tf_keras
+
+    if kind not in NUMERIC_KINDS:
+        raise ValueError(f"Unknown numeric model kind {kind!r}, expected one of {NUMERIC_KINDS}")
+
+    inputs = tf_keras.Input(shape=(num_candles, 4), name="input_layer")
+    x = inputs
+    if kind == "conv":
+        x = tf_keras.layers.Conv1D(32, 3, padding="same", activation="relu")(x)
+        x = tf_keras.layers.Conv1D(64, 3, padding="same", activation="relu")(x)
+    # Flatten rather than pool: where a candle sits (support block or entry candle) matters
+    x = tf_keras.layers.Flatten()(x)
+    x = tf_keras.layers.Dense(128, activation="relu")(x)
+    x = tf_keras.layers.Dense(64, activation="relu")(x)
+    outputs = tf_keras.layers.Dense(num_classes, activation="softmax", name="output_layer")(x)
+    return tf_keras.Model(inputs, outputs, name=model_name)
+
+
+def train_numeric_model(train_x, train_y, valid_x, valid_y, kind="conv", learning_rate=0.001, epochs=1000,
+                        patience=5, batch_size=256, seed=42):
+    """
+    Train a numeric model with the notebook's optimizer, loss and early stopping.
+
+    Returns:
+        tuple: (model, History)
+    """
+    import tf_keras
+
+    tf_keras.utils.set_random_seed(seed)
+    model = create_numeric_model(train_x.shape[1], len(LABELS), kind)
+    model.compile(optimizer=tf_keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss=tf_keras.losses.CategoricalCrossentropy(from_logits=False),
+                  metrics=["accuracy"])
+    early_stopping = tf_keras.callbacks.EarlyStopping(
+        monitor='val_accuracy',
+        patience=patience,
+        restore_best_weights=True,
+    )
+    history = model.fit(
+        x=train_x,
+        y=tf_keras.utils.to_categorical(train_y, len(LABELS)),
+        batch_size=batch_size,
+        epochs=epochs,
+        shuffle=True,
+        validation_data=(valid_x, tf_keras.utils.to_categorical(valid_y, len(LABELS))),
+        callbacks=[early_stopping],
+        verbose=0,
+    )
+    return model, history
+
+
+def predict_ohlc(model, windows, batch_size=4096):
+    """
+    Class probabilities for raw OHLC windows of shape (num_windows, num_candles, 4).
+    """
+    x = normalize_windows(windows)
+    return np.concatenate([np.asarray(model.predict_on_batch(x[lo:lo + batch_size]))
+                           for lo in range(0, len(x), batch_size)]) if len(x) else np.empty((0, len(LABELS)))
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def compare_with_image_model(numeric_model, image_model, bars, samples, geometry=DEFAULT_GEOMETRY, batch_size=64):
+    """
+    Side-by-side report of the numeric and image models on the same test windows: accuracy,
+    confusion matrices, agreement, and the time each spends building inputs and predicting.
+
+    Args:
+        bars (dict): symbol -> column arrays.
+        samples (dict): A split as returned by `dataset_from_bars`/`dataset_from_manifest`.
+    """
+    from forex_breakout.export import classification_report
+    from forex_breakout.inference import ohlc_inputs
+
+    count = entry_offset(geometry) + 1
+    raw = []
+    for symbol in pd.unique(samples['symbol']):
+        members = samples['symbol'] == symbol
+        starts = np.searchsorted(bars[symbol]['time'], samples['time'][members])
+        raw.append(np.stack([window_slices(bars[symbol][name], starts, 0, count) for name in OHLC_COLUMNS], axis=-1))
+    order = np.concatenate([np.flatnonzero(samples['symbol'] == symbol) for symbol in pd.unique(samples['symbol'])])
+    windows = np.concatenate(raw)
+    labels = samples['y'][order]
+
+    numeric_inputs, numeric_build = _timed(normalize_windows, windows)
+    numeric_probabilities, numeric_predict = _timed(predict_ohlc, numeric_model, windows)
+    image_inputs, image_build = _timed(ohlc_inputs, windows)
+    image_probabilities, image_predict = _timed(
+        lambda: np.concatenate([np.asarray(image_model.predict_on_batch(image_inputs[lo:lo + batch_size]))
+                                for lo in range(0, len(image_inputs), batch_size)]))
+
+    report = {}
+    for name, probabilities, build, predict, inputs in (
+        ('image', image_probabilities, image_build, image_predict, image_inputs),
+        ('numeric', numeric_probabilities, numeric_build, numeric_predict, numeric_inputs),
+    ):
+        entry = classification_report(probabilities, labels)
+        entry.update({
+            'windows': len(windows),
+            'input_values_per_window': int(np.prod(inputs.shape[1:])),
+            'input_build_sec': build,
+            'predict_sec': predict,
+            'windows_per_sec': len(windows) / (build + predict) if build + predict else 0.0,
+        })
+        report[name] = entry
+    report['numeric']['accuracy_diff'] = report['numeric']['accuracy'] - report['image']['accuracy']
+    report['numeric']['prediction_agreement'] = float(
+        (numeric_probabilities.argmax(axis=-1) == image_probabilities.argmax(axis=-1)).mean())
+    report['numeric']['speedup'] = report['numeric']['windows_per_sec'] / report['image']['windows_per_sec']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the render-free OHLC model and compare it with the image model.")
+    parser.add_argument("--cache-dir", default="bar_cache", help="Bar cache with the symbols' bars")
+    parser.add_argument("--timeframe", default="H1")
+    parser.add_argument("--symbols", nargs="*", help="Defaults to every cached symbol of the timeframe")
+    parser.add_argument("--manifest", help="Use exactly the samples of an image dataset manifest")
+    parser.add_argument("--seed", type=int, default=SPLIT_SEED, help="Split seed (same default as the image dataset's)")
+    parser.add_argument("--kind", choices=NUMERIC_KINDS, default="conv")
+    parser.add_argument("--epochs", type=int, default=1000)
+    parser.add_argument("--save-weights", help="Where to save the trained numeric model")
+    parser.add_argument("--image-weights", help="Trained image model weights to compare against on the test split")
+    parser.add_argument("--backbone", default="ConvNeXtXLarge")
+    parser.add_argument("--compare-windows", type=int, default=500, help="Test windows used for the side-by-side report")
+    parser.add_argument("--report", default="numeric_report.json")
+    args = parser.parse_args()
+
+    from forex_breakout.bar_cache import BarCache
+    from forex_breakout.export import classification_report
+    from forex_breakout.manifest import read_manifest
+
+    cache = BarCache(args.cache_dir)
+    symbols = args.symbols or sorted(meta['symbol'] for meta in cache.entries() if meta['timeframe'] == args.timeframe)
+    bars = {symbol: cache.read_arrays(symbol, args.timeframe) for symbol in symbols}
+
+    if args.manifest:
+        manifest = read_manifest(args.manifest)
+        dataset, build_sec = _timed(dataset_from_manifest, manifest[manifest['symbol'].isin(symbols)], bars)
+    else:
+        dataset, build_sec = _timed(dataset_from_bars, bars, args.seed)
+    train, valid, test = (dataset[split] for split in SPLITS)
+    print(f"Built {sum(len(part['y']) for part in dataset.values())} windows in {build_sec:.2f}s "
+          f"(train {len(train['y'])}, validation {len(valid['y'])}, test {len(test['y'])})")
+
+    (model, history), train_sec = _timed(train_numeric_model, train['x'], train['y'], valid['x'], valid['y'],
+                                         kind=args.kind, epochs=args.epochs)
+    print(f"Trained {args.kind} model in {train_sec:.1f}s ({len(history.epoch)} epochs)")
+    if args.save_weights:
+        model.save_weights(args.save_weights, save_format="h5")
+
+    report = {
+        'numeric': {
+            'kind': args.kind,
+            'dataset_build_sec': build_sec,
+            'train_sec': train_sec,
+            'epochs': len(history.epoch),
+            'test': classification_report(model.predict(test['x'], batch_size=4096, verbose=0), test['y'])
+            if len(test['y']) else None,
+        },
+    }
+    if args.image_weights:
+        from forex_breakout.models import load_trained_model
+
+        image_model = load_trained_model(args.image_weights, num_classes=len(LABELS), name=args.backbone)
+        keep = np.random.default_rng(args.seed).permutation(len(test['y']))[:args.compare_windows]
+        sample = {name: values[np.sort(keep)] for name, values in test.items()}
+        report['side_by_side'] = compare_with_image_model(model, image_model, bars, sample)
+        print(pd.DataFrame({
+            name: {key: entry[key] for key in ('accuracy', 'input_build_sec', 'predict_sec', 'windows_per_sec')}
+            for name, entry in report['side_by_side'].items()
+        }).T.to_string())
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(json.dumps(report['numeric'], indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
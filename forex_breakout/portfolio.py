@@ -0,0 +1,248 @@
+import argparse
+import heapq
+from collections import namedtuple
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.backtest import (
+    DIRECTIONS,
+    PROBABILITY_THRESHOLD,
+    STARTING_BALANCE,
+    STOP_LOSS,
+    locate_entries,
+    lot_size,
+    simulate_trades,
+    window_bars,
+)
+
+# Why a signal was not traded
+ACCEPTED, MAX_OPEN, PAIR_LIMIT, NO_CAPITAL = range(4)
+REJECT_REASONS = ("accepted", "max_open_positions", "max_positions_per_pair", "insufficient_capital")
+
+PortfolioResult = namedtuple("PortfolioResult", ["trades", "equity", "summary"])
+
+
+def portfolio_trades(signals, bars, hold=5, stop_loss=STOP_LOSS, threshold=PROBABILITY_THRESHOLD):
+    """
+    Candidate trades of all pairs from cached bars, simulated once with `simulate_trades`.
+
+    Args:
+        signals (pd.DataFrame): Columns 'pair', 'entry_time', 'pred_class' and 'pred_prob'.
+        bars (dict): pair -> column arrays as returned by `BarCache.read_arrays`.
+
+    Returns:
+        dict: Arrays 'pair' (codes), 'pair_names', 'entry_time' and 'exit_time' (epoch seconds;
+        a stopped trade exits on the bar that hit the stop) and 'profit'.
+    """
+    signals = signals[signals['pred_class'].isin(list(DIRECTIONS)) & (signals['pred_prob'] >= threshold)]
+    columns, entry_indices = locate_entries(signals, bars, hold)
+    keep = entry_indices >= 0
+    signals, entry_indices = signals[keep], entry_indices[keep]
+
+    result = simulate_trades(
+        columns['high'], columns['low'], columns['close'], entry_indices,
+        signals['pred_class'].map(DIRECTIONS).to_numpy(), [lot_size(pair) for pair in signals['pair']],
+        stop_loss=stop_loss, hold=hold,
+    )
+    exit_indices = entry_indices + np.where(result['stopped'], result['stop_bar'], hold)
+    pair_names, pair_codes = np.unique(signals['pair'].to_numpy(), return_inverse=True)
+    return {
+        'pair': pair_codes,
+        'pair_names': pair_names,
+        'entry_time': columns['time'][entry_indices],
+        'exit_time': columns['time'][exit_indices],
+        'profit': result['profit'],
+    }
+
+
+def portfolio_trades_from_windows(signals, stop_loss=STOP_LOSS, threshold=PROBABILITY_THRESHOLD, store=None):
+    """
+    Candidate trades from the backtest's windows: the CSVs in a 'file_path' column, or the
+    windows of a `WindowStore` looked up by the signals' 'image_path'.
+    """
+    signals = signals[signals['pred_class'].isin(list(DIRECTIONS)) & (signals['pred_prob'] >= threshold)]
+    bars = window_bars(signals, store)
+    holds = bars['exit_index'] - bars['entry_index']
+    result = simulate_trades(
+        bars['high'], bars['low'], bars['close'], bars['entry_index'],
+        signals['pred_class'].map(DIRECTIONS).to_numpy(), [lot_size(pair) for pair in signals['pair']],
+        stop_loss=stop_loss, hold=holds,
+    )
+    exit_indices = bars['entry_index'] + np.where(result['stopped'], result['stop_bar'], holds)
+    times = bars['time'].astype('datetime64[s]').astype(np.int64)
+    pair_names, pair_codes = np.unique(signals['pair'].to_numpy(), return_inverse=True)
+    return {
+        'pair': pair_codes,
+        'pair_names': pair_names,
+        'entry_time': times[bars['entry_index']],
+        'exit_time': times[exit_indices],
+        'profit': result['profit'],
+    }
+
+
+def merge_order(pair_codes, entry_times):
+    """
+    Global event order of all pairs' signals by entry time.
+
+    Each pair's signals form one run in time order (only sorted when out of order, which the
+    backtest's per-pair outputs usually are not); the runs are then k-way merged with `heapq.merge`.
+    Equal entry times go in pair code order, then in input order.
+    """
+    pair_codes, entry_times = np.asarray(pair_codes), np.asarray(entry_times)
+    runs = []
+    for code in np.unique(pair_codes):
+        run = np.flatnonzero(pair_codes == code)
+        times = entry_times[run]
+        if np.any(times[1:] < times[:-1]):
+            run = run[np.argsort(times, kind='stable')]
+        runs.append(zip(entry_times[run].tolist(), run.tolist()))
+    merged = heapq.merge(*runs, key=itemgetter(0))
+    return np.fromiter((index for _, index in merged), dtype=np.intp, count=len(pair_codes))
+
+
+def run_portfolio(trades, starting_balance=STARTING_BALANCE, max_open_positions=None, max_positions_per_pair=1,
+                  risk_per_trade=-STOP_LOSS):
+    """
+    Event-driven backtest of all pairs' trades against one shared balance.
+
+    Entries are taken in time order; open positions sit in a heap keyed by exit time and are
+    closed (their P&L booked) before any entry at the same or a later time. A signal is skipped
+    when the portfolio already holds `max_open_positions`, when its pair already holds
+    `max_positions_per_pair` (overlapping trades), or when the free capital (balance minus the
+    risk of open positions) is below `risk_per_trade`.
+
+    Args:
+        trades (dict): As returned by `portfolio_trades`.
+
+    Returns:
+        PortfolioResult: trades DataFrame with the 'status' of every signal, the combined equity
+        curve (balance after every closed trade) and a summary dict.
+    """
+    order = merge_order(trades['pair'], trades['entry_time'])
+    pairs = trades['pair'][order].tolist()
+    entries = trades['entry_time'][order].tolist()
+    exits = trades['exit_time'][order].tolist()
+    profits = trades['profit'][order].tolist()
+    max_open = max_open_positions if max_open_positions is not None else len(order) + 1
+
+    status = [ACCEPTED] * len(order)
+    open_positions = []  # Heap of (exit_time, sequence, pair, profit)
+    open_per_pair = [0] * len(trades['pair_names'])
+    balance, open_risk = float(starting_balance), 0.0
+    equity_times, equity_balances = [], []
+
+    def close_until(time):
+        nonlocal balance, open_risk
+        while open_positions and open_positions[0][0] <= time:
+            exit_time, _, pair, profit = heapq.heappop(open_positions)
+            balance += profit
+            open_risk -= risk_per_trade
+            open_per_pair[pair] -= 1
+            equity_times.append(exit_time)
+            equity_balances.append(balance)
+
+    for i in range(len(order)):
+        close_until(entries[i])
+        pair = pairs[i]
+        if len(open_positions) >= max_open:
+            status[i] = MAX_OPEN
+        elif open_per_pair[pair] >= max_positions_per_pair:
+            status[i] = PAIR_LIMIT
+        elif balance - open_risk < risk_per_trade:
+            status[i] = NO_CAPITAL
+        else:
+            heapq.heappush(open_positions, (exits[i], i, pair, profits[i]))
+            open_per_pair[pair] += 1
+            open_risk += risk_per_trade
+    close_until(float('inf'))
+
+    status = np.asarray(status, dtype=np.int8)
+    trades_df = pd.DataFrame({
+        'pair': trades['pair_names'][trades['pair'][order]],
+        'entry_time': pd.to_datetime(trades['entry_time'][order], unit='s'),
+        'exit_time': pd.to_datetime(trades['exit_time'][order], unit='s'),
+        'profit': trades['profit'][order],
+        'status': np.asarray(REJECT_REASONS)[status],
+    })
+    equity = pd.DataFrame({
+        'time': pd.to_datetime(np.asarray(equity_times, dtype=np.int64), unit='s'),
+        'balance': np.asarray(equity_balances, dtype=np.float64),
+    })
+    balances = np.concatenate([[starting_balance], equity['balance'].to_numpy()])
+    summary = {
+        'signals': len(order),
+        'trades': int((status == ACCEPTED).sum()),
+        **{f"skipped_{reason}": int((status == code).sum()) for code, reason in enumerate(REJECT_REASONS) if code},
+        'final_balance': float(balances[-1]),
+        'pnl': float(balances[-1] - starting_balance),
+        'win_rate': float((trades['profit'][order][status == ACCEPTED] > 0).mean()) if (status == ACCEPTED).any() else 0.0,
+        'max_drawdown': float((np.maximum.accumulate(balances) - balances).max()),
+    }
+    return PortfolioResult(trades_df, equity, summary)
+
+
+def plot_equity(result, path=None):
+    """
+    Plot the combined equity curve of a portfolio run.
+    """
+    import matplotlib.pyplot as plt
+
+    summary = result.summary
+    plt.figure(figsize=(10, 6))
+    plt.plot(result.equity['time'], result.equity['balance'])
+    plt.title(f"Portfolio balance - {summary['trades']} trades of {summary['signals']} signals - "
+              f"P&L: £{summary['pnl']:.2f} - Max drawdown: £{summary['max_drawdown']:.2f}")
+    plt.xlabel("Date")
+    plt.ylabel("Account Balance (£)")
+    plt.grid()
+    if path:
+        plt.savefig(path)
+    return plt.gcf()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest all pairs' signals together with one shared balance.")
+    parser.add_argument("--predictions", required=True,
+                        help="CSV/Parquet with pair, entry_time, pred_class and pred_prob columns")
+    parser.add_argument("--cache-dir", default="bar_cache", help="Bar cache with the pairs' bars")
+    parser.add_argument("--timeframe", default="H1")
+    parser.add_argument("--threshold", type=float, default=PROBABILITY_THRESHOLD)
+    parser.add_argument("--stop-loss", type=float, default=STOP_LOSS)
+    parser.add_argument("--hold", type=int, default=5)
+    parser.add_argument("--starting-balance", type=float, default=STARTING_BALANCE)
+    parser.add_argument("--max-open-positions", type=int, default=None)
+    parser.add_argument("--max-positions-per-pair", type=int, default=1)
+    parser.add_argument("--output-prefix", default="portfolio", help="Writes <prefix>_trades.csv, _equity.csv, _equity.png")
+    args = parser.parse_args()
+
+    from forex_breakout.bar_cache import BarCache
+
+    if args.predictions.endswith(".parquet"):
+        signals = pd.read_parquet(args.predictions)
+    else:
+        signals = pd.read_csv(args.predictions)
+    signals['entry_time'] = pd.to_datetime(signals['entry_time'])
+
+    cache = BarCache(args.cache_dir)
+    bars = {pair: cache.read_arrays(pair, args.timeframe) for pair in signals['pair'].unique()}
+    signals = signals[signals['pair'].map(lambda pair: bars[pair] is not None)]
+
+    trades = portfolio_trades(signals, bars, hold=args.hold, stop_loss=args.stop_loss, threshold=args.threshold)
+    result = run_portfolio(
+        trades,
+        starting_balance=args.starting_balance,
+        max_open_positions=args.max_open_positions,
+        max_positions_per_pair=args.max_positions_per_pair,
+        risk_per_trade=-args.stop_loss,
+    )
+    result.trades.to_csv(f"{args.output_prefix}_trades.csv", index=False)
+    result.equity.to_csv(f"{args.output_prefix}_equity.csv", index=False)
+    plot_equity(result, f"{args.output_prefix}_equity.png")
+    for name, value in result.summary.items():
+        print(f"{name:<32} {value}")
+
+
+if __name__ == "__main__":
+    main()
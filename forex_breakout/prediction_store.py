@@ -0,0 +1,171 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.bar_cache import _atomic_write_json
+from forex_breakout.models import IMG_SIZE, weights_fingerprint
+
+CONFIG_FILE = "config.json"
+
+
+def prediction_fingerprint(model, target_size=IMG_SIZE, weights=None):
+    """
+    Fingerprint of everything that determines a chart's predicted probabilities: weights and input size.
+
+    `weights` is the file the model's weights were loaded from, see `weights_fingerprint`.
+    """
+    config = {'weights': weights_fingerprint(model, weights), 'target_size': list(target_size)}
+    return hashlib.blake2b(json.dumps(config, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def _read_part(path):
+    """
+    Read one Parquet part, or None if a concurrent `compact` merged it away (its rows live on in the merged part).
+    """
+    try:
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        return None
+
+
+class PredictionStore:
+    """
+    On-disk class-probability vectors keyed by chart content hash, one directory per model fingerprint.
+
+    Every append writes its own Parquet part (`part-<pid>-<uuid>.parquet`, renamed into place), so
+    several worker processes can add predictions at the same time without locking. Readers see all
+    completed parts; `compact` merges them into one.
+    """
+
+    def __init__(self, root, fingerprint, class_names=None):
+        self.root = root
+        self.fingerprint = fingerprint
+        self.entry_dir = os.path.join(root, fingerprint)
+        os.makedirs(self.entry_dir, exist_ok=True)
+        config_path = os.path.join(self.entry_dir, CONFIG_FILE)
+        if class_names is not None and not os.path.exists(config_path):
+            _atomic_write_json(config_path, {'class_names': list(class_names)})
+        self.hits = 0
+        self.misses = 0
+        self._loaded_parts = set()
+        self._probabilities = {}
+
+    @classmethod
+    def for_model(cls, root, model, class_names, target_size=IMG_SIZE, weights=None):
+        return cls(root, prediction_fingerprint(model, target_size, weights), class_names)
+
+    def _part_paths(self):
+        return sorted(glob.glob(os.path.join(self.entry_dir, "part-*.parquet")))
+
+    def refresh(self):
+        """
+        Load parts written since the last refresh (including those of other processes).
+        """
+        for path in self._part_paths():
+            if path in self._loaded_parts:
+                continue
+            part = _read_part(path)
+            if part is None:
+                continue
+            for chart_hash, probabilities in zip(part['chart_hash'], part['probabilities']):
+                self._probabilities.setdefault(chart_hash, np.asarray(probabilities, dtype=np.float32))
+            self._loaded_parts.add(path)
+
+    def __len__(self):
+        self.refresh()
+        return len(self._probabilities)
+
+    def lookup(self, chart_hashes):
+        """
+        Cached probability vectors for the given hashes (None where missing), counting hits and misses.
+        """
+        self.refresh()
+        found = [self._probabilities.get(chart_hash) for chart_hash in chart_hashes]
+        misses = sum(probabilities is None for probabilities in found)
+        self.hits += len(found) - misses
+        self.misses += misses
+        return found
+
+    def append(self, chart_hashes, probabilities):
+        """
+        Add predictions as a new Parquet part.
+        """
+        if len(chart_hashes) == 0:
+            return
+        part = pd.DataFrame({
+            'chart_hash': list(chart_hashes),
+            'probabilities': [np.asarray(row, dtype=np.float32) for row in probabilities],
+        })
+        path = os.path.join(self.entry_dir, f"part-{os.getpid()}-{uuid.uuid4().hex}.parquet")
+        tmp_path = f"{path}.tmp"
+        part.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self._loaded_parts.add(path)
+        for chart_hash, row in zip(part['chart_hash'], part['probabilities']):
+            self._probabilities.setdefault(chart_hash, row)
+
+    def compact(self):
+        """
+        Merge all current parts into one. Parts appended concurrently are left untouched.
+
+        Returns:
+            int: Number of parts merged.
+        """
+        paths = self._part_paths()
+        if len(paths) <= 1:
+            return 0
+        parts = [part for part in map(_read_part, paths) if part is not None]
+        if not parts:
+            return 0
+        merged = pd.concat(parts, ignore_index=True)
+        merged = merged.drop_duplicates('chart_hash', keep='first')
+        target = os.path.join(self.entry_dir, f"part-{os.getpid()}-{uuid.uuid4().hex}.parquet")
+        merged.to_parquet(f"{target}.tmp", index=False)
+        os.replace(f"{target}.tmp", target)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Already merged by a concurrent compact
+        self._loaded_parts = {target}
+        return len(paths)
+
+    def stats(self):
+        """
+        Lookup hit/miss counts of this store object and the number of stored predictions.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'stored': len(self),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact the on-disk prediction store.")
+    parser.add_argument("--root", default="prediction_store", help="Store directory")
+    parser.add_argument("command", choices=["list", "compact"])
+    args = parser.parse_args()
+
+    if not os.path.exists(args.root):
+        print(f"No prediction store in {args.root}")
+        return
+    for fingerprint in sorted(os.listdir(args.root)):
+        if not os.path.isdir(os.path.join(args.root, fingerprint)):
+            continue
+        store = PredictionStore(args.root, fingerprint)
+        if args.command == "compact":
+            print(f"{fingerprint}: merged {store.compact()} parts")
+        print(f"{fingerprint}: {len(store)} predictions in {len(store._part_paths())} parts")
+
+
+if __name__ == "__main__":
+    main()
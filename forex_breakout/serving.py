@@ -0,0 +1,300 @@
+import argparse
+import bisect
+import os
+import queue
+import secrets
+import stat
+import threading
+import time
+from collections import deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from forex_breakout.inference import chart_input, ohlc_inputs
+from forex_breakout.labeling import LABELS
+from forex_breakout.models import IMG_SIZE
+
+DEFAULT_ADDRESS = ("127.0.0.1", 6011)
+
+# Random per-user key shared by server and clients when FOREX_BREAKOUT_AUTHKEY is not set
+AUTHKEY_FILE = os.path.join(os.path.expanduser("~"), ".forex_breakout_authkey")
+
+
+def _authkey(create=False):
+    """
+    Connection authkey: FOREX_BREAKOUT_AUTHKEY, or the random key in AUTHKEY_FILE (mode 0600).
+
+    Requests are unpickled by the server, so the key must not be guessable: the server
+    (`create=True`) generates the file on first start and clients read it.
+    """
+    if os.environ.get("FOREX_BREAKOUT_AUTHKEY"):
+        return os.environ["FOREX_BREAKOUT_AUTHKEY"].encode()
+    if create and not os.path.exists(AUTHKEY_FILE):
+        # Written privately first and linked into place, so a reader never sees a partial key
+        tmp_path = f"{AUTHKEY_FILE}.tmp-{os.getpid()}"
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, AUTHKEY_FILE)
+        except FileExistsError:
+            pass  # Created by a concurrent server
+        finally:
+            os.remove(tmp_path)
+    if not os.path.exists(AUTHKEY_FILE):
+        # FileNotFoundError: clients keep retrying until the server has created the key
+        raise FileNotFoundError(f"No authkey: set FOREX_BREAKOUT_AUTHKEY or start the server to create {AUTHKEY_FILE}")
+    if stat.S_IMODE(os.stat(AUTHKEY_FILE).st_mode) & 0o077:
+        raise PermissionError(f"{AUTHKEY_FILE} is readable by other users; chmod 600 it")
+    with open(AUTHKEY_FILE) as f:
+        return f.read().strip().encode()
+
+
+def parse_address(address):
+    """
+    "host:port" -> (host, port) for TCP, anything else is used as a Unix socket path.
+    """
+    host, _, port = address.rpartition(":")
+    return (host, int(port)) if host and port.isdigit() else address
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+class InferenceServer:
+    """
+    Long-running inference process: the model is loaded once and requests are micro-batched.
+
+    Clients connect over a local socket (multiprocessing.connection) and send requests with
+    either a rendered chart array or a raw OHLC window. Requests from all connections go into
+    one queue; a batching thread takes the first waiting request, keeps collecting for up to
+    `max_wait_ms` or until `max_batch` requests, runs one forward pass and replies to each
+    request with its class probabilities. Batches are padded to the next power of two (capped at
+    `max_batch`), and the warm-up pass traces every one of these sizes, so no request waits for
+    the model to be traced for a new batch shape.
+    """
+
+    def __init__(self, model, address=DEFAULT_ADDRESS, max_batch=32, max_wait_ms=10.0, target_size=IMG_SIZE,
+                 class_names=LABELS, history=10000):
+        self.model = model
+        self.address = address
+        self.max_batch = max_batch
+        self.padded_sizes = sorted({min(2 ** i, max_batch) for i in range(max_batch.bit_length() + 1)})
+        self.max_wait = max_wait_ms / 1000
+        self.target_size = target_size
+        self.class_names = list(class_names)
+        self._requests = queue.Queue()
+        self._running = threading.Event()
+        self.ready = threading.Event()  # Set once warmed up and listening
+        self._latencies = deque(maxlen=history)  # Seconds from request arrival to reply
+        self._batch_sizes = deque(maxlen=history)
+        self._served = 0
+        self._started = None
+        self._listener = None
+
+    def _input(self, request):
+        if 'ohlc' in request:
+            image = ohlc_inputs(np.asarray(request['ohlc'])[None], self.target_size)[0]
+        else:
+            image = chart_input(request['chart'], self.target_size)
+        # Rejected here with its own error reply instead of failing the whole batch in np.stack
+        if image.shape != (*self.target_size, 3):
+            raise ValueError(f"Input of shape {image.shape}, expected {(*self.target_size, 3)}")
+        return image
+
+    def _handle_connection(self, connection):
+        send_lock = threading.Lock()
+        try:
+            while self._running.is_set():
+                request = connection.recv()
+                received = time.perf_counter()
+                kind = request.get('type', 'predict')
+                if kind == 'stats':
+                    with send_lock:
+                        connection.send({'id': request.get('id'), 'stats': self.stats()})
+                elif kind == 'shutdown':
+                    self.stop()
+                else:
+                    try:
+                        self._requests.put((self._input(request), request.get('id'), received, connection, send_lock))
+                    except Exception as error:  # Bad request: reply with the error instead of dropping the client
+                        with send_lock:
+                            connection.send({'id': request.get('id'), 'error': repr(error)})
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+
+    def _batch_loop(self):
+        while self._running.is_set():
+            try:
+                batch = [self._requests.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                inputs = np.stack([item[0] for item in batch])
+                # A new batch size would trace the model again (seconds for large backbones): pad instead
+                size = self.padded_sizes[bisect.bisect_left(self.padded_sizes, len(batch))]
+                padded = np.zeros((size, *inputs.shape[1:]), dtype=np.float32)
+                padded[:len(batch)] = inputs
+                probabilities = np.asarray(self.model.predict_on_batch(padded))[:len(batch)]
+                replies = [{'probabilities': row, 'pred_class': self.class_names[int(row.argmax())]}
+                           for row in probabilities]
+            except Exception as error:  # Failed batch: every request in it gets the error, the loop keeps serving
+                replies = [{'error': repr(error)}] * len(batch)
+            done = time.perf_counter()
+            for (_, request_id, received, connection, send_lock), reply in zip(batch, replies):
+                try:
+                    with send_lock:
+                        connection.send({'id': request_id, **reply})
+                except (OSError, EOFError):
+                    pass  # Client went away
+                self._latencies.append(done - received)
+            self._batch_sizes.append(len(batch))
+            self._served += len(batch)
+
+    def stats(self):
+        """
+        Latency percentiles (ms), throughput and batch sizes over the recent history.
+        """
+        latencies = np.asarray(self._latencies) * 1000
+        uptime = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            'served': self._served,
+            'throughput_per_sec': self._served / uptime if uptime else 0.0,
+            'latency_p50_ms': _percentile(latencies, 50),
+            'latency_p99_ms': _percentile(latencies, 99),
+            'mean_batch_size': float(np.mean(self._batch_sizes)) if self._batch_sizes else 0.0,
+            'queued': self._requests.qsize(),
+        }
+
+    def serve_forever(self):
+        self._authkey = _authkey(create=True)
+        # Warm-up passes at every padded batch size so no request pays for graph tracing
+        for size in self.padded_sizes:
+            self.model.predict_on_batch(np.zeros((size, *self.target_size, 3), dtype=np.float32))
+
+        self._listener = Listener(self.address, authkey=self._authkey)
+        self._running.set()
+        self._started = time.perf_counter()
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        self.ready.set()
+        print(f"Serving on {self._listener.address} (max_batch={self.max_batch}, max_wait={self.max_wait * 1000:g}ms)")
+        try:
+            while self._running.is_set():
+                try:
+                    connection = self._listener.accept()
+                except AuthenticationError:
+                    continue  # Client without the key: refused, the server keeps running
+                except OSError:
+                    break
+                if not self._running.is_set():  # The wake-up connection of stop()
+                    connection.close()
+                    break
+                threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+        finally:
+            self._running.clear()
+            self._listener.close()
+
+    def stop(self):
+        """
+        Stop serving; called from a connection thread (shutdown request) or any other thread.
+        """
+        if self._running.is_set():
+            self._running.clear()
+            # Closing the listener from another thread does not wake a blocked accept() on Linux,
+            # so connect once to let serve_forever see the cleared flag and close it itself
+            try:
+                Client(self._listener.address, authkey=self._authkey).close()
+            except OSError:
+                pass
+
+
+class InferenceClient:
+    """
+    Client of an InferenceServer. Several requests can be in flight on one connection.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, retries=50, retry_delay=0.2):
+        for attempt in range(retries):
+            try:
+                self.connection = Client(address, authkey=_authkey())
+                break
+            except (ConnectionRefusedError, FileNotFoundError):
+                if attempt == retries - 1:
+                    raise
+                time.sleep(retry_delay)
+        self._next_id = 0
+
+    def _send(self, request):
+        request['id'] = self._next_id
+        self._next_id += 1
+        self.connection.send(request)
+        return request['id']
+
+    def _receive(self, request_ids):
+        # Every reply of the call is read before raising, so none is left for the next call
+        replies = {}
+        while len(replies) < len(request_ids):
+            reply = self.connection.recv()
+            replies[reply['id']] = reply
+        errors = [replies[request_id]['error'] for request_id in request_ids if 'error' in replies[request_id]]
+        if errors:
+            raise RuntimeError(f"{len(errors)} of {len(request_ids)} inference requests failed: {errors[0]}")
+        return [replies[request_id] for request_id in request_ids]
+
+    def predict_ohlc(self, windows):
+        """
+        Class probabilities for OHLC windows of shape (num_windows, num_candles, 4), sent together
+        so the server can batch them.
+        """
+        request_ids = [self._send({'ohlc': np.asarray(window, dtype=np.float64)}) for window in windows]
+        return np.stack([reply['probabilities'] for reply in self._receive(request_ids)])
+
+    def predict_charts(self, charts):
+        """
+        Class probabilities for rendered uint8 chart arrays.
+        """
+        request_ids = [self._send({'chart': np.asarray(chart, dtype=np.uint8)}) for chart in charts]
+        return np.stack([reply['probabilities'] for reply in self._receive(request_ids)])
+
+    def stats(self):
+        return self._receive([self._send({'type': 'stats'})])[0]['stats']
+
+    def shutdown(self):
+        self.connection.send({'type': 'shutdown'})
+        self.connection.close()
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the warm micro-batching inference server.")
+    parser.add_argument("--weights", required=True, help="Trained model weights (e.g. model_0's .keras file)")
+    parser.add_argument("--backbone", default="ConvNeXtXLarge")
+    parser.add_argument("--address", default="{}:{}".format(*DEFAULT_ADDRESS), help="host:port or a Unix socket path")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="Latency budget for filling a batch")
+    args = parser.parse_args()
+
+    from forex_breakout.models import load_trained_model
+
+    model = load_trained_model(args.weights, num_classes=len(LABELS), name=args.backbone)
+    InferenceServer(model, parse_address(args.address), args.max_batch, args.max_wait_ms).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
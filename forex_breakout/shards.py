@@ -0,0 +1,185 @@
+import glob
+import json
+import os
+
+import numpy as np
+
+from forex_breakout.labeling import LABELS
+
+# Model input size used by the training notebooks (IMG_SIZE)
+SHARD_IMAGE_SIZE = (224, 224)
+
+# Per-split metadata index: one record per sample, memory-mappable
+INDEX_DTYPE = np.dtype([
+    ('symbol', 'U8'),
+    ('time', 'i8'),
+    ('label', 'i1'),
+    ('shard', 'i4'),
+    ('offset', 'i4'),
+])
+
+SHARD_FORMATS = ("npy", "tfrecord")
+
+# Images read from a memory-mapped .npy shard at a time by `make_dataset`
+NPY_CHUNK = 64
+
+
+def shard_path(shard_dir, split, shard, shard_format):
+    """
+    Path of one shard, e.g. `train-00003.images.npy` or `train-00003.tfrecord`.
+    """
+    extension = "tfrecord" if shard_format == "tfrecord" else "images.npy"
+    return os.path.join(shard_dir, f"{split}-{shard:05d}.{extension}")
+
+
+def write_npy_shard(path, images, labels):
+    """
+    Write a shard as raw uint8 images (N, H, W, 3) plus its int8 labels, renamed into place atomically.
+    """
+    labels_path = path.replace(".images.npy", ".labels.npy")
+    for target, array in ((labels_path, labels.astype(np.int8)), (path, images)):
+        tmp_path = f"{target}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, target)
+
+
+def write_tfrecord_shard(path, images, labels):
+    """
+    Write a shard as a TFRecord of raw uint8 image bytes, shape and label.
+    """
+    import tensorflow as tf
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with tf.io.TFRecordWriter(tmp_path) as writer:
+        for image, label in zip(images, labels):
+            feature = {
+                'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.tobytes()])),
+                'shape': tf.train.Feature(int64_list=tf.train.Int64List(value=list(image.shape))),
+                'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+            }
+            writer.write(tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString())
+    os.replace(tmp_path, path)
+
+
+def write_index(shard_dir, split, manifest, shard_format, image_size):
+    """
+    Write the memory-mappable per-split index and a small JSON header describing the shards.
+    """
+    split_rows = manifest[manifest['split'] == split].sort_values(['shard', 'offset'])
+    index = np.empty(len(split_rows), dtype=INDEX_DTYPE)
+    index['symbol'] = split_rows['symbol'].to_numpy()
+    index['time'] = split_rows['time'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    index['label'] = [LABELS.index(label) for label in split_rows['label']]
+    index['shard'] = split_rows['shard'].to_numpy()
+    index['offset'] = split_rows['offset'].to_numpy()
+    index_path = os.path.join(shard_dir, f"{split}-index.npy")
+    with open(f"{index_path}.tmp-{os.getpid()}", "wb") as f:
+        np.save(f, index)
+    os.replace(f"{index_path}.tmp-{os.getpid()}", index_path)
+
+    info_path = os.path.join(shard_dir, f"{split}-info.json")
+    with open(f"{info_path}.tmp-{os.getpid()}", "w") as f:
+        json.dump({
+            'format': shard_format,
+            'image_size': list(image_size),
+            'class_names': list(LABELS),
+            'num_samples': len(index),
+            'num_shards': int(index['shard'].max()) + 1 if len(index) else 0,
+        }, f, indent=2)
+    os.replace(f"{info_path}.tmp-{os.getpid()}", info_path)
+
+
+def read_index(shard_dir, split):
+    """
+    Memory-mapped metadata index of a split (symbol, time, label, shard, offset per sample).
+    """
+    return np.load(os.path.join(shard_dir, f"{split}-index.npy"), mmap_mode='r')
+
+
+def read_info(shard_dir, split):
+    with open(os.path.join(shard_dir, f"{split}-info.json")) as f:
+        return json.load(f)
+
+
+def make_dataset(shard_dir, split, batch_size=32, shuffle=False, seed=42, label_mode="categorical",
+                 cycle_length=8, shuffle_buffer=None):
+    """
+    Stream a split's shards into a tf.data pipeline, in place of `image_dataset_from_directory`.
+
+    Shards are read with parallel interleave; there is no per-image file open and no need to
+    `.cache()` the whole split in RAM. `.npy` shards are memory-mapped and read in small chunks,
+    so each of the `cycle_length` open shards only holds one chunk in memory. Images come out as
+    float32 in [0, 255] with the same `class_names` order, labels one-hot for
+    `label_mode="categorical"` or integer for "int". The pixels are not identical to the PNG
+    folders': shard charts are rendered directly at the model size instead of being resized
+    from the 369x496 PNG by `image_dataset_from_directory`.
+
+    Returns:
+        tf.data.Dataset: Batched (images, labels), prefetched.
+    """
+    import tensorflow as tf
+
+    info = read_info(shard_dir, split)
+    height, width = info['image_size']
+    num_classes = len(info['class_names'])
+    pattern = "tfrecord" if info['format'] == "tfrecord" else "images.npy"
+    paths = sorted(glob.glob(os.path.join(shard_dir, f"{split}-[0-9]*.{pattern}")))
+
+    files = tf.data.Dataset.from_tensor_slices(paths)
+    if shuffle:
+        files = files.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    if info['format'] == "tfrecord":
+        features = {
+            'image': tf.io.FixedLenFeature([], tf.string),
+            'shape': tf.io.FixedLenFeature([3], tf.int64),
+            'label': tf.io.FixedLenFeature([], tf.int64),
+        }
+
+        def parse(record):
+            example = tf.io.parse_single_example(record, features)
+            image = tf.reshape(tf.io.decode_raw(example['image'], tf.uint8), [height, width, 3])
+            return image, example['label']
+
+        samples = files.interleave(
+            lambda path: tf.data.TFRecordDataset(path).map(parse),
+            cycle_length=cycle_length,
+            num_parallel_calls=tf.data.AUTOTUNE,
+            deterministic=not shuffle,
+        )
+    else:
+        def npy_chunks(path):
+            # Memory-mapped shard: only the current chunk of images is paged into RAM
+            path = path.decode()
+            images = np.load(path, mmap_mode='r')
+            labels = np.load(path.replace(".images.npy", ".labels.npy")).astype(np.int64)
+            for start in range(0, len(labels), NPY_CHUNK):
+                yield np.array(images[start:start + NPY_CHUNK]), labels[start:start + NPY_CHUNK]
+
+        def read_npy_shard(path):
+            return tf.data.Dataset.from_generator(
+                npy_chunks, args=(path,),
+                output_signature=(tf.TensorSpec([None, height, width, 3], tf.uint8), tf.TensorSpec([None], tf.int64)),
+            ).unbatch()
+
+        samples = files.interleave(
+            read_npy_shard,
+            cycle_length=cycle_length,
+            num_parallel_calls=tf.data.AUTOTUNE,
+            deterministic=not shuffle,
+        )
+
+    if shuffle:
+        samples = samples.shuffle(shuffle_buffer or 100 * batch_size, seed=seed)
+
+    def to_model_input(image, label):
+        if label_mode == "categorical":
+            label = tf.one_hot(label, num_classes)
+        return tf.cast(image, tf.float32), label
+
+    return (
+        samples.map(to_model_input, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
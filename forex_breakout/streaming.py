@@ -0,0 +1,201 @@
+import heapq
+import time as timer
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.labeling import (
+    BEARISH,
+    BULLISH,
+    DEFAULT_GEOMETRY,
+    LABELS,
+    NO_BREAKOUT,
+    breakout_identify,
+    entry_offset,
+    label_windows,
+    window_length,
+)
+
+# Emitted when the entry candle (candle 12) of a window closes: the chart the model sees is complete
+SetupEvent = namedtuple("SetupEvent", ["symbol", "start", "time", "entry_close", "resistance", "support"])
+
+# Emitted when the exit candle (candle 17) closes: the window's label is known
+LabelEvent = namedtuple("LabelEvent", ["symbol", "start", "time", "label"])
+
+
+class BreakoutDetector:
+    """
+    Incremental `breakout_identify` for one symbol, fed one closed bar at a time.
+
+    Every bar starts a new window. The support block maximum/minimum are kept with monotonic
+    deques (at most `support` entries each) and the last `window_length` bars in fixed-size ring
+    buffers, so each update does a constant amount of work and nothing grows with history.
+    """
+
+    def __init__(self, symbol, geometry=DEFAULT_GEOMETRY):
+        self.symbol = symbol
+        self.geometry = geometry
+        self.length = window_length(geometry)
+        self.entry = entry_offset(geometry)
+        self.bars = 0
+
+        # Ring buffers of the last `length` bars
+        self._time = [None] * self.length
+        self._high = [0.0] * self.length
+        self._low = [0.0] * self.length
+        self._close = [0.0] * self.length
+
+        # Monotonic deques of bar indices: decreasing highs (resistance) and increasing lows (support)
+        self._highs = deque()
+        self._lows = deque()
+
+        # Setups waiting for their exit candle, by entry bar index modulo the ring size
+        self._resistance = [0.0] * self.length
+        self._support = [0.0] * self.length
+
+    def update(self, time, high, low, close):
+        """
+        Add the next closed bar.
+
+        Returns:
+            tuple: (SetupEvent or None, LabelEvent or None)
+        """
+        length, support_size = self.length, self.geometry.support
+        t = self.bars
+        slot = t % length
+        self._time[slot] = time
+        self._high[slot] = high
+        self._low[slot] = low
+        self._close[slot] = close
+        self.bars = t + 1
+
+        setup = resolved = None
+
+        # The support block of the window whose entry candle is bar t ends `setup` bars before it
+        block_end = t - self.geometry.setup
+        if block_end >= 0:
+            block_slot = block_end % length
+            block_high, block_low = self._high[block_slot], self._low[block_slot]
+            highs, lows = self._highs, self._lows
+            while highs and self._high[highs[-1] % length] <= block_high:
+                highs.pop()
+            highs.append(block_end)
+            while lows and self._low[lows[-1] % length] >= block_low:
+                lows.pop()
+            lows.append(block_end)
+            block_start = block_end - support_size + 1
+            if highs[0] < block_start:
+                highs.popleft()
+            if lows[0] < block_start:
+                lows.popleft()
+
+        if t >= self.entry:
+            resistance = self._high[self._highs[0] % length]
+            support = self._low[self._lows[0] % length]
+            self._resistance[slot] = resistance
+            self._support[slot] = support
+            setup = SetupEvent(self.symbol, t - self.entry, time, close, resistance, support)
+
+        if t >= length - 1:
+            entry_slot = (t - (length - 1 - self.entry)) % length
+            entry_close = self._close[entry_slot]
+            if close > self._high[entry_slot] and entry_close > self._resistance[entry_slot]:
+                label = BULLISH
+            elif close < self._low[entry_slot] and entry_close < self._support[entry_slot]:
+                label = BEARISH
+            else:
+                label = NO_BREAKOUT
+            resolved = LabelEvent(self.symbol, t - length + 1, self._time[entry_slot], label)
+
+        return setup, resolved
+
+
+class BreakoutScanner:
+    """
+    One `BreakoutDetector` per symbol, driven from a single loop.
+    """
+
+    def __init__(self, symbols, geometry=DEFAULT_GEOMETRY):
+        self.detectors = {symbol: BreakoutDetector(symbol, geometry) for symbol in symbols}
+
+    def update(self, symbol, time, high, low, close):
+        return self.detectors[symbol].update(time, high, low, close)
+
+    def replay(self, bars):
+        """
+        Replay historical bars of all symbols in time order and yield every event.
+
+        Args:
+            bars (dict): symbol -> dict of 'time', 'high', 'low' and 'close' arrays (time-sorted).
+        """
+        streams = [
+            zip(columns['time'].tolist(), [symbol] * len(columns['time']), columns['high'].tolist(),
+                columns['low'].tolist(), columns['close'].tolist())
+            for symbol, columns in bars.items()
+        ]
+        for time, symbol, high, low, close in heapq.merge(*streams, key=lambda bar: bar[0]):
+            setup, resolved = self.detectors[symbol].update(time, high, low, close)
+            if setup is not None:
+                yield setup
+            if resolved is not None:
+                yield resolved
+
+
+def random_series(length, seed):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 1, length) * rng.choice([0.0, 1.0], length, p=[0.1, 0.9])
+    close = np.round(100 + np.cumsum(steps), 2)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.round(np.abs(rng.normal(0, 0.5, (2, length))), 2)
+    return {
+        'time': np.arange(length, dtype=np.int64) * 3600,
+        'high': np.maximum(open_, close) + spread[0],
+        'low': np.minimum(open_, close) - spread[1],
+        'open': open_,
+        'close': close,
+    }
+
+
+def check_parity(num_symbols=28, length=2000, seed=0):
+    """
+    Replay random series for many symbols through one scanner and compare every label with
+    `label_windows` and a sample with `breakout_identify`.
+
+    Returns:
+        int: Number of windows compared. Raises AssertionError on the first mismatch.
+    """
+    bars = {f"S{i:02d}": random_series(length, seed + i) for i in range(num_symbols)}
+    scanner = BreakoutScanner(bars)
+    labels = {symbol: [] for symbol in bars}
+    setups = {symbol: 0 for symbol in bars}
+    for event in scanner.replay(bars):
+        if isinstance(event, LabelEvent):
+            labels[event.symbol].append(event.label)
+        else:
+            setups[event.symbol] += 1
+
+    compared = 0
+    rng = np.random.default_rng(seed)
+    for symbol, columns in bars.items():
+        expected = label_windows(columns['high'], columns['low'], columns['close'])
+        assert np.array_equal(np.asarray(labels[symbol], dtype=np.int8), expected), symbol
+        assert setups[symbol] == length - entry_offset(DEFAULT_GEOMETRY), symbol
+        df = pd.DataFrame({name: columns[name] for name in ('open', 'high', 'low', 'close')})
+        for start in rng.choice(len(expected), 20, replace=False):
+            assert LABELS[labels[symbol][start]] == breakout_identify(df.iloc[start:start + 17]), (symbol, start)
+        compared += len(expected)
+    return compared
+
+
+if __name__ == "__main__":
+    print(f"Parity check passed on {check_parity()} windows.")
+
+    columns = random_series(200000, seed=1)
+    detector = BreakoutDetector("BENCH")
+    values = list(zip(columns['time'].tolist(), columns['high'].tolist(), columns['low'].tolist(),
+                      columns['close'].tolist()))
+    start = timer.perf_counter()
+    for bar in values:
+        detector.update(*bar)
+    print(f"{len(values) / (timer.perf_counter() - start):,.0f} bars/s per detector")
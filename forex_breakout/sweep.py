@@ -0,0 +1,344 @@
+import argparse
+import itertools
+import os
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.backtest import (
+    DIRECTIONS,
+    LONG,
+    PROBABILITY_THRESHOLD,
+    STARTING_BALANCE,
+    STOP_LOSS,
+    locate_entries,
+    lot_size,
+    random_window_files,
+    simulate_signals,
+    simulate_trades,
+    window_bars,
+)
+
+# One backtest configuration; take_profit None means no take-profit (exit after `hold` bars)
+SweepConfig = namedtuple("SweepConfig", ["threshold", "stop_loss", "take_profit", "hold"])
+
+# win_rate is the share of trades closed with a profit; the notebook's "correct" count (exit close
+# moved in the predicted direction) differs for trades that were stopped out first
+RESULT_COLUMNS = ['scope', 'threshold', 'stop_loss', 'take_profit', 'hold', 'trades', 'pnl', 'win_rate',
+                  'max_drawdown']
+
+
+def config_grid(thresholds, stop_losses, take_profits, holds):
+    """
+    Every combination of the given parameter values.
+    """
+    return [SweepConfig(*values) for values in itertools.product(thresholds, stop_losses, take_profits, holds)]
+
+
+def trade_paths(highs, lows, closes, entry_indices, directions, lot_sizes, max_hold, last_indices=None):
+    """
+    Per-bar excursions of every trade over the next `max_hold` bars, in account currency.
+
+    These are computed once and shared by every configuration of a sweep: stops, take-profits and
+    holding lengths only change which bar of the path ends the trade. With `last_indices` (e.g. a
+    window's last row) each path stops there and repeats that bar, so longer holds close the trade
+    on it.
+
+    Returns:
+        dict: (num_trades, max_hold) arrays 'adverse' (low for longs, high for shorts), 'favourable'
+        (high for longs, low for shorts) and 'close_pnl' (P&L if closed at that bar).
+    """
+    closes = np.asarray(closes)
+    entry_indices = np.asarray(entry_indices, dtype=np.int64)
+    lot_sizes = np.broadcast_to(np.asarray(lot_sizes, dtype=np.float64), entry_indices.shape)[:, None]
+    long = (np.asarray(directions) == LONG)[:, None]
+
+    path = entry_indices[:, None] + np.arange(1, max_hold + 1)
+    if last_indices is not None:
+        path = np.minimum(path, np.asarray(last_indices, dtype=np.int64)[:, None])
+    entry_close = closes[entry_indices][:, None]
+    highs, lows = np.asarray(highs)[path], np.asarray(lows)[path]
+    return {
+        'adverse': np.where(long, (lows - entry_close) * lot_sizes, (entry_close - highs) * lot_sizes),
+        'favourable': np.where(long, (highs - entry_close) * lot_sizes, (entry_close - lows) * lot_sizes),
+        'close_pnl': np.where(long, (closes[path] - entry_close) * lot_sizes, (entry_close - closes[path]) * lot_sizes),
+    }
+
+
+def _sweep_input(signals, entry_time, paths):
+    pairs = signals['pair'].to_numpy()
+    pair_names, pair_codes = np.unique(pairs, return_inverse=True)
+    return {
+        'pair_names': pair_names,
+        'pair_codes': pair_codes,
+        'entry_time': np.asarray(entry_time),
+        'prob': signals['pred_prob'].to_numpy(dtype=np.float64),
+        **paths,
+    }
+
+
+def paths_from_bars(signals, bars, max_hold):
+    """
+    Sweep input from per-pair bar arrays (e.g. `BarCache.read_arrays`), which allows any holding length.
+
+    Args:
+        signals (pd.DataFrame): Columns 'pair', 'entry_time', 'pred_class' and 'pred_prob'; only
+            bullish/bearish predictions are used.
+        bars (dict): pair -> dict of 'time' (epoch seconds), 'high', 'low' and 'close' arrays.
+        max_hold (int): Longest holding length of the sweep.
+
+    Returns:
+        dict: Signal metadata and `trade_paths` arrays. Signals whose entry bar is not in `bars`
+        or without `max_hold` bars after it are dropped.
+    """
+    signals = signals[signals['pred_class'].isin(list(DIRECTIONS))]
+    columns, entry_indices = locate_entries(signals, bars, max_hold)
+    keep = entry_indices >= 0
+    if not keep.all():
+        print(f"Dropped {int((~keep).sum())} signals without an entry bar or {max_hold} bars after it")
+    signals = signals[keep]
+    entry_indices = entry_indices[keep]
+    paths = trade_paths(
+        columns['high'], columns['low'], columns['close'], entry_indices,
+        signals['pred_class'].map(DIRECTIONS).to_numpy(), [lot_size(pair) for pair in signals['pair']], max_hold,
+    )
+    return _sweep_input(signals, signals['entry_time'].to_numpy(), paths)
+
+
+def paths_from_windows(signals, max_hold=6, store=None):
+    """
+    Sweep input from the per-chart windows of the backtest.
+
+    17-row windows hold 5 bars after the entry and 18-row windows 6. A hold beyond a window's
+    last row closes the trade on that row, which is where the notebook closes every trade, so
+    hold 6 reproduces the notebook's exits for both window lengths (hold 5 does not for 18-row
+    windows).
+
+    Args:
+        signals (pd.DataFrame): Columns 'pair', 'pred_class', 'pred_prob' and 'file_path' (window
+            CSVs) or, with a `WindowStore`, 'image_path'.
+    """
+    signals = signals[signals['pred_class'].isin(list(DIRECTIONS))]
+    bars = window_bars(signals, store)
+    paths = trade_paths(
+        bars['high'], bars['low'], bars['close'], bars['entry_index'],
+        signals['pred_class'].map(DIRECTIONS).to_numpy(), [lot_size(pair) for pair in signals['pair']], max_hold,
+        last_indices=bars['exit_index'],
+    )
+    return _sweep_input(signals, bars['time'][bars['entry_index']], paths)
+
+
+def _first_hit(hits):
+    """
+    Index of the first True per row, or the row length if there is none.
+    """
+    return np.where(hits.any(axis=1), hits.argmax(axis=1), hits.shape[1])
+
+
+def _max_drawdown(profits, starting_balance):
+    balances = starting_balance + np.cumsum(profits)
+    peaks = np.maximum.accumulate(np.concatenate([[starting_balance], balances]))[1:]
+    return float((peaks - balances).max()) if len(balances) else 0.0
+
+
+def _metrics(scope, config, profits, selected, starting_balance):
+    trades = int(selected.sum())
+    return (
+        scope, config.threshold, config.stop_loss, config.take_profit, config.hold, trades,
+        float(profits.sum()),
+        float((profits[selected] > 0).sum() / trades) if trades else 0.0,
+        _max_drawdown(profits, starting_balance),
+    )
+
+
+def evaluate_configs(sweep_input, configs, starting_balance=STARTING_BALANCE):
+    """
+    Evaluate configurations on precomputed trade paths.
+
+    A stop and a take-profit reached on the same bar count as a stop. Without either, the trade
+    closes after `hold` bars. With take_profit None, threshold 0.95 and stop -100, the notebook's
+    rule is hold 6 on `paths_from_windows` input (each trade closes on its window's last row);
+    on `paths_from_bars` input hold 5 matches the notebook only for trades from 17-row windows.
+
+    Returns:
+        list: One tuple of RESULT_COLUMNS per configuration for the portfolio and for every pair.
+    """
+    prob, entry_time, pair_codes = sweep_input['prob'], sweep_input['entry_time'], sweep_input['pair_codes']
+    adverse, favourable, close_pnl = sweep_input['adverse'], sweep_input['favourable'], sweep_input['close_pnl']
+    max_hold = close_pnl.shape[1]
+
+    # Trade order for the equity curves: by entry time, per pair and for the whole portfolio
+    portfolio_order = np.argsort(entry_time, kind='stable')
+    pair_orders = [portfolio_order[pair_codes[portfolio_order] == code] for code in range(len(sweep_input['pair_names']))]
+
+    # First stop / take-profit bar per level, shared by every configuration using that level
+    first_stop = {level: _first_hit(adverse <= level) for level in {config.stop_loss for config in configs}}
+    first_take = {
+        level: _first_hit(favourable >= level) if level is not None else np.full(len(prob), max_hold)
+        for level in {config.take_profit for config in configs}
+    }
+
+    rows = []
+    for config in configs:
+        if config.hold > max_hold:
+            raise ValueError(f"hold {config.hold} is longer than the {max_hold} precomputed bars")
+        stop_bar, take_bar = first_stop[config.stop_loss], first_take[config.take_profit]
+        stopped = (stop_bar < config.hold) & (stop_bar <= take_bar)
+        taken = (take_bar < config.hold) & ~stopped
+
+        profits = np.where(stopped, float(config.stop_loss),
+                           np.where(taken, float(config.take_profit or 0), close_pnl[:, config.hold - 1]))
+        selected = prob >= config.threshold
+        profits = np.where(selected, profits, 0.0)
+
+        rows.append(_metrics('portfolio', config, profits[portfolio_order], selected[portfolio_order],
+                             starting_balance))
+        for name, order in zip(sweep_input['pair_names'], pair_orders):
+            rows.append(_metrics(name, config, profits[order], selected[order], starting_balance))
+    return rows
+
+
+_worker_input = None
+
+
+def _init_worker(sweep_input, starting_balance):
+    global _worker_input
+    _worker_input = (sweep_input, starting_balance)
+
+
+def _evaluate_chunk(configs):
+    sweep_input, starting_balance = _worker_input
+    return evaluate_configs(sweep_input, configs, starting_balance)
+
+
+def run_sweep(sweep_input, configs, workers=None, starting_balance=STARTING_BALANCE, chunk_size=64):
+    """
+    Evaluate every configuration, split across worker processes for large grids.
+
+    Returns:
+        pd.DataFrame: RESULT_COLUMNS, ranked by P&L within each scope (portfolio first).
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [configs[lo:lo + chunk_size] for lo in range(0, len(configs), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        rows = evaluate_configs(sweep_input, configs, starting_balance)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                                 initargs=(sweep_input, starting_balance)) as executor:
+            rows = [row for chunk_rows in executor.map(_evaluate_chunk, chunks) for row in chunk_rows]
+    return rank_results(pd.DataFrame(rows, columns=RESULT_COLUMNS))
+
+
+def rank_results(results):
+    """
+    Sort results by P&L (best first) within each scope, with the portfolio rows first.
+    """
+    results = results.assign(is_portfolio=results['scope'] == 'portfolio')
+    results = results.sort_values(['is_portfolio', 'scope', 'pnl'], ascending=[False, True, False], kind='stable')
+    results['rank'] = results.groupby('scope').cumcount() + 1
+    return results.drop(columns=['is_portfolio']).reset_index(drop=True)
+
+
+def check_parity(num_bars=5000, num_signals=2000, seed=0):
+    """
+    Compare the notebook configuration of the sweep against `simulate_trades` on bar arrays, and
+    against `simulate_signals` on 17- and 18-row window CSVs.
+
+    Returns:
+        int: Number of signals compared. Raises AssertionError on a mismatch.
+    """
+    rng = np.random.default_rng(seed)
+    times = np.arange(num_bars, dtype=np.int64) * 3600
+    bars = {}
+    for pair, base, scale in (("EURUSD", 1.1, 0.0001), ("USDJPY", 150.0, 0.01)):
+        close = np.round(base + np.cumsum(rng.normal(0, 8 * scale, num_bars)), 5)
+        spread = np.abs(rng.normal(0, 5 * scale, (2, num_bars)))
+        bars[pair] = {'time': times, 'high': close + spread[0], 'low': close - spread[1], 'close': close}
+
+    signals = pd.DataFrame({
+        'pair': rng.choice(list(bars), num_signals),
+        'entry_time': pd.to_datetime(rng.choice(times[:-10], num_signals), unit='s'),
+        'pred_class': rng.choice(list(DIRECTIONS) + ["no_breakout"], num_signals),
+        'pred_prob': rng.uniform(0.5, 1.0, num_signals),
+    })
+    sweep_input = paths_from_bars(signals, bars, max_hold=8)
+    config = SweepConfig(PROBABILITY_THRESHOLD, STOP_LOSS, None, 5)
+    results = pd.DataFrame(evaluate_configs(sweep_input, [config]), columns=RESULT_COLUMNS).set_index('scope')
+
+    total = 0.0
+    for pair in bars:
+        pair_signals = signals[(signals['pair'] == pair) & signals['pred_class'].isin(list(DIRECTIONS))
+                               & (signals['pred_prob'] >= PROBABILITY_THRESHOLD)]
+        entry = np.searchsorted(times, pair_signals['entry_time'].to_numpy().astype('datetime64[s]').astype(np.int64))
+        expected = simulate_trades(bars[pair]['high'], bars[pair]['low'], bars[pair]['close'], entry,
+                                   pair_signals['pred_class'].map(DIRECTIONS).to_numpy(), lot_size(pair))
+        assert results.loc[pair, 'trades'] == len(pair_signals), pair
+        assert np.isclose(results.loc[pair, 'pnl'], expected['profit'].sum()), pair
+        assert np.isclose(results.loc[pair, 'win_rate'], (expected['profit'] > 0).mean()), pair
+        total += expected['profit'].sum()
+    assert np.isclose(results.loc['portfolio', 'pnl'], total)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        window_signals = random_window_files(tmp_dir, num_signals // 4, seed=seed).assign(pred_prob=1.0)
+        sweep_input = paths_from_windows(window_signals)
+        config = SweepConfig(PROBABILITY_THRESHOLD, STOP_LOSS, None, 6)
+        results = pd.DataFrame(evaluate_configs(sweep_input, [config]), columns=RESULT_COLUMNS).set_index('scope')
+        for pair, pair_signals in window_signals.groupby('pair'):
+            trades, _ = simulate_signals(pair_signals)
+            assert np.isclose(results.loc[pair, 'pnl'], trades['profit'].sum()), pair
+            assert np.isclose(results.loc[pair, 'win_rate'], (trades['profit'] > 0).mean()), pair
+    return num_signals + len(window_signals)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep probability thresholds, stops, take-profits and holding lengths over cached predictions."
+    )
+    parser.add_argument("--predictions", help="CSV/Parquet with pair, entry_time, pred_class and pred_prob columns")
+    parser.add_argument("--cache-dir", default="bar_cache", help="Bar cache with the pairs' bars")
+    parser.add_argument("--timeframe", default="H1")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--stop-losses", type=float, nargs="+", default=[-50, -100, -200])
+    parser.add_argument("--take-profits", type=float, nargs="+", default=[0, 100, 200],
+                        help="0 means no take-profit")
+    parser.add_argument("--holds", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20, help="Portfolio configurations to print")
+    parser.add_argument("--output", default="sweep_results.csv")
+    parser.add_argument("--check", action="store_true", help="Only run the parity check against simulate_trades")
+    args = parser.parse_args()
+
+    if args.check:
+        print(f"Parity check passed on {check_parity()} signals.")
+        return
+    if not args.predictions:
+        parser.error("--predictions is required")
+
+    from forex_breakout.bar_cache import BarCache
+
+    if args.predictions.endswith(".parquet"):
+        signals = pd.read_parquet(args.predictions)
+    else:
+        signals = pd.read_csv(args.predictions)
+    signals['entry_time'] = pd.to_datetime(signals['entry_time'])
+
+    cache = BarCache(args.cache_dir)
+    bars = {pair: cache.read_arrays(pair, args.timeframe) for pair in signals['pair'].unique()}
+    missing = [pair for pair, arrays in bars.items() if arrays is None]
+    if missing:
+        print(f"No cached {args.timeframe} bars for {missing}; their signals are skipped")
+        signals = signals[~signals['pair'].isin(missing)]
+
+    configs = config_grid(args.thresholds, args.stop_losses, [tp or None for tp in args.take_profits], args.holds)
+    sweep_input = paths_from_bars(signals, bars, max(args.holds))
+    results = run_sweep(sweep_input, configs, args.workers)
+    results.to_csv(args.output, index=False)
+    print(results[results['scope'] == 'portfolio'].head(args.top).to_string(index=False))
+    print(f"{len(configs)} configurations x {results['scope'].nunique()} scopes written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.data_source import TIMEFRAME_SECONDS, BarSource
+
+# Shape of a synthetic series: drift and volatility in pips per hour (scaled to the timeframe),
+# probability of a gap per bar, gap size and wick length in pips
+SyntheticConfig = namedtuple(
+    "SyntheticConfig",
+    ["trend", "volatility", "gap_probability", "gap_pips", "weekend_gaps", "wick_pips"],
+    defaults=[0.0, 8.0, 0.002, 40.0, True, 4.0],
+)
+DEFAULT_SYNTHETIC = SyntheticConfig()
+
+
+def pip_size(symbol):
+    """
+    0.01 for JPY crosses, 0.0001 otherwise (the same convention as the backtest's lot sizes).
+    """
+    return 0.01 if "JPY" in symbol else 0.0001
+
+
+def _symbol_seed(seed, symbol):
+    return int.from_bytes(hashlib.blake2b(f"{seed}:{symbol}".encode(), digest_size=8).digest(), "little")
+
+
+def synthetic_columns(symbol, num_bars, timeframe="H1", start="2020-01-06", seed=0, config=DEFAULT_SYNTHETIC):
+    """
+    Seeded random-walk bars of one symbol as column arrays in the bar cache layout.
+
+    Prices move in pips of the symbol (JPY pairs around 150 with 3 digits, others around 1.1
+    with 5 digits), with the configured volatility scaled by the square root of the bar length.
+    With `weekend_gaps`, Saturday and Sunday bars are skipped and Monday opens away from
+    Friday's close; random gaps make a bar open away from the previous close.
+    The same (seed, symbol) always gives the same series.
+
+    Returns:
+        dict: 'time' (int64 epoch seconds), 'open', 'high', 'low', 'close', 'tick_volume',
+        'spread' and 'real_volume' arrays.
+    """
+    # One generator per quantity: a longer series starts with exactly the bars of a shorter one
+    gap_rng, gap_size_rng, move_rng, wick_rng, volume_rng, spread_rng = (
+        np.random.default_rng([_symbol_seed(seed, symbol), stream]) for stream in range(6)
+    )
+    pip = pip_size(symbol)
+    digits = 3 if "JPY" in symbol else 5
+    step = TIMEFRAME_SECONDS[timeframe]
+
+    # Enough calendar slots for `num_bars` trading bars once weekends are dropped
+    slots = int(num_bars * (7 / 5 if config.weekend_gaps else 1)) + 2 * 86400 // step + 1
+    times = int(pd.Timestamp(start).timestamp()) + np.arange(slots, dtype=np.int64) * step
+    if config.weekend_gaps:
+        weekend = (times // 86400 + 3) % 7 >= 5  # Epoch day 0 was a Thursday
+        monday_open = np.concatenate([[False], weekend[:-1] & ~weekend[1:]])[~weekend]
+        times = times[~weekend]
+    else:
+        monday_open = np.zeros(len(times), dtype=bool)
+    times, monday_open = times[:num_bars], monday_open[:num_bars]
+
+    gaps = (gap_rng.random(num_bars) < config.gap_probability) | monday_open
+    gap_moves = np.where(gaps, gap_size_rng.normal(0, config.gap_pips, num_bars), 0.0)
+    hours = step / 3600
+    moves = config.trend * hours + move_rng.normal(0, config.volatility * np.sqrt(hours), num_bars)
+    close_pips = np.cumsum(gap_moves + moves)
+    open_pips = close_pips - moves
+
+    # Geometric walk so long series stay positive; near the base price one pip is still one pip
+    base = 150.0 if "JPY" in symbol else 1.1
+    close = np.round(base * np.exp(close_pips * pip / base), digits)
+    open_ = np.round(base * np.exp(open_pips * pip / base), digits)
+    wicks = np.abs(wick_rng.normal(0, config.wick_pips, (num_bars, 2))).T * pip
+    return {
+        'time': times,
+        'open': open_,
+        'high': np.round(np.maximum(open_, close) + wicks[0], digits),
+        'low': np.round(np.minimum(open_, close) - wicks[1], digits),
+        'close': close,
+        'tick_volume': volume_rng.integers(100, 5000, num_bars),
+        'spread': spread_rng.integers(0, 20, num_bars).astype(np.int32),
+        'real_volume': np.zeros(num_bars, dtype=np.int64),
+    }
+
+
+def synthetic_frame(symbol, num_bars, timeframe="H1", start="2020-01-06", seed=0, config=DEFAULT_SYNTHETIC):
+    """
+    `synthetic_columns` as the time-indexed DataFrame returned by the bar sources.
+    """
+    columns = synthetic_columns(symbol, num_bars, timeframe, start, seed, config)
+    df = pd.DataFrame({name: values for name, values in columns.items() if name != 'time'},
+                      index=pd.to_datetime(columns['time'], unit='s'))
+    df.index.name = 'time'
+    return df
+
+
+class SyntheticBarSource(BarSource):
+    """
+    Bar source generating seeded synthetic bars instead of calling MetaTrader 5.
+
+    Every (symbol, timeframe) is one fixed series starting at `origin`, so any requested date
+    range returns consistent bars across calls.
+    """
+
+    def __init__(self, seed=0, config=DEFAULT_SYNTHETIC, origin="2015-01-05"):
+        self.seed = seed
+        self.config = config
+        self.origin = pd.Timestamp(origin)
+
+    def fetch(self, symbol, timeframe, start, end):
+        calendar_bars = int((pd.Timestamp(end) - self.origin).total_seconds() // TIMEFRAME_SECONDS[timeframe]) + 1
+        if calendar_bars <= 0:
+            return None
+        # Calendar slots bound the number of trading bars up to `end`; the surplus is sliced off
+        df = synthetic_frame(symbol, calendar_bars, timeframe, self.origin, self.seed, self.config)
+        return df.loc[start:end]
+
+    def identity(self):
+        return f"{type(self).__name__}(seed={self.seed}, origin={self.origin.date()}, config={tuple(self.config)})"
@@ -0,0 +1,288 @@
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from forex_breakout.bar_cache import _atomic_save_npy
+from forex_breakout.labeling import DEFAULT_GEOMETRY, entry_offset
+
+# Column order of the per-symbol bar array
+OHLC_COLUMNS = ('open', 'high', 'low', 'close')
+
+# One record per backtest window: its bars are ohlc[start:start + length], its chart is <chart>.png
+WINDOW_DTYPE = np.dtype([
+    ('start', 'i8'),
+    ('length', 'i4'),
+    ('time', 'i8'),
+    ('chart', 'U32'),
+])
+
+OHLC_FILE = "ohlc.npy"
+TIME_FILE = "time.npy"
+WINDOWS_FILE = "windows.npy"
+
+
+def chart_id(image_path):
+    """
+    Chart id of a chart image: its file name without extension (e.g. EURUSD_202312150331).
+    """
+    return os.path.splitext(os.path.basename(image_path))[0]
+
+
+def write_window_store(symbol_dir, columns, starts, lengths, charts):
+    """
+    Write one symbol's bars as a contiguous (num_bars, 4) OHLC array plus epoch-second times, and
+    the window index pointing into them. Each file is renamed into place once complete.
+
+    Args:
+        columns (dict): 'time' (epoch seconds), 'open', 'high', 'low' and 'close' arrays.
+        starts, lengths: First bar and number of bars of every window.
+        charts: Chart id of every window.
+    """
+    os.makedirs(symbol_dir, exist_ok=True)
+    windows = np.empty(len(starts), dtype=WINDOW_DTYPE)
+    windows['start'] = starts
+    windows['length'] = lengths
+    windows['time'] = np.asarray(columns['time'], dtype=np.int64)[np.asarray(starts, dtype=np.int64)]
+    windows['chart'] = charts
+    _atomic_save_npy(os.path.join(symbol_dir, OHLC_FILE),
+                     np.stack([np.asarray(columns[name], dtype=np.float64) for name in OHLC_COLUMNS], axis=1))
+    _atomic_save_npy(os.path.join(symbol_dir, TIME_FILE), np.asarray(columns['time'], dtype=np.int64))
+    _atomic_save_npy(os.path.join(symbol_dir, WINDOWS_FILE), windows[np.argsort(windows['chart'], kind='stable')])
+
+
+def interval_windows(times, start, end, step=pd.Timedelta(hours=17), min_bars=17):
+    """
+    Windows of the backtest data export: one every `step` from `start` while it ends by `end`,
+    holding every bar from its start to its end inclusive (the script's `df.loc` slice), and only
+    kept with at least `min_bars` bars. Windows can hold one more bar than `min_bars`.
+
+    Args:
+        times: Sorted bar times in epoch seconds.
+
+    Returns:
+        tuple: (first bar, number of bars and nominal start Timestamp of every kept window)
+    """
+    bounds = pd.date_range(pd.Timestamp(start), pd.Timestamp(end) - step, freq=step)
+    nanoseconds = lambda index: index.values.astype('datetime64[ns]').astype(np.int64)
+    times_ns = np.asarray(times, dtype=np.int64) * 10 ** 9
+    starts = np.searchsorted(times_ns, nanoseconds(bounds), side='left')
+    stops = np.searchsorted(times_ns, nanoseconds(bounds + step), side='right')
+    keep = stops - starts >= min_bars
+    return starts[keep], (stops - starts)[keep], bounds[keep]
+
+
+class WindowStore:
+    """
+    Memory-mapped backtest windows of every pair under `root` (<root>/<pair>/ohlc.npy, time.npy, windows.npy).
+
+    Replaces the one-CSV-per-window layout: a signal's chart id gives its window's start offset,
+    and its bars are a slice of the pair's OHLC array, read without parsing or copying.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._pairs = {}
+
+    @classmethod
+    def open(cls, root):
+        """
+        The store under `root`, or None if the data there was exported as per-window CSVs.
+        """
+        if not os.path.isdir(root):
+            return None
+        if not any(os.path.exists(os.path.join(root, pair, WINDOWS_FILE)) for pair in os.listdir(root)):
+            return None
+        return cls(root)
+
+    def pair(self, pair):
+        """
+        dict of a pair's memory-mapped 'ohlc', 'time' and 'windows' arrays.
+        """
+        if pair not in self._pairs:
+            pair_dir = os.path.join(self.root, pair)
+            self._pairs[pair] = {
+                'ohlc': np.load(os.path.join(pair_dir, OHLC_FILE), mmap_mode='r'),
+                'time': np.load(os.path.join(pair_dir, TIME_FILE), mmap_mode='r'),
+                'windows': np.load(os.path.join(pair_dir, WINDOWS_FILE), mmap_mode='r'),
+            }
+        return self._pairs[pair]
+
+    def locate(self, pair, charts):
+        """
+        Window records of the given chart ids of one pair. Raises KeyError for unknown charts.
+        """
+        windows = self.pair(pair)['windows']
+        charts = np.asarray(charts, dtype=WINDOW_DTYPE['chart'])
+        index = np.minimum(np.searchsorted(windows['chart'], charts), max(len(windows) - 1, 0))
+        found = windows['chart'][index] == charts if len(windows) else np.zeros(len(charts), dtype=bool)
+        if not found.all():
+            raise KeyError(f"{pair}: no window for charts {charts[~found][:5].tolist()}")
+        return windows[index]
+
+    def window(self, pair, chart):
+        """
+        One window's bars as the time-indexed DataFrame the per-window CSVs used to hold.
+        """
+        record = self.locate(pair, [chart])[0]
+        bars = self.pair(pair)
+        rows = slice(int(record['start']), int(record['start'] + record['length']))
+        df = pd.DataFrame(np.asarray(bars['ohlc'][rows]), columns=list(OHLC_COLUMNS),
+                          index=pd.to_datetime(np.asarray(bars['time'][rows]), unit='s'))
+        df.index.name = 'time'
+        return df
+
+    def window_bars(self, signals):
+        """
+        Bars and entry/exit positions of every signal, in the layout of `backtest.read_window_csvs`.
+
+        For a single pair the arrays are views of the memory-mapped OHLC array; signals of several
+        pairs concatenate those pairs' bars once (not per window).
+
+        Args:
+            signals (pd.DataFrame): Columns 'pair' and 'image_path'.
+
+        Returns:
+            dict: 'time' (datetime64), 'high', 'low', 'close', and per signal 'entry_index' (the
+            12th candle, as in the CSVs) and 'exit_index' (the window's last bar).
+        """
+        pairs = signals['pair'].to_numpy()
+        charts = np.array([chart_id(path) for path in signals['image_path']], dtype=WINDOW_DTYPE['chart'])
+        starts = np.zeros(len(signals), dtype=np.int64)
+        lengths = np.zeros(len(signals), dtype=np.int64)
+        ohlc, times, position = [], [], 0
+        for pair in pd.unique(pairs):
+            mask = pairs == pair
+            bars = self.pair(pair)
+            records = self.locate(pair, charts[mask])
+            starts[mask] = position + records['start']
+            lengths[mask] = records['length']
+            ohlc.append(bars['ohlc'])
+            times.append(bars['time'])
+            position += len(bars['time'])
+        if len(ohlc) == 1:
+            ohlc, times = ohlc[0], times[0]
+        elif ohlc:
+            ohlc, times = np.concatenate(ohlc), np.concatenate(times)
+        else:
+            ohlc, times = np.empty((0, len(OHLC_COLUMNS))), np.empty(0, dtype=np.int64)
+        return {
+            'time': np.asarray(times).view('datetime64[s]'),
+            'high': ohlc[:, 1],
+            'low': ohlc[:, 2],
+            'close': ohlc[:, 3],
+            'entry_index': starts + entry_offset(DEFAULT_GEOMETRY),
+            'exit_index': starts + lengths - 1,
+        }
+
+
+def convert_csv_windows(root, pairs=None):
+    """
+    Build the window store of an existing per-window CSV export (<root>/<pair>/data/*.csv) in place.
+
+    Overlapping window rows are merged into one bar array per pair; the CSVs are left untouched.
+
+    Returns:
+        dict: pair -> number of windows indexed.
+    """
+    pairs = pairs or sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name, "data")))
+    counts = {}
+    for pair in pairs:
+        data_dir = os.path.join(root, pair, "data")
+        files = sorted(file for file in os.listdir(data_dir) if file.endswith(".csv"))
+        frames = [pd.read_csv(os.path.join(data_dir, file), usecols=['time', *OHLC_COLUMNS]) for file in files]
+        if not frames:
+            continue
+        windows = pd.concat([frame.assign(_window=i) for i, frame in enumerate(frames)], ignore_index=True)
+        windows['time'] = pd.to_datetime(windows['time']).values.astype('datetime64[s]').astype(np.int64)
+        bars = windows.drop_duplicates('time').sort_values('time', ignore_index=True)
+        first = windows.groupby('_window')['time'].first().to_numpy()
+        columns = {'time': bars['time'].to_numpy(), **{name: bars[name].to_numpy() for name in OHLC_COLUMNS}}
+        write_window_store(os.path.join(root, pair), columns, np.searchsorted(columns['time'], first),
+                           [len(frame) for frame in frames], [chart_id(file) for file in files])
+        counts[pair] = len(files)
+    return counts
+
+
+def check_parity(num_bars=3000, seed=0, pairs=("EURUSD", "USDJPY")):
+    """
+    Export synthetic bars both as per-window CSVs (the old data script) and as a window store,
+    then backtest random signals from each through `simulate_signals`, the sweep paths and the
+    portfolio trades. The store built by `convert_csv_windows` from the CSVs is compared too.
+
+    Returns:
+        int: Number of signals compared. Raises AssertionError on a mismatch.
+    """
+    from forex_breakout.backtest import DIRECTIONS, simulate_signals
+    from forex_breakout.bar_cache import frame_to_columns
+    from forex_breakout.portfolio import portfolio_trades_from_windows
+    from forex_breakout.sweep import paths_from_windows
+    from forex_breakout.synthetic import synthetic_frame
+
+    rng = np.random.default_rng(seed)
+    with tempfile.TemporaryDirectory() as csv_root, tempfile.TemporaryDirectory() as store_root:
+        rows = []
+        for i, pair in enumerate(pairs):
+            # On the hour, windows include the bar at their end too (18 bars); off the hour they hold 17
+            start = pd.Timestamp("2023-01-02") + pd.Timedelta(minutes=3 * i)
+            df = synthetic_frame(pair, num_bars, "H1", start.floor("D"), seed)
+            columns = frame_to_columns(df)
+            starts, lengths, bounds = interval_windows(columns['time'], start, df.index[-1])
+            charts = [f"{pair}_{bound.strftime('%Y%m%d%H%M')}" for bound in bounds]
+            write_window_store(os.path.join(store_root, pair), columns, starts, lengths, charts)
+            os.makedirs(os.path.join(csv_root, pair, "data"))
+            for first, length, chart in zip(starts, lengths, charts):
+                df.iloc[first:first + length].to_csv(os.path.join(csv_root, pair, "data", f"{chart}.csv"), index=True)
+                rows.append((pair, os.path.join(csv_root, pair, "data", f"{chart}.csv"),
+                             os.path.join(store_root, pair, "charts", f"{chart}.png")))
+        signals = pd.DataFrame(rows, columns=['pair', 'file_path', 'image_path'])
+        signals['pred_class'] = rng.choice(list(DIRECTIONS), len(signals))
+        signals['pred_prob'] = rng.uniform(0.5, 1.0, len(signals))
+        store = WindowStore.open(store_root)
+        from_store = signals.drop(columns=['file_path'])
+
+        # Converted CSVs only hold the bars inside windows, so their windows are compared bar by bar
+        convert_csv_windows(csv_root)
+        converted = WindowStore(csv_root)
+        for pair in pairs:
+            assert np.array_equal(converted.pair(pair)['windows']['chart'], store.pair(pair)['windows']['chart']), pair
+            for chart in store.pair(pair)['windows']['chart']:
+                assert converted.window(pair, chart).equals(store.window(pair, chart)), (pair, chart)
+
+        for pair, pair_signals in signals.groupby('pair'):
+            expected, expected_correct = simulate_signals(pair_signals)
+            trades, correct = simulate_signals(from_store[from_store['pair'] == pair], store=store)
+            assert correct == expected_correct, pair
+            for column in ('entry_time', 'exit_date', 'profit', 'balance'):
+                assert np.array_equal(trades[column].to_numpy(), expected[column].to_numpy()), (pair, column)
+
+        expected, paths = paths_from_windows(signals, 5), paths_from_windows(from_store, 5, store)
+        for name in ('entry_time', 'adverse', 'favourable', 'close_pnl'):
+            assert np.array_equal(paths[name], expected[name]), name
+        expected = portfolio_trades_from_windows(signals, threshold=0.9)
+        trades = portfolio_trades_from_windows(from_store, threshold=0.9, store=store)
+        for name in ('entry_time', 'exit_time', 'profit'):
+            assert np.array_equal(trades[name], expected[name]), name
+    return len(signals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index an existing per-window CSV backtest export as a window store.")
+    parser.add_argument("root", nargs="?", help="Backtest data folder (<root>/<pair>/data/*.csv)")
+    parser.add_argument("--pairs", nargs="+")
+    parser.add_argument("--check", action="store_true", help="Only run the CSV versus window store parity check")
+    args = parser.parse_args()
+
+    if args.check:
+        print(f"Parity check passed on {check_parity()} signals.")
+        return
+    if not args.root:
+        parser.error("root is required")
+    for pair, count in convert_csv_windows(args.root, args.pairs).items():
+        print(f"{pair}: {count} windows")
+
+
+if __name__ == "__main__":
+    main()